@@ -0,0 +1,179 @@
+"""
+Builds the unified dataset (data/finalDataset.csv) from the per-platform CSV files written by the scrapers
+(data/reddit_data_*.csv and data/youtube_data_*.csv).
+
+The sources are streamed in chunks and normalized to the common schema of the challenge. Duplicates are
+removed across all files through an on-disk index of hashed content_ids (SQLite), instead of loading every
+row for a drop_duplicates, and new rows are appended to the output. The index also keeps the byte offset up to
+which every source was read, so a rebuild after a scrape cycle only reads the rows added since the last one.
+
+If the output still has the legacy format of the hand-made finalDataset.csv (a whole row in one quoted field
+and a trailing ';'), it is moved into the state directory and read as one more source, so the first build
+rewrites it in a well-formed format.
+
+Example:
+    python -m src.ingestion.buildDataset
+    python -m src.ingestion.buildDataset --watch 300
+"""
+
+import argparse
+import glob
+import hashlib
+import os
+import sqlite3
+import time
+
+from src.utils.utilsDataset import SCHEMA_COLUMNS, is_legacy_format, read_csv_chunks
+
+COUNTER_COLUMNS = ['like_count', 'reply_count', 'repost_count', 'quote_count', 'bookmark_count']
+SOURCE_PATTERNS = ["reddit_data_*.csv", "youtube_data_*.csv"]
+
+
+def content_hash(content_id):
+    # 8 bytes of BLAKE2b are enough to tell apart billions of ids, and keep the index small
+    return hashlib.blake2b(str(content_id).encode("utf-8"), digest_size=8).digest()
+
+
+def open_state(state_dir):
+    """
+    Opens (and creates, the first time) the SQLite state of the builder: the index of hashed content_ids,
+    the progress on every source file and the size of the output at the last commit.
+
+    Args:
+        state_dir (str): Directory of the state.
+
+    Returns:
+        sqlite3.Connection: The connection to the state.
+    """
+    os.makedirs(state_dir, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(state_dir, "index.sqlite"))
+    conn.execute("CREATE TABLE IF NOT EXISTS seen (hash BLOB PRIMARY KEY) WITHOUT ROWID")
+    conn.execute("CREATE TABLE IF NOT EXISTS sources (path TEXT PRIMARY KEY, rows INTEGER, size INTEGER, offset INTEGER)")
+    # State created by older versions, without the offset: their sources are read again from the first row
+    if 'offset' not in [column[1] for column in conn.execute("PRAGMA table_info(sources)")]:
+        conn.execute("ALTER TABLE sources ADD COLUMN offset INTEGER")
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+    conn.commit()
+    return conn
+
+
+def normalize_chunk(chunk, source_path):
+    """
+    Brings a chunk of a per-platform CSV to the common schema: all the columns in the right order,
+    the platform filled from the file name when missing, and the counters as integers.
+
+    Args:
+        chunk (pandas.DataFrame): The rows read from the source.
+        source_path (str): The path of the source, used to infer the platform.
+
+    Returns:
+        pandas.DataFrame: The normalized rows.
+    """
+    chunk = chunk.reindex(columns=SCHEMA_COLUMNS)
+    file_name = os.path.basename(source_path)
+    if file_name.startswith("reddit_data_"):
+        chunk['social_media'] = chunk['social_media'].fillna('Reddit')
+    elif file_name.startswith("youtube_data_"):
+        chunk['social_media'] = chunk['social_media'].fillna('YouTube')
+    for column in COUNTER_COLUMNS:
+        chunk[column] = chunk[column].fillna(0).astype('int64')
+    return chunk.dropna(subset=['content_id'])
+
+
+def build_dataset(data_dir="data", output_path=None, state_dir=None, chunksize=5000):
+    """
+    Appends to the unified dataset the new, not duplicated rows of every per-platform CSV.
+
+    Args:
+        data_dir (str): Directory of the per-platform CSV files.
+        output_path (str): The unified dataset (default: <data_dir>/finalDataset.csv).
+        state_dir (str): Directory of the builder state (default: <data_dir>/.dataset_state).
+        chunksize (int): Number of rows read and written at a time.
+
+    Returns:
+        int: The number of rows appended to the unified dataset.
+    """
+    output_path = output_path or os.path.join(data_dir, "finalDataset.csv")
+    state_dir = state_dir or os.path.join(data_dir, ".dataset_state")
+    conn = open_state(state_dir)
+
+    sources = sorted(p for pattern in SOURCE_PATTERNS for p in glob.glob(os.path.join(data_dir, pattern)))
+
+    # The legacy output is converted once: it becomes a source and the output is written again from scratch
+    legacy_path = os.path.join(state_dir, "legacy_" + os.path.basename(output_path))
+    if os.path.exists(output_path) and os.path.getsize(output_path) and is_legacy_format(output_path):
+        print(f"{output_path} has the legacy format: it will be rewritten in a well-formed format.")
+        os.replace(output_path, legacy_path)
+        conn.execute("DELETE FROM meta WHERE key = 'output_size'")
+        conn.commit()
+    if os.path.exists(legacy_path):
+        sources.insert(0, legacy_path)
+
+    # Rows written after the last commit (an interrupted build) are removed, so they are not duplicated
+    row = conn.execute("SELECT value FROM meta WHERE key = 'output_size'").fetchone()
+    committed_size = row[0] if row else 0
+    if os.path.exists(output_path) and os.path.getsize(output_path) > committed_size:
+        with open(output_path, "r+b") as f:
+            f.truncate(committed_size)
+
+    appended = 0
+    for source_path in sources:
+        size = os.path.getsize(source_path)
+        row = conn.execute("SELECT rows, size, offset FROM sources WHERE path = ?", (source_path,)).fetchone()
+        rows_read, start_offset = (row[0], row[2]) if row and row[2] is not None else (0, 0)
+        if row and size < row[1]:
+            # The file was rewritten shorter: it is read again, the index skips the rows already in the dataset
+            rows_read, start_offset = 0, 0
+        elif row and size == row[1] and row[2] is not None:
+            continue
+
+        offset = start_offset
+        for offset, chunk in read_csv_chunks(source_path, chunksize, start_offset=start_offset):
+            rows_read += len(chunk)
+            chunk = normalize_chunk(chunk, source_path)
+            cursor = conn.cursor()
+            is_new = []
+            for content_id in chunk['content_id']:
+                cursor.execute("INSERT OR IGNORE INTO seen (hash) VALUES (?)", (content_hash(content_id),))
+                is_new.append(cursor.rowcount == 1)
+            new_rows = chunk[is_new]
+
+            if len(new_rows):
+                write_header = not os.path.exists(output_path) or os.path.getsize(output_path) == 0
+                new_rows.to_csv(output_path, mode="a", header=write_header, index=False)
+                appended += len(new_rows)
+
+            # Index, progress and output size are committed together, after the rows are on disk
+            output_size = os.path.getsize(output_path) if os.path.exists(output_path) else 0
+            conn.execute("INSERT OR REPLACE INTO sources (path, rows, size, offset) VALUES (?, ?, ?, ?)", (source_path, rows_read, size, offset))
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('output_size', ?)", (output_size,))
+            conn.commit()
+
+        # The size is recorded also when no new chunk was read, so an unchanged file is skipped next time
+        conn.execute("INSERT OR REPLACE INTO sources (path, rows, size, offset) VALUES (?, ?, ?, ?)", (source_path, rows_read, size, offset))
+        conn.commit()
+        print(f"{source_path}: read up to row {rows_read}.")
+
+    conn.close()
+    print(f"Unified dataset {output_path} updated: {appended} new rows.")
+    return appended
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Builds the unified dataset from the per-platform CSV files.")
+    parser.add_argument("--data-dir", default="data", help="directory of the per-platform CSV files")
+    parser.add_argument("--output", help="unified dataset (default: <data-dir>/finalDataset.csv)")
+    parser.add_argument("--state-dir", help="directory of the builder state (default: <data-dir>/.dataset_state)")
+    parser.add_argument("--chunksize", type=int, default=5000, help="rows read and written at a time")
+    parser.add_argument("--watch", type=int, default=0, help="rebuild every N seconds (0: build once)")
+    args = parser.parse_args()
+
+    while True:
+        build_dataset(args.data_dir, args.output, args.state_dir, args.chunksize)
+        if not args.watch:
+            break
+        time.sleep(args.watch)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+Replays the API responses recorded by the scrapers (RECORD_DIR in the .env file) through the same code paths
+(scrape_youtube_comments / scrape_reddit_posts_and_comments, Redis, backpressure), at N times the real speed,
+with local fake clients instead of the YouTube and Reddit APIs. It is used to load test the pipeline offline:
+the replay prints, after every cycle, the items per second sent by the producer, the pending-work gauge and the
+items per second taken by the consumers (items written to Redis minus the growth of the gauge), so a backlog that keeps growing
+shows that the consumer (or MongoDB) is the bottleneck. With --wait the replay keeps measuring the consumers after
+the last cycle, until the backlog is empty.
+
+Example:
+    python -m src.ingestion.replayRecording data/recordings/youtube_F1_Monaco_GP_2025_20250525T130000.jsonl.gz --speed 10 --fresh-ids
+    python -m src.ingestion.replayRecording data/recordings/reddit_formula1_20250525T130000.jsonl.gz --speed 0 --loops 5 --fresh-ids --wait 600
+"""
+
+import argparse
+import time
+import uuid
+
+from src.utils.utilsReplay import load_recording, FakeYoutube, FakeReddit
+import src.utils.utilsRedis as utilsRedis
+from src.utils.utilsRedis import flow
+
+
+def replay_cycle(header, events, id_suffix):
+    """
+    Runs the scraper of the recording on the events of one cycle.
+
+    Returns:
+        int: The number of items (posts and comments) scraped.
+    """
+    params = header['params']
+    if header['platform'] == 'youtube':
+        from src.utils.utilsYoutube import scrape_youtube_comments
+        df = scrape_youtube_comments(None, params['query'], params['limit_videos'], params['limit_comments'],
+                                     youtube=FakeYoutube(events, id_suffix))
+    elif 'subreddits' in params:
+        from src.utils.utilsReddit import scrape_reddit_multi
+        dfs = scrape_reddit_multi(params['subreddits'], params['post_limit'], params['comment_limit'],
+                                  reddit=FakeReddit(events, id_suffix))
+        return sum(len(df) for df in dfs.values())
+    else:
+        from src.utils.utilsReddit import scrape_reddit_posts_and_comments
+        df = scrape_reddit_posts_and_comments(params['subreddit'], params['post_limit'], params['comment_limit'],
+                                              reddit=FakeReddit(events, id_suffix))
+    return len(df)
+
+
+def _pending():
+    try:
+        return flow.pending() if flow else None
+    except Exception:
+        return None
+
+
+def replay_recording(path, speed=1.0, loops=1, fresh_ids=False, wait=0):
+    """
+    Replays a recording, keeping the recorded gaps between the cycles divided by `speed`.
+
+    Args:
+        path (str): The .jsonl.gz recording.
+        speed (float): Speed-up factor of the replay (0: no pauses, as fast as possible).
+        loops (int): How many times the recording is replayed.
+        fresh_ids (bool): Change the ids of every replayed item, so nothing is skipped as already elaborated.
+        wait (float): Maximum seconds spent after the last cycle measuring the consumers, until the backlog is empty.
+
+    Returns:
+        dict: Items scraped, elapsed seconds and items per second, for the producer and for the consumers.
+    """
+    header, cycles = load_recording(path)
+    print(f"Replay of {path}: {header['platform']}, {len(cycles)} cycles, speed x{speed or 'max'}, {loops} loops.")
+    run_id = uuid.uuid4().hex[:6]
+
+    items = 0
+    started = time.monotonic()
+    pending_start = _pending()
+    written_start = utilsRedis.written_items
+
+    def consumed(pending):
+        # Every item written to Redis increments the gauge and every processed item decrements it
+        if pending is None or pending_start is None:
+            return None
+        return utilsRedis.written_items - written_start - (pending - pending_start)
+    for loop in range(loops):
+        loop_started = time.monotonic()
+        first_t = cycles[0][0]['t'] if cycles else 0
+        for events in cycles:
+            # Wait until the recorded offset of the cycle, scaled by the speed
+            if speed:
+                delay = (events[0]['t'] - first_t) / speed - (time.monotonic() - loop_started)
+                if delay > 0:
+                    time.sleep(delay)
+            id_suffix = f"_replay{run_id}{loop}" if fresh_ids else ""
+            items += replay_cycle(header, events, id_suffix)
+            pending = _pending()
+            elapsed = time.monotonic() - started
+            done = consumed(pending)
+            print(f"Replay: {items} items in {elapsed:.1f}s ({items / elapsed if elapsed else 0:.1f} items/s), "
+                  f"pending items for the consumer: {pending if pending is not None else 'n/a'}, "
+                  f"consumed: {f'{done} ({done / elapsed if elapsed else 0:.1f} items/s)' if done is not None else 'n/a'}.")
+
+    produced_seconds = time.monotonic() - started
+    pending = _pending()
+    # The consumers are measured until they have taken everything the replay sent, or for at most `wait` seconds
+    while wait and pending and time.monotonic() - started - produced_seconds < wait:
+        time.sleep(1)
+        pending = _pending()
+    elapsed = time.monotonic() - started
+    done = consumed(pending)
+    stats = {'items': items, 'seconds': produced_seconds, 'items_per_second': items / produced_seconds if produced_seconds else 0,
+             'consumed_items': done, 'consumer_seconds': elapsed,
+             'consumed_items_per_second': done / elapsed if done is not None and elapsed else None}
+    print(f"Replay completed: {items} items in {produced_seconds:.1f}s, {stats['items_per_second']:.1f} items/s.")
+    if done is not None:
+        print(f"Consumers: {done} items in {elapsed:.1f}s, {stats['consumed_items_per_second']:.1f} items/s, {pending} still pending.")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replays recorded API responses through the scrapers, for load testing.")
+    parser.add_argument("recording", help="recording written in RECORD_DIR by a scraper (.jsonl.gz)")
+    parser.add_argument("--speed", type=float, default=1.0, help="speed-up factor (0: no pauses between cycles)")
+    parser.add_argument("--loops", type=int, default=1, help="how many times the recording is replayed")
+    parser.add_argument("--fresh-ids", action="store_true", help="change the ids of the replayed items, so none is skipped")
+    parser.add_argument("--wait", type=float, default=0, help="seconds to keep measuring the consumers after the last cycle")
+    args = parser.parse_args()
+
+    replay_recording(args.recording, args.speed, args.loops, args.fresh_ids, args.wait)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+import random
+import threading
+
+
+class SentimentCascade:
+    """
+    Local-first cascade for the Reddit sentiment.
+    Every text is scored by the local model; only the texts on which the local model is unsure
+    (top-class probability or margin between the two best classes under a threshold) are escalated
+    to the remote model (Gemini). A small random holdout of the confident texts is also sent to the
+    remote model, to measure how often the two models agree.
+
+    Args:
+        local_fn (callable): Function that takes a list of texts and returns a list of probability
+                             lists, one for each text, ordered as `labels`.
+        remote_fn (callable): Function that takes a text and returns a sentiment label.
+        labels (list): The sentiment labels, in the same order as the local model classes.
+        min_confidence (float): Minimum top-class probability to accept the local prediction.
+        min_margin (float): Minimum distance between the two best probabilities to accept the local prediction.
+        holdout_rate (float): Fraction of the confident texts also sent to the remote model for the agreement check.
+    """
+
+    def __init__(self, local_fn, remote_fn, labels, min_confidence=0.6, min_margin=0.2, holdout_rate=0.05):
+        self.local_fn = local_fn
+        self.remote_fn = remote_fn
+        self.labels = labels
+        self.min_confidence = min_confidence
+        self.min_margin = min_margin
+        self.holdout_rate = holdout_rate
+        self.total = 0
+        self.escalated = 0
+        self.holdout_total = 0
+        self.holdout_agreements = 0
+        self._lock = threading.Lock() # chunks of the same thread are classified in parallel
+
+    def predict(self, text):
+        """
+        Classifies a text with the cascade.
+
+        Args:
+            text (str): The text to classify.
+
+        Returns:
+            str: The sentiment label.
+        """
+        if not text or not text.strip():
+            return "Neutral"
+        probabilities = self.local_fn([text])[0]
+        ranked = sorted(range(len(probabilities)), key=lambda i: probabilities[i], reverse=True)
+        top, second = probabilities[ranked[0]], probabilities[ranked[1]]
+        local_label = self.labels[ranked[0]]
+
+        escalate = top < self.min_confidence or (top - second) < self.min_margin
+        holdout = not escalate and random.random() < self.holdout_rate
+        with self._lock:
+            self.total += 1
+            if escalate:
+                self.escalated += 1
+
+        if escalate:
+            print(f"Cascade: local model unsure (p={top:.2f}, margin={top - second:.2f}), escalating to Gemini.")
+            return self.remote_fn(text)
+
+        if holdout:
+            remote_label = self.remote_fn(text)
+            with self._lock:
+                self.holdout_total += 1
+                if remote_label == local_label:
+                    self.holdout_agreements += 1
+        return local_label
+
+    def stats(self):
+        """
+        Returns the escalation rate and the agreement rate measured on the holdout.
+
+        Returns:
+            dict: The counters and the derived rates (None when nothing has been measured yet).
+        """
+        with self._lock:
+            return {
+                'total': self.total,
+                'escalated': self.escalated,
+                'escalation_rate': self.escalated / self.total if self.total else None,
+                'holdout_total': self.holdout_total,
+                'holdout_agreement_rate': self.holdout_agreements / self.holdout_total if self.holdout_total else None
+            }
+
+    def print_stats(self):
+        stats = self.stats()
+        escalation = f"{stats['escalation_rate']:.1%}" if stats['escalation_rate'] is not None else "n/a"
+        agreement = f"{stats['holdout_agreement_rate']:.1%}" if stats['holdout_agreement_rate'] is not None else "n/a"
+        print(f"Cascade: {stats['total']} texts, {stats['escalated']} escalated to Gemini ({escalation}), "
+              f"agreement on holdout {agreement} over {stats['holdout_total']} samples.")
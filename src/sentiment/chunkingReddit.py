@@ -0,0 +1,185 @@
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+# Ordinal scale of the sentiment classes, shared by every aggregation rule
+SENTIMENT_SCALE = ["Very Negative", "Negative", "Neutral", "Positive", "Very Positive"]
+AGGREGATION_RULES = ["majority", "weighted", "mean"]
+
+
+def approximate_token_count(text):
+    """
+    Rough token estimate (about 4 characters per token) used when no tokenizer is available.
+
+    Args:
+        text (str): The text to measure.
+
+    Returns:
+        int: The estimated number of tokens.
+    """
+    return len(text) // 4 + 1
+
+
+def truncate_to_tokens(text, max_tokens, count_tokens):
+    """
+    Cuts a text so that it fits into the given token budget.
+    The cut is proportional to the measured length, then refined until it fits.
+
+    Args:
+        text (str): The text to truncate.
+        max_tokens (int): The token budget the text must fit in.
+        count_tokens (callable): Function returning the number of tokens of a text.
+
+    Returns:
+        str: The (possibly) truncated text.
+    """
+    if max_tokens <= 0:
+        return ''
+    tokens = count_tokens(text)
+    while tokens > max_tokens and text:
+        shorter = text[:max(1, int(len(text) * max_tokens / tokens) - 1)]
+        if len(shorter) >= len(text):
+            return '' # even a single character does not fit in the budget
+        text = shorter
+        tokens = count_tokens(text)
+    return text
+
+
+def build_thread_chunks(message_data, max_tokens=2000, max_chunks=8, count_tokens=approximate_token_count):
+    """
+    Splits a Reddit post and its nested comments into prompts that never exceed a token budget.
+    Every chunk starts with (an excerpt of) the post text, so comments are always judged in context.
+    When the thread does not fit into `max_chunks` chunks, the comments with the highest
+    like_count are kept and the rest are dropped, so the cost per thread stays bounded.
+
+    Args:
+        message_data (dict): The Reddit post as stored in Redis, with the 'comments' list.
+        max_tokens (int): Maximum number of tokens of a single chunk.
+        max_chunks (int): Maximum number of chunks generated for a single thread.
+        count_tokens (callable): Function returning the number of tokens of a text.
+
+    Returns:
+        list: A list of dictionaries {'text': str, 'weight': int}, where weight is the
+              sum of the like_count of the contents in the chunk (at least 1 per content).
+    """
+    post_text = message_data.get('comment_raw_text', '')
+    post_text = post_text.strip() if isinstance(post_text, str) else ''
+    post_weight = max(message_data.get('like_count') or 0, 0) + 1
+
+    # The post is repeated in every chunk, so it can take at most a quarter of the budget
+    post_context = truncate_to_tokens(post_text, max_tokens // 4, count_tokens) if post_text else ''
+    post_context_tokens = count_tokens(post_context) if post_context else 0
+
+    comments = []
+    for comment in message_data.get('comments', []):
+        comment_text = comment.get('comment_raw_text', '')
+        if comment_text and isinstance(comment_text, str) and comment_text.strip():
+            comments.append((comment_text, max(comment.get('like_count') or 0, 0) + 1))
+
+    if not comments:
+        if not post_text:
+            return []
+        return [{'text': truncate_to_tokens(post_text, max_tokens, count_tokens), 'weight': post_weight}]
+
+    # The most appreciated comments are packed first, so they survive the max_chunks cap
+    comments.sort(key=lambda c: c[1], reverse=True)
+    # The " commento:" prefix of every comment is part of the chunk, so its tokens come out of the budget
+    comment_prefix = " commento:"
+    comment_budget = max(max_tokens - post_context_tokens - count_tokens(comment_prefix), 1)
+
+    chunks = []
+    current_text, current_tokens, current_weight = post_context, post_context_tokens, post_weight
+    dropped = 0
+    for comment_text, weight in comments:
+        if len(chunks) >= max_chunks:
+            dropped += 1
+            continue
+        piece = comment_prefix + truncate_to_tokens(comment_text, comment_budget, count_tokens)
+        piece_tokens = count_tokens(piece)
+        if current_tokens + piece_tokens > max_tokens and current_tokens > post_context_tokens:
+            chunks.append({'text': current_text, 'weight': current_weight})
+            if len(chunks) >= max_chunks:
+                dropped += 1
+                continue
+            current_text, current_tokens, current_weight = post_context, post_context_tokens, 0
+        current_text += piece
+        current_tokens += piece_tokens
+        current_weight += weight
+
+    if len(chunks) < max_chunks and current_tokens > post_context_tokens:
+        chunks.append({'text': current_text, 'weight': current_weight})
+
+    if dropped:
+        print(f"Thread {message_data.get('content_id')}: {dropped} low-score comments dropped to respect the limit of {max_chunks} chunks.")
+    return chunks
+
+
+def aggregate_chunk_sentiments(chunk_results, rule="weighted"):
+    """
+    Combines the sentiment of every chunk into a single thread-level label.
+
+    Args:
+        chunk_results (list): A list of (sentiment_label, weight) tuples, one for each chunk.
+        rule (str): The aggregation rule:
+                    - 'majority': the most frequent label among the chunks.
+                    - 'weighted': the label with the highest total weight (like_count).
+                    - 'mean': the weighted mean position on the sentiment scale, rounded.
+
+    Returns:
+        str: The thread-level sentiment label.
+    """
+    if not chunk_results:
+        return "Neutral"
+    if rule not in AGGREGATION_RULES:
+        print(f"Aggregation rule '{rule}' not recognized, using 'weighted'.")
+        rule = "weighted"
+
+    if rule == "majority":
+        counts = Counter(label for label, _ in chunk_results)
+        # Ties are solved in favour of the label met first, which comes from the best-scored comments
+        return max(counts, key=lambda label: counts[label])
+
+    if rule == "weighted":
+        weights = defaultdict(int)
+        for label, weight in chunk_results:
+            weights[label] += weight
+        return max(weights, key=lambda label: weights[label])
+
+    # 'mean' rule
+    total_weight = sum(weight for _, weight in chunk_results)
+    mean_index = sum(SENTIMENT_SCALE.index(label) * weight for label, weight in chunk_results
+                     if label in SENTIMENT_SCALE) / max(total_weight, 1)
+    return SENTIMENT_SCALE[int(round(mean_index))]
+
+
+def predict_sentiment_thread(message_data, predict_fn, max_tokens=2000, max_chunks=8, rule="weighted",
+                             max_workers=4, count_tokens=approximate_token_count):
+    """
+    Classifies a whole Reddit thread with a bounded number of bounded prompts.
+    The chunks are classified in parallel (the predictor is I/O bound when it calls Gemini)
+    and then combined with the chosen aggregation rule.
+
+    Args:
+        message_data (dict): The Reddit post as stored in Redis, with the 'comments' list.
+        predict_fn (callable): Function that takes a text and returns a sentiment label.
+        max_tokens (int): Maximum number of tokens of a single chunk.
+        max_chunks (int): Maximum number of chunks generated for a single thread.
+        rule (str): The aggregation rule (see aggregate_chunk_sentiments).
+        max_workers (int): Maximum number of chunks classified at the same time.
+        count_tokens (callable): Function returning the number of tokens of a text.
+
+    Returns:
+        tuple: (sentiment label, number of chunks), or (None, 0) if the thread has no text.
+    """
+    chunks = build_thread_chunks(message_data, max_tokens, max_chunks, count_tokens)
+    if not chunks:
+        return None, 0
+
+    if len(chunks) == 1 or max_workers <= 1:
+        labels = [predict_fn(chunk['text']) for chunk in chunks]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+            labels = list(executor.map(predict_fn, [chunk['text'] for chunk in chunks]))
+
+    chunk_results = [(label, chunk['weight']) for label, chunk in zip(labels, chunks)]
+    print(f"Thread {message_data.get('content_id')} split into {len(chunks)} chunks: {labels}")
+    return aggregate_chunk_sentiments(chunk_results, rule), len(chunks)
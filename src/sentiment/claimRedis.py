@@ -0,0 +1,144 @@
+import os
+import socket
+import threading
+
+# Prefix of the lease keys: 'lease:<data key>'. It does not match the polling patterns of the consumer.
+LEASE_KEY_PREFIX = "lease:"
+
+# The lease is renewed only if it still belongs to the consumer (KEYS[1] = lease, ARGV[1] = owner, ARGV[2] = ttl in ms)
+RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# The data key and its lease are deleted together, only by the owner of the lease (KEYS[1] = lease, KEYS[2] = data key).
+# When a pending-work gauge is given (KEYS[3]) it is decremented in the same step, without going under zero.
+COMPLETE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    if redis.call('DEL', KEYS[2]) == 1 and KEYS[3] and tonumber(redis.call('GET', KEYS[3]) or '0') > 0 then
+        redis.call('DECR', KEYS[3])
+    end
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# The lease is given back (without deleting the data key) only by its owner
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class LeaseManager:
+    """
+    Atomic work claiming on the existing 'reddit:json *' / 'youtube:json*' keys, so that many
+    consumers can poll the same Redis without classifying the same item twice.
+
+    A consumer owns a key while it holds 'lease:<key>' (SET NX with a TTL). Held leases are renewed
+    by a background thread; if a consumer dies, its leases expire and the keys are claimed again by
+    the next consumer that scans them. A key is deleted only together with a lease that is still
+    owned, so a consumer that lost its lease can never delete work taken over by another one.
+
+    Args:
+        r (redis.Redis): The Redis connection of the consumer.
+        consumer_id (str): Unique name of this consumer (default: hostname and pid).
+        ttl_seconds (int): Lifetime of a lease that is not renewed.
+        pending_key (str): Optional pending-work gauge decremented when a key is completed.
+    """
+
+    def __init__(self, r, consumer_id=None, ttl_seconds=120, pending_key=None):
+        self.r = r
+        self.pending_key = pending_key
+        self.consumer_id = consumer_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.ttl_seconds = ttl_seconds
+        self.held = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._renew = r.register_script(RENEW_SCRIPT)
+        self._complete = r.register_script(COMPLETE_SCRIPT)
+        self._release = r.register_script(RELEASE_SCRIPT)
+        self._renewer = threading.Thread(target=self._renew_loop, daemon=True)
+        self._renewer.start()
+
+    def claim(self, key):
+        """
+        Tries to take the ownership of a key.
+
+        Args:
+            key (str): The data key (e.g. 'youtube:jsonyt_comm_...').
+
+        Returns:
+            bool: True if the key is now owned by this consumer, False if another consumer owns it
+                  or the key has already been processed.
+        """
+        lease_key = LEASE_KEY_PREFIX + key
+        if not self.r.set(lease_key, self.consumer_id, nx=True, ex=self.ttl_seconds):
+            return False
+        # The key could have been completed by another consumer between our SCAN and the claim
+        if not self.r.exists(key):
+            self._release(keys=[lease_key], args=[self.consumer_id])
+            return False
+        with self._lock:
+            self.held.add(key)
+        return True
+
+    def complete(self, key):
+        """
+        Deletes a processed key together with its lease.
+
+        Args:
+            key (str): The data key.
+
+        Returns:
+            bool: True if the key was deleted, False if the lease had been lost in the meantime.
+        """
+        with self._lock:
+            self.held.discard(key)
+        keys = [LEASE_KEY_PREFIX + key, key] + ([self.pending_key] if self.pending_key else [])
+        deleted = self._complete(keys=keys, args=[self.consumer_id])
+        if not deleted:
+            print(f"Lease on '{key}' lost before completion: the key is left to its new owner.")
+        return bool(deleted)
+
+    def release(self, key):
+        """
+        Gives back a key that was not processed, so that any consumer can claim it again.
+
+        Args:
+            key (str): The data key.
+        """
+        with self._lock:
+            if key not in self.held:
+                return
+            self.held.discard(key)
+        self._release(keys=[LEASE_KEY_PREFIX + key], args=[self.consumer_id])
+
+    def stop(self):
+        """Stops the renewal thread and gives back all the leases still held."""
+        self._stop.set()
+        with self._lock:
+            keys = list(self.held)
+        for key in keys:
+            try:
+                self.release(key)
+            except Exception as e:
+                print(f"Error releasing lease on '{key}': {e}")
+
+    def _renew_loop(self):
+        # Leases are renewed three times per TTL, so a slow Gemini call does not make them expire
+        while not self._stop.wait(self.ttl_seconds / 3):
+            with self._lock:
+                keys = list(self.held)
+            for key in keys:
+                try:
+                    if not self._renew(keys=[LEASE_KEY_PREFIX + key], args=[self.consumer_id, self.ttl_seconds * 1000]):
+                        print(f"Lease on '{key}' expired and could not be renewed.")
+                        with self._lock:
+                            self.held.discard(key)
+                except Exception as e:
+                    print(f"Error renewing lease on '{key}': {e}")
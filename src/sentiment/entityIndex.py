@@ -0,0 +1,255 @@
+"""
+Entity tagging and incremental inverted index for driver/team/corner sentiment queries.
+
+The consumer tags every item with the entities of a configurable alias dictionary (data/entities.json, or
+ENTITY_ALIASES_FILE), matched by two Aho-Corasick automata, one pass each over the text: one for the aliases that
+match in any case, run on the lower-cased text, and one for the aliases in capitals, run on the text as it is. For
+every entity, Redis keeps:
+    entity:posts:<entity>                 sorted set content_id -> publish time (epoch seconds), the posting list
+    entity:minute:<entity>:<YYYY-MM-DDTHH:MM>  hash {sentiment: count} by minute of publish_date (UTC)
+    entity:total:<entity>                 hash {sentiment: count} since the beginning
+so a per-entity query reads one hash per minute of its window, whatever the size of the corpus.
+
+Example:
+    python -m src.sentiment.entityIndex --entity Leclerc --entity Norris --start 2025-05-25T13:00 --end 2025-05-25T15:00
+"""
+
+import argparse
+import json
+import os
+from collections import deque
+from datetime import datetime, timedelta
+
+import pytz
+
+ENTITY_KEY_PREFIX = "entity:"
+DEFAULT_ALIASES_FILE = os.path.join("data", "entities.json")
+MINUTE_FORMAT = "%Y-%m-%dT%H:%M"
+
+# An item is added to the posting list of every entity, and the counters are incremented only for the
+# entities it was not already indexed under (ZADD NX), in one atomic step.
+# KEYS: for every entity, posting list, minute hash and total hash. ARGV: content_id, publish epoch, sentiment, ttl
+INDEX_SCRIPT = """
+local indexed = 0
+for i = 1, #KEYS, 3 do
+    if redis.call('ZADD', KEYS[i], 'NX', ARGV[2], ARGV[1]) == 1 then
+        redis.call('HINCRBY', KEYS[i + 1], ARGV[3], 1)
+        redis.call('EXPIRE', KEYS[i + 1], ARGV[4])
+        redis.call('HINCRBY', KEYS[i + 2], ARGV[3], 1)
+        indexed = indexed + 1
+    end
+end
+return indexed
+"""
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton: finds all the occurrences of many patterns in a text with a single pass.
+
+    Args:
+        patterns (dict): {pattern: value returned when the pattern is found}.
+    """
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for pattern, value in patterns.items():
+            state = 0
+            for char in pattern:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.output[state].append((len(pattern), value))
+
+        # Failure links, breadth first: the longest proper suffix of every state that is also a prefix
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def search(self, text):
+        """
+        Yields:
+            tuple: (start index, end index, value) of every occurrence of a pattern.
+        """
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for length, value in self.output[state]:
+                yield i - length + 1, i + 1, value
+
+
+def is_case_sensitive(alias):
+    # Aliases written in capitals (driver codes such as 'LEC' or 'PIA') must match exactly, so 'lec' is not Leclerc
+    return alias.isupper()
+
+
+def load_aliases(path=None):
+    """
+    Reads the alias dictionary. Only the listed aliases are matched (the entity name itself is not added), so
+    common words can be left out; aliases in capitals are matched case-sensitively, the others in any case.
+
+    Args:
+        path (str): JSON file {entity: [aliases]} (default: ENTITY_ALIASES_FILE or data/entities.json).
+
+    Returns:
+        dict: {alias (in lower case unless case-sensitive): entity}.
+    """
+    path = path or os.getenv('ENTITY_ALIASES_FILE', DEFAULT_ALIASES_FILE)
+    with open(path, "r", encoding="utf-8") as f:
+        entities = json.load(f)
+    return {alias if is_case_sensitive(alias) else alias.lower(): entity for entity, aliases in entities.items() for alias in aliases}
+
+
+def _publish_time(message_data):
+    value = message_data.get('publish_date') or message_data.get('observation_time')
+    try:
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return datetime.now(pytz.utc)
+    return moment if moment.tzinfo else moment.replace(tzinfo=pytz.utc)
+
+
+def _decode(value):
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+class EntityIndex:
+    """
+    Entity tagging with an Aho-Corasick automaton, and an inverted index with per-entity sentiment counters in Redis.
+
+    Args:
+        r (redis.Redis): The Redis connection (with or without decode_responses).
+        aliases (dict): {alias: entity}, see load_aliases; aliases in capitals are case-sensitive.
+        ttl_seconds (int): Lifetime of the per-minute counters (the posting lists and the totals are kept).
+    """
+
+    def __init__(self, r, aliases, ttl_seconds=30 * 24 * 3600):
+        self.r = r
+        self.ttl_seconds = ttl_seconds
+        self.automaton = AhoCorasick({alias: entity for alias, entity in aliases.items() if not is_case_sensitive(alias)})
+        self.exact_automaton = AhoCorasick({alias: entity for alias, entity in aliases.items() if is_case_sensitive(alias)})
+        self._index = r.register_script(INDEX_SCRIPT)
+
+    def tag(self, text):
+        """
+        Finds the entities mentioned in a text; an alias matches only as a whole word.
+
+        Returns:
+            list: The entities, sorted.
+        """
+        entities = set()
+        for automaton, searched in ((self.automaton, text.lower()), (self.exact_automaton, text)):
+            for start, end, entity in automaton.search(searched):
+                if (start == 0 or not searched[start - 1].isalnum()) and (end == len(searched) or not searched[end].isalnum()):
+                    entities.add(entity)
+        return sorted(entities)
+
+    def index(self, message_data, sentiment, entities):
+        """
+        Adds an item to the posting lists of its entities and counts its sentiment.
+
+        Args:
+            message_data (dictionary): The element, with 'content_id' and 'publish_date'.
+            sentiment (str): The sentiment label.
+            entities (list): The entities returned by tag.
+
+        Returns:
+            int: The number of entities the item was newly indexed under.
+        """
+        if not entities:
+            return 0
+        moment = _publish_time(message_data)
+        minute = moment.astimezone(pytz.utc).strftime(MINUTE_FORMAT)
+        keys = []
+        for entity in entities:
+            keys += [f"{ENTITY_KEY_PREFIX}posts:{entity}", f"{ENTITY_KEY_PREFIX}minute:{entity}:{minute}", f"{ENTITY_KEY_PREFIX}total:{entity}"]
+        return self._index(keys=keys, args=[message_data.get('content_id'), int(moment.timestamp()), sentiment, self.ttl_seconds])
+
+    def distribution(self, entity, start=None, end=None):
+        """
+        Returns the sentiment distribution of an entity, since the beginning or in a time window.
+
+        Args:
+            entity (str): The entity (e.g. 'Leclerc').
+            start (datetime): Beginning of the window (included), UTC; None with end None for all the data.
+                              Per-minute counters expire, so the window starts at most `ttl_seconds` before end.
+            end (datetime): End of the window (excluded), UTC; default: now.
+
+        Returns:
+            dict: {sentiment: count}
+        """
+        if start is None and end is None:
+            return {_decode(k): int(v) for k, v in self.r.hgetall(f"{ENTITY_KEY_PREFIX}total:{entity}").items()}
+        end = end or datetime.now(pytz.utc)
+        start = max(start or end - timedelta(hours=2), end - timedelta(seconds=self.ttl_seconds))
+        pipe = self.r.pipeline(transaction=False)
+        moment = start.replace(second=0, microsecond=0)
+        while moment < end:
+            pipe.hgetall(f"{ENTITY_KEY_PREFIX}minute:{entity}:{moment.strftime(MINUTE_FORMAT)}")
+            moment += timedelta(minutes=1)
+        totals = {}
+        for counts in pipe.execute():
+            for sentiment, n in counts.items():
+                totals[_decode(sentiment)] = totals.get(_decode(sentiment), 0) + int(n)
+        return totals
+
+    def contents(self, entity, start=None, end=None, limit=100):
+        """
+        Returns the content_ids that mention an entity, most recent first.
+
+        Returns:
+            list: The content_ids.
+        """
+        high = end.timestamp() if end else "+inf"
+        low = start.timestamp() if start else "-inf"
+        ids = self.r.zrevrangebyscore(f"{ENTITY_KEY_PREFIX}posts:{entity}", high, low, start=0, num=limit)
+        return [_decode(content_id) for content_id in ids]
+
+
+def _parse_time(value):
+    if not value:
+        return None
+    moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return moment if moment.tzinfo else moment.replace(tzinfo=pytz.utc)
+
+
+def main():
+    import redis
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Sentiment of drivers, teams and corners from the entity index.")
+    parser.add_argument("--entity", action="append", required=True, help="entity to query (e.g. Leclerc); can be repeated")
+    parser.add_argument("--start", help="beginning of the window (ISO date, UTC if no timezone)")
+    parser.add_argument("--end", help="end of the window (ISO date, UTC if no timezone)")
+    parser.add_argument("--contents", type=int, default=0, help="also list the last N content_ids of every entity")
+    args = parser.parse_args()
+
+    r = redis.Redis(host=os.getenv('REDIS_HOST'), port=int(os.getenv('REDIS_PORT', 6379)), username=os.getenv('REDIS_USERNAME'),
+                    password=os.getenv('REDIS_PASSWORD'), decode_responses=True)
+    index = EntityIndex(r, {}, ttl_seconds=int(os.getenv('ENTITY_COUNTERS_TTL_SECONDS', 30 * 24 * 3600)))
+    start, end = _parse_time(args.start), _parse_time(args.end)
+    result = {}
+    for entity in args.entity:
+        result[entity] = {'sentiment': index.distribution(entity, start, end)}
+        if args.contents:
+            result[entity]['contents'] = index.contents(entity, start, end, args.contents)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
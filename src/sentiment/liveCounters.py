@@ -0,0 +1,247 @@
+"""
+Live sentiment counters. While the consumer classifies items, it updates pre-aggregated counters in Redis
+(per platform, sentiment, minute and video/post), so the current distribution can be read during the race
+without stopping the consumer and without reading the raw documents. A small HTTP/JSON endpoint serves them.
+
+Keys (all with the 'live:' prefix, which does not match the polling patterns of the consumer):
+    live:total:<platform>                 hash {sentiment: count} since the beginning
+    live:minute:<platform>:<YYYY-MM-DDTHH:MM>  hash {sentiment: count} of the items classified in that minute (UTC)
+    live:content:<platform>:<url hash>    hash {sentiment: count} of a video/post
+    live:contents:<platform>              sorted set {url: number of items}, for the top videos/posts
+    live:counted:<content_id>             marker that avoids counting an item twice if it is processed again
+
+Example:
+    python -m src.sentiment.liveCounters --port 8765
+    curl "http://localhost:8765/sentiment?platform=Reddit&minutes=15"
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pytz
+
+LIVE_KEY_PREFIX = "live:"
+PLATFORMS = ['YouTube', 'Reddit']
+MINUTE_FORMAT = "%Y-%m-%dT%H:%M"
+
+# All the counters of an item are updated in one atomic step, only the first time the item is counted.
+# KEYS: marker, minute hash, total hash, content hash, contents sorted set
+# ARGV: sentiment, marker ttl, minute/content ttl, url ('' if unknown)
+INCREMENT_SCRIPT = """
+if redis.call('SET', KEYS[1], 1, 'NX', 'EX', ARGV[2]) then
+    redis.call('HINCRBY', KEYS[2], ARGV[1], 1)
+    redis.call('EXPIRE', KEYS[2], ARGV[3])
+    redis.call('HINCRBY', KEYS[3], ARGV[1], 1)
+    if ARGV[4] ~= '' then
+        redis.call('HINCRBY', KEYS[4], ARGV[1], 1)
+        redis.call('EXPIRE', KEYS[4], ARGV[3])
+        redis.call('ZINCRBY', KEYS[5], 1, ARGV[4])
+    end
+    return 1
+end
+return 0
+"""
+
+
+def minute_bucket(moment=None):
+    return (moment or datetime.now(pytz.utc)).strftime(MINUTE_FORMAT)
+
+
+def _url_hash(url):
+    return hashlib.blake2b(url.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _decode(value):
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def _counts(raw):
+    return {_decode(k): int(v) for k, v in (raw or {}).items()}
+
+
+class LiveCounters:
+    """
+    Pre-aggregated sentiment counters in Redis, updated by the consumer and read by the live endpoint.
+    Every query reads a fixed number of hashes (one per minute of the window), never the documents.
+
+    Args:
+        r (redis.Redis): The Redis connection (with or without decode_responses).
+        ttl_seconds (int): Lifetime of the per-minute and per-content counters and of the markers.
+    """
+
+    def __init__(self, r, ttl_seconds=2 * 24 * 3600):
+        self.r = r
+        self.ttl_seconds = ttl_seconds
+        self._increment = r.register_script(INCREMENT_SCRIPT)
+
+    def increment(self, message_data, sentiment):
+        """
+        Counts a classified item.
+
+        Args:
+            message_data (dictionary): The element, with 'content_id', 'social_media' and 'reference_post_url'.
+            sentiment (str): The sentiment label.
+
+        Returns:
+            bool: True if the item was counted, False if it had already been counted.
+        """
+        platform = message_data.get('social_media', 'Unknown')
+        url = message_data.get('reference_post_url') or ''
+        keys = [
+            f"{LIVE_KEY_PREFIX}counted:{message_data.get('content_id')}",
+            f"{LIVE_KEY_PREFIX}minute:{platform}:{minute_bucket()}",
+            f"{LIVE_KEY_PREFIX}total:{platform}",
+            f"{LIVE_KEY_PREFIX}content:{platform}:{_url_hash(url)}",
+            f"{LIVE_KEY_PREFIX}contents:{platform}"
+        ]
+        return bool(self._increment(keys=keys, args=[sentiment, self.ttl_seconds, self.ttl_seconds, url]))
+
+    def total(self, platform):
+        """
+        Returns:
+            dict: {sentiment: count} of the platform since the beginning.
+        """
+        return _counts(self.r.hgetall(f"{LIVE_KEY_PREFIX}total:{platform}"))
+
+    def timeline(self, platform, minutes=60):
+        """
+        Returns:
+            dict: {minute: {sentiment: count}} of the last `minutes` minutes, oldest first; older minutes have
+                  expired, so the window is capped to the lifetime of the counters.
+        """
+        minutes = max(0, min(minutes, self.ttl_seconds // 60))
+        now = datetime.now(pytz.utc)
+        buckets = [minute_bucket(now - timedelta(minutes=i)) for i in reversed(range(minutes))]
+        pipe = self.r.pipeline(transaction=False)
+        for bucket in buckets:
+            pipe.hgetall(f"{LIVE_KEY_PREFIX}minute:{platform}:{bucket}")
+        return {bucket: _counts(raw) for bucket, raw in zip(buckets, pipe.execute())}
+
+    def window(self, platform, minutes=15):
+        """
+        Returns:
+            dict: {sentiment: count} of the items classified in the last `minutes` minutes.
+        """
+        totals = {}
+        for counts in self.timeline(platform, minutes).values():
+            for sentiment, n in counts.items():
+                totals[sentiment] = totals.get(sentiment, 0) + n
+        return totals
+
+    def top_contents(self, platform, limit=10):
+        """
+        Returns:
+            list: The videos/posts with most classified items, as {'reference_post_url', 'total', 'sentiments'}.
+        """
+        top = self.r.zrevrange(f"{LIVE_KEY_PREFIX}contents:{platform}", 0, limit - 1, withscores=True)
+        pipe = self.r.pipeline(transaction=False)
+        for url, _ in top:
+            pipe.hgetall(f"{LIVE_KEY_PREFIX}content:{platform}:{_url_hash(_decode(url))}")
+        return [{'reference_post_url': _decode(url), 'total': int(score), 'sentiments': _counts(raw)}
+                for (url, score), raw in zip(top, pipe.execute())]
+
+
+def _int_param(query, name, default):
+    value = query.get(name, [default])[0]
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{name}' must be an integer, got {value!r}")
+    if number < 0:
+        raise ValueError(f"'{name}' must not be negative")
+    return number
+
+
+def _make_handler(counters):
+    class LiveHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            platforms = query.get('platform') or PLATFORMS
+            try:
+                minutes = _int_param(query, 'minutes', 0)
+                limit = min(_int_param(query, 'limit', 10), 1000)
+                if url.path == '/sentiment':
+                    body = {p: counters.window(p, minutes) if minutes else counters.total(p) for p in platforms}
+                elif url.path == '/timeline':
+                    body = {p: counters.timeline(p, minutes or 60) for p in platforms}
+                elif url.path == '/top':
+                    body = {p: counters.top_contents(p, limit) for p in platforms}
+                else:
+                    self._send(404, {'error': f"Unknown path {url.path}, use /sentiment, /timeline or /top"})
+                    return
+            except ValueError as e:
+                self._send(400, {'error': str(e)})
+                return
+            except Exception as e:
+                self._send(500, {'error': str(e)})
+                return
+            self._send(200, body)
+
+        def _send(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass # requests are not logged, the consumer output stays readable
+
+    return LiveHandler
+
+
+def start_live_server(counters, host="127.0.0.1", port=8765):
+    """
+    Starts the HTTP/JSON endpoint of the live counters in a background thread.
+
+    Endpoints:
+        /sentiment?platform=Reddit              distribution since the beginning
+        /sentiment?platform=Reddit&minutes=15   distribution of the last 15 minutes
+        /timeline?platform=YouTube&minutes=60   distribution of every minute of the last hour
+        /top?platform=Reddit&limit=10           videos/posts with most classified items
+
+    Args:
+        counters (LiveCounters): The counters to serve.
+        host (str): Address of the server (local only by default).
+        port (int): Port of the server.
+
+    Returns:
+        http.server.ThreadingHTTPServer: The running server (call shutdown() to stop it).
+    """
+    server = ThreadingHTTPServer((host, port), _make_handler(counters))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Live sentiment endpoint listening on http://{host}:{port}")
+    return server
+
+
+def main():
+    import redis
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="HTTP/JSON endpoint of the live sentiment counters.")
+    parser.add_argument("--host", default="127.0.0.1", help="address of the server")
+    parser.add_argument("--port", type=int, default=8765, help="port of the server")
+    args = parser.parse_args()
+
+    r = redis.Redis(host=os.getenv('REDIS_HOST'), port=int(os.getenv('REDIS_PORT', 6379)), username=os.getenv('REDIS_USERNAME'),
+                    password=os.getenv('REDIS_PASSWORD'), decode_responses=True)
+    counters = LiveCounters(r, ttl_seconds=int(os.getenv('LIVE_COUNTERS_TTL_SECONDS', 2 * 24 * 3600)))
+    server = ThreadingHTTPServer((args.host, args.port), _make_handler(counters))
+    print(f"Live sentiment endpoint listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+import re
+import time
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+# Mersenne prime used by the universal hash functions of the permutations
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+# Emojis, punctuation and repeated spaces are ignored, so "GO LECLERC!!! 🔥" and "go leclerc" are the same text
+NORMALIZE_REGEX = re.compile(r"[^\w\s]|_", re.UNICODE)
+SPACES_REGEX = re.compile(r"\s+")
+# Shingles hashed together: the intermediate matrix stays at SIGNATURE_BLOCK x num_perm whatever the length of the text
+SIGNATURE_BLOCK = 1024
+
+
+def normalize_text(text):
+    return SPACES_REGEX.sub(" ", NORMALIZE_REGEX.sub(" ", text.lower())).strip()
+
+
+def shingles(text, size=5):
+    """
+    Splits a normalized text into overlapping character shingles (a text shorter than `size` is a single shingle).
+
+    Returns:
+        set: The shingles.
+    """
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class NearDuplicateIndex:
+    """
+    Streaming near-duplicate detector for the texts that reach the consumer.
+    Every text gets a MinHash signature; signatures are split into bands and indexed (LSH), so a new text
+    is only compared with the clusters that share at least one band with it. A candidate is accepted when
+    the Jaccard similarity estimated by the signatures is at least `threshold`.
+
+    Every cluster keeps the label of its representative (the first text scored), which is copied to the
+    other members without running the model again. The index is bounded both in size (least recently
+    matched clusters are evicted first) and in time (clusters not matched for `window_seconds` expire).
+
+    Args:
+        threshold (float): Minimum estimated Jaccard similarity between the shingles of two near-duplicates.
+        num_perm (int): Number of permutations of the MinHash signature.
+        bands (int): Number of LSH bands (num_perm must be a multiple of it).
+        max_clusters (int): Maximum number of clusters kept in the index.
+        window_seconds (int): Clusters not matched for this time are removed (0: no time window).
+        shingle_size (int): Number of characters of every shingle.
+        seed (int): Seed of the permutations, the same for every consumer.
+    """
+
+    def __init__(self, threshold=0.8, num_perm=128, bands=32, max_clusters=50000, window_seconds=3600, shingle_size=5, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_clusters = max_clusters
+        self.window_seconds = window_seconds
+        self.shingle_size = shingle_size
+        generator = np.random.RandomState(seed)
+        # Parameters of the hash functions (a * x + b) mod p that simulate the permutations
+        self._a = generator.randint(1, MAX_HASH, size=num_perm, dtype=np.uint64)
+        self._b = generator.randint(0, MAX_HASH, size=num_perm, dtype=np.uint64)
+        self._clusters = OrderedDict() # cluster id -> [signature, label, last match time], least recently matched first
+        self._buckets = {} # (band, band bytes) -> set of cluster ids
+        self.lookups = 0
+        self.duplicates = 0
+
+    def signature(self, text):
+        """
+        Computes the MinHash signature of a text.
+
+        Returns:
+            numpy.ndarray: The signature (num_perm unsigned integers), None if the normalized text is shorter than
+                           a shingle (e.g. only emojis or punctuation), since such texts cannot be told apart.
+        """
+        normalized = normalize_text(text)
+        if len(normalized) < self.shingle_size:
+            return None
+        hashes = np.array([zlib.crc32(s.encode("utf-8")) for s in shingles(normalized, self.shingle_size)], dtype=np.uint64)
+        signature = np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+        for start in range(0, len(hashes), SIGNATURE_BLOCK):
+            # a < 2^32 and hashes < 2^32, so the products never overflow 64 bits
+            permuted = (np.outer(hashes[start:start + SIGNATURE_BLOCK], self._a) + self._b) % MERSENNE_PRIME & MAX_HASH
+            np.minimum(signature, permuted.min(axis=0), out=signature)
+        return signature
+
+    def _band_keys(self, signature):
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def _expire(self, now):
+        while self._clusters:
+            cluster_id, (_, _, last_seen) = next(iter(self._clusters.items()))
+            if len(self._clusters) <= self.max_clusters and (not self.window_seconds or now - last_seen <= self.window_seconds):
+                break
+            self._remove(cluster_id)
+
+    def _remove(self, cluster_id):
+        signature, _, _ = self._clusters.pop(cluster_id)
+        for key in self._band_keys(signature):
+            members = self._buckets.get(key)
+            if members:
+                members.discard(cluster_id)
+                if not members:
+                    del self._buckets[key]
+
+    def find(self, text):
+        """
+        Looks for the cluster of a near-duplicate of the text.
+
+        Args:
+            text (str): The text to look up.
+
+        Returns:
+            tuple: (cluster id, label of the representative, signature); the cluster id and the label are None
+                   when the text has no near-duplicate in the index, and everything is None when the text is
+                   too short to be compared (it must be scored and not added to the index).
+        """
+        now = time.time()
+        self._expire(now)
+        signature = self.signature(text)
+        if signature is None:
+            return None, None, None
+        self.lookups += 1
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates.update(self._buckets.get(key, ()))
+
+        best_id, best_similarity = None, 0
+        for cluster_id in candidates:
+            similarity = float(np.mean(self._clusters[cluster_id][0] == signature))
+            if similarity >= self.threshold and similarity > best_similarity:
+                best_id, best_similarity = cluster_id, similarity
+        if best_id is None:
+            return None, None, signature
+
+        self.duplicates += 1
+        cluster = self._clusters[best_id]
+        cluster[2] = now
+        self._clusters.move_to_end(best_id)
+        return best_id, cluster[1], signature
+
+    def add(self, cluster_id, signature, label):
+        """
+        Adds a new cluster, whose representative was just scored.
+
+        Args:
+            cluster_id (str): Id of the cluster (the content_id of the representative).
+            signature (numpy.ndarray): The signature returned by find.
+            label (str): The sentiment of the representative, copied to the future members.
+        """
+        if cluster_id in self._clusters:
+            self._remove(cluster_id)
+        self._clusters[cluster_id] = [signature, label, time.time()]
+        for key in self._band_keys(signature):
+            self._buckets.setdefault(key, set()).add(cluster_id)
+        self._expire(time.time())
+
+    def print_stats(self):
+        rate = f"{self.duplicates / self.lookups:.1%}" if self.lookups else "n/a"
+        print(f"Near-duplicates: {self.duplicates} of {self.lookups} texts reused the label of a cluster ({rate}), "
+              f"{len(self._clusters)} clusters in the index.")
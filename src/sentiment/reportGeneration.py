@@ -0,0 +1,337 @@
+import requests, json
+import matplotlib
+matplotlib.use("Agg") #headless backend: the charts are only saved to files, also by the worker processes
+import matplotlib.pyplot as plt
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import base64
+import multiprocessing
+import os
+import tempfile
+from dotenv import load_dotenv
+from wordcloud import WordCloud, STOPWORDS
+from nltk.corpus import stopwords
+
+#loading of environment variables
+load_dotenv()
+
+GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+
+# Defines the ordered sentiment labels for clarity
+ordered_sentiments = ["Very Negative", "Negative", "Neutral", "Positive", "Very Positive"]
+
+# Colors of the sentiment categories, in the same order as ordered_sentiments
+colors = ["darkred", "red", "gray", "lightgreen", "green"]
+sentiment_to_index = {s: i for i, s in enumerate(ordered_sentiments)}
+
+_stopwords = None # built on first use, or received from the parent by the rendering workers
+
+def get_stopwords():
+    """
+    Builds the multilingual stopword set used by the word clouds.
+    The set is built once per process and then reused by every report.
+
+    Returns:
+        frozenset: The stopwords.
+    """
+    global _stopwords
+    if _stopwords is not None:
+        return _stopwords
+    # Prepare stopwords for Word Clouds
+    my_stopwords = set(STOPWORDS) # Default English stopwords
+    # Add stopwords from NLTK for multiple languages
+    my_stopwords.update(stopwords.words('english'))
+    my_stopwords.update(stopwords.words('italian'))
+    my_stopwords.update(stopwords.words('french'))
+    my_stopwords.update(stopwords.words('spanish'))
+    my_stopwords.update(stopwords.words('german'))
+    my_stopwords.update(stopwords.words('portuguese'))
+
+    # Add custom stopwords relevant to the context
+    custom_stopwords = {"post", "comment", "reddit", "youtube", "video", "watch", "link", "https", "http"}
+    my_stopwords.update(custom_stopwords)
+    _stopwords = frozenset(my_stopwords)
+    return _stopwords
+
+def save_figure(path):
+    """
+    Saves the current figure atomically: it is written to a temporary file in the same directory
+    and then renamed, so a report directory never contains half-written images.
+
+    Args:
+        path (str): The path of the image.
+    """
+    fd, tmp_path = tempfile.mkstemp(suffix=".png", dir=os.path.dirname(path) or ".")
+    os.close(fd)
+    try:
+        plt.savefig(tmp_path, format="png")
+        os.replace(tmp_path, path)
+    finally:
+        plt.close() # Close the plot to free up memory
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def render_item_bar_chart(sentiments_for_report, source_type, path):
+    #Prepare data for the bar chart
+    labels = [f"Item {i+1}" for i in range(len(sentiments_for_report))]
+    y_values = [sentiment_to_index.get(s, 2) for s in sentiments_for_report]
+
+    # Define colors for sentiment categories
+    plt.figure(figsize=(max(10, len(sentiments_for_report) * 0.8), 8)) # Dynamic figure size
+    bar_colors = [colors[sentiment_to_index.get(s, 2)] for s in sentiments_for_report]
+
+    # Generate Sentiment Bar Chart
+    bars = plt.bar(labels, y_values, color=bar_colors)
+    plt.yticks(ticks=range(len(ordered_sentiments)), labels=ordered_sentiments)# Set y-axis ticks and labels
+    plt.title(f"Sentiment ranked by Content ({source_type})")
+    plt.ylabel("Sentiment")
+    plt.xlabel(f"Content {source_type}")
+    plt.xticks(rotation=45, ha='right', fontsize=8) #Rotate x-axis labels for readability
+
+    # Add sentiment labels on top of the bars
+    for bar, sentiment in zip(bars, sentiments_for_report):
+        plt.text(bar.get_x() + bar.get_width() / 2, bar.get_height(), sentiment, ha='center', va='bottom', fontsize=7)
+
+    plt.tight_layout()# Adjust layout to prevent labels from overlapping
+    save_figure(path)
+
+def render_count_bar_chart(sentiment_counts, source_type, path):
+    # Generate Sentiment Bar Chart (number of contents for each class)
+    plt.figure(figsize=(10, 6))
+    bars = plt.bar(ordered_sentiments, [sentiment_counts.get(s, 0) for s in ordered_sentiments], color=colors)
+    for bar in bars:
+        plt.text(bar.get_x() + bar.get_width() / 2, bar.get_height(), int(bar.get_height()), ha='center', va='bottom', fontsize=8)
+    plt.title(f"Sentiment distribution by Content ({source_type})")
+    plt.ylabel("Number of contents")
+    plt.xlabel("Sentiment")
+    plt.tight_layout()
+    save_figure(path)
+
+def render_pie_chart(sentiment_counts, source_type, path):
+    # Generate Sentiment Pie Chart; sentiment_counts is a list of (sentiment, count) pairs
+    labels = [s for s, n in sentiment_counts if n]
+    values = [n for _, n in sentiment_counts if n]
+    plt.figure(figsize=(6, 6))
+    plt.pie(values, labels=labels, autopct='%1.1f%%', colors=[colors[sentiment_to_index.get(s, 2)] for s in labels])
+    plt.title(f"Distribuzione del Sentiment ({source_type})")
+    save_figure(path)
+
+def render_timeline_chart(timeline, source_type, path):
+    # Generate the stacked bar chart of the sentiment over time
+    buckets = list(timeline.keys())
+    plt.figure(figsize=(max(10, len(buckets) * 0.3), 6))
+    bottom = [0] * len(buckets)
+    for sentiment in ordered_sentiments:
+        values = [timeline[b].get(sentiment, 0) for b in buckets]
+        plt.bar(buckets, values, bottom=bottom, color=colors[sentiment_to_index[sentiment]], label=sentiment)
+        bottom = [x + y for x, y in zip(bottom, values)]
+    plt.title(f"Sentiment over time ({source_type})")
+    plt.ylabel("Number of contents")
+    plt.xticks(rotation=45, ha='right', fontsize=7)
+    plt.legend()
+    plt.tight_layout()
+    save_figure(path)
+
+def render_wordcloud(sentiment, source_type, path, text=None, frequencies=None):
+    # Create a WordCloud object, from the raw text or from pre-computed word frequencies
+    wc = WordCloud(width=600, height=400, background_color='white', stopwords=get_stopwords())
+    wc = wc.generate(text) if text is not None else wc.generate_from_frequencies(frequencies)
+    plt.figure(figsize=(6, 4))
+    plt.imshow(wc, interpolation='bilinear')
+    plt.axis('off')
+    plt.title(f"Word Cloud - {sentiment} ({source_type})")
+    save_figure(path)
+
+def plan_report(texts_for_wordcloud, sentiments_for_report, source_type, report_dir):
+    """
+    Lists the artifacts of the report of a platform built from every item: bar chart, pie chart and word clouds.
+
+    Returns:
+        list: The rendering tasks, as (function, args) tuples.
+    """
+    if not sentiments_for_report:
+        print(f"No sentiment data to generate the report {source_type}.")
+        return []
+    tasks = [
+        (render_item_bar_chart, (sentiments_for_report, source_type, os.path.join(report_dir, f"sentiment_class_bar_chart_{source_type}.png"))),
+        # Count occurrences of each sentiment
+        (render_pie_chart, (list(Counter(sentiments_for_report).items()), source_type, os.path.join(report_dir, f"sentiment_pie_chart_{source_type}.png")))
+    ]
+
+    # Group texts by sentiment for individual word clouds
+    all_texts_map = {}
+    for t, s in zip(texts_for_wordcloud, sentiments_for_report):
+        if s not in all_texts_map:
+            all_texts_map[s] = []
+        all_texts_map[s].append(t)
+
+    # Generate Word Clouds for each sentiment category
+    for sentiment in ordered_sentiments:
+        if sentiment in all_texts_map:
+            text_concat_for_wc = " ".join(all_texts_map[sentiment])
+            if not text_concat_for_wc.strip(): # Skip if no text for this sentiment
+                continue
+            tasks.append((render_wordcloud, (sentiment, source_type, os.path.join(report_dir, f"wordcloud_{sentiment}_{source_type}.png"), text_concat_for_wc)))
+    return tasks
+
+def plan_report_from_counts(sentiment_counts, word_frequencies, source_type, report_dir, timeline=None):
+    """
+    Lists the artifacts of the report of a platform built from pre-aggregated counts (e.g. computed by MongoDB):
+    bar chart and pie chart of the distribution, optional stacked bar chart over time, and word clouds.
+
+    Args:
+        sentiment_counts (dict): Number of items for each sentiment label.
+        word_frequencies (dict): For each sentiment label, a dictionary {word: frequency}.
+        source_type (str): The type of content (e.g., "YouTube", "Reddit") for naming files and titles.
+        report_dir (str): The directory where the images are saved.
+        timeline (dict): Optional {time bucket: {sentiment: count}}, ordered by time bucket.
+
+    Returns:
+        list: The rendering tasks, as (function, args) tuples.
+    """
+    if not sentiment_counts:
+        print(f"No sentiment data to generate the report {source_type}.")
+        return []
+    tasks = [
+        (render_count_bar_chart, (sentiment_counts, source_type, os.path.join(report_dir, f"sentiment_class_bar_chart_{source_type}.png"))),
+        (render_pie_chart, ([(s, sentiment_counts.get(s, 0)) for s in ordered_sentiments], source_type, os.path.join(report_dir, f"sentiment_pie_chart_{source_type}.png")))
+    ]
+    if timeline:
+        tasks.append((render_timeline_chart, (timeline, source_type, os.path.join(report_dir, f"sentiment_timeline_{source_type}.png"))))
+    for sentiment in ordered_sentiments:
+        if word_frequencies.get(sentiment):
+            tasks.append((render_wordcloud, (sentiment, source_type, os.path.join(report_dir, f"wordcloud_{sentiment}_{source_type}.png"), None, word_frequencies[sentiment])))
+    return tasks
+
+def _init_render_worker(stopwords_set):
+    global _stopwords
+    _stopwords = stopwords_set
+
+def _run_task(task):
+    function, args = task
+    function(*args)
+    return args[2] # every rendering function takes the output path as third argument
+
+def render_artifacts(tasks, report_dir, max_workers=None):
+    """
+    Renders every artifact of one or more reports in a pool of processes, so the total time is about
+    the time of the slowest artifact instead of the sum of all of them.
+
+    Args:
+        tasks (list): The rendering tasks, as returned by plan_report and plan_report_from_counts.
+        report_dir (str): The directory where the images are saved (created if missing).
+        max_workers (int): Number of processes (default: one per artifact, at most one per core).
+
+    Returns:
+        list: The paths of the images rendered successfully.
+    """
+    if not tasks:
+        return []
+    os.makedirs(report_dir, exist_ok=True)
+    rendered = []
+    # Spawned workers (not forked: the consumer has live threads and connections) start from a fresh interpreter,
+    # so the stopwords are built once here and handed to each of them
+    with ProcessPoolExecutor(max_workers=max_workers or min(len(tasks), os.cpu_count() or 1),
+                             mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_render_worker, initargs=(get_stopwords(),)) as executor:
+        futures = [executor.submit(_run_task, task) for task in tasks]
+        for future, (_, args) in zip(futures, tasks):
+            try:
+                rendered.append(future.result())
+            except Exception as e:
+                print(f"Error rendering {args[2]}: {e}")
+    print(f"{len(rendered)} report images saved in {report_dir}.")
+    return rendered
+
+def generate_reports(platform_data, report_dir="."):
+    """
+    Generates the sentiment analysis reports of several platforms at once (bar charts, pie charts and word clouds),
+    rendering all their images in parallel.
+
+    Args:
+        platform_data (dict): {source_type: (texts_for_wordcloud, sentiments_for_report)}, e.g. {"YouTube": (...), "Reddit": (...)}.
+        report_dir (str): The directory where the images are saved.
+    """
+    tasks = []
+    for source_type, (texts_for_wordcloud, sentiments_for_report) in platform_data.items():
+        tasks.extend(plan_report(texts_for_wordcloud, sentiments_for_report, source_type, report_dir))
+    return render_artifacts(tasks, report_dir)
+
+def generate_report(texts_for_wordcloud, sentiments_for_report, source_type="General", report_dir="."):
+    """
+    Generates sentiment analysis reports including bar charts, pie charts, and word clouds.
+    
+    Args:
+        source_type (str): The type of content (e.g., "YouTube", "Reddit") for naming files and titles.
+        report_dir (str): The directory where the images are saved.
+    """
+    return generate_reports({source_type: (texts_for_wordcloud, sentiments_for_report)}, report_dir)
+
+def generate_report_from_counts(sentiment_counts, word_frequencies, source_type="General", report_dir=".", timeline=None):
+    """
+    Generates the sentiment analysis report from pre-aggregated counts (see plan_report_from_counts).
+    """
+    return render_artifacts(plan_report_from_counts(sentiment_counts, word_frequencies, source_type, report_dir, timeline), report_dir)
+
+def summarizationGemini(source_type="General", report_dir="."):
+    """
+    Generates a summary of the sentiment analysis reports using the Google Gemini Vision API,
+    by sending the generated charts as images.
+    
+    Args:
+        source_type (str): The type of content (e.g., "YouTube", "Reddit") for summary context.
+        report_dir (str): The directory where the images were saved.
+
+    Returns:
+        str: The summary, or None if it could not be generated.
+    """
+    bar_chart_path = os.path.join(report_dir, f"sentiment_class_bar_chart_{source_type}.png")
+    pie_chart_path = os.path.join(report_dir, f"sentiment_pie_chart_{source_type}.png")
+
+    try:
+        # Encode the generated chart images to base64 for sending to Gemini API
+        with open(bar_chart_path, "rb") as istogramma_sentiment:
+            istogramma_sentiment_base64 = base64.b64encode(istogramma_sentiment.read()).decode('utf-8')
+        with open(pie_chart_path, "rb") as torta_sentiment:
+            torta_sentiment_base64 = base64.b64encode(torta_sentiment.read()).decode('utf-8')
+        # Define the query for Gemini to summarize the charts
+        query = f"""
+            Ti fornirò due grafici (a barre e a torta) che mostrano i risultati di un'analisi del sentiment sui contenuti {source_type} relativi al GP di Monaco 2025.
+            Il tuo compito è analizzare **esclusivamente** questi grafici e produrre un'analisi **descrittiva e fattuale** dei risultati.
+            Il riassunto deve includere:
+
+            1.  **Distribuzione Generale:** Descrivi come si distribuiscono i sentiment (molto negativo, negativo, neutro, positivo, molto positivo), indicando le proporzioni percentuali visibili nel grafico a torta.
+            2.  **Sentiment Dominante:** Identifica chiaramente qual è il sentiment più comune e quale il meno comune.
+            3.  **Tendenze e Picchi:** Basandoti sul grafico a barre (se applicabile) e sulla torta, evidenzia se ci sono picchi significativi (ad esempio, una predominanza schiacciante di un sentiment o una presenza notevole dei sentimenti estremi 'Very Positive' o 'Very Negative').
+            4.  **Insight Fattuali:** Riporta qualsiasi osservazione oggettiva che puoi dedurre **direttamente** dai grafici, senza fare ipotesi esterne o dare consigli. Ad esempio: "Si osserva una polarizzazione se i sentimenti estremi sono alti" oppure "La maggioranza dei contenuti genera reazioni neutrali".
+
+            **IMPORTANTE:** Non includere NESSUN suggerimento, NESSUNA raccomandazione, NESSUN consiglio di marketing o comunicazione e NESSUN piano d'azione. La tua risposta deve essere **solo** un'analisi oggettiva di ciò che i grafici mostrano. La lingua deve essere inglese.
+            """
+        # Send the request to Gemini Vision API with the query and image data
+        res = requests.post(
+            f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}",
+            headers={"Content-Type": "application/json"},
+            data=json.dumps({"contents": [{"parts": [
+                {"text": query},
+                {"inline_data": {"mime_type": "image/png", "data": istogramma_sentiment_base64}},
+                {"inline_data": {"mime_type": "image/png", "data": torta_sentiment_base64}}
+            ]}]})
+        )
+        res.raise_for_status()
+        output = res.json()
+        # Extract the summary text from Gemini's response and clean up markdown
+        response_extracted_words = output.get('candidates', [{}])[0].get('content', {}).get('parts', [{}])[0].get('text', '')
+        res_new = response_extracted_words.replace("```json", "").replace("```", "")
+        print(f"\n--- Gemini summary for {source_type} ---")
+        print(res_new)
+        print(f"--- End Gemini summary for {source_type} ---\n")
+        return res_new
+    except FileNotFoundError:
+        print(f"Error: Graphics files not found for {source_type}. Make sure reports have been generated before calling Gemini.")
+    except requests.exceptions.RequestException as e:
+        print(f"Gemini request error for summarization: {e}")
+    except json.JSONDecodeError as e:
+        print(f"Error parsing JSON from Gemini response for summarization: {e}")
+    except Exception as e:
+        print(f"Generic error during Gemini summarization for {source_type}: {e}")
+    return None
@@ -0,0 +1,278 @@
+"""
+Sentiment reports built from the documents saved in F1Hackathon.SocialData, with server-side aggregation
+pipelines, for any time window (e.g. the in-race or post-race phase). Unlike the report generated when the
+consumer stops, it does not depend on what a consumer process kept in memory, and the client only receives
+aggregated counts (word clouds are built from a streamed cursor with a bounded vocabulary).
+
+Example:
+    python -m src.sentiment.reportMongo --phase in_race --start 2025-05-25T13:00:00 --end 2025-05-25T15:00:00
+    python -m src.sentiment.reportMongo --phase post_race --start 2025-05-25T15:00:00 --platform Reddit --summarize
+"""
+
+import argparse
+import os
+import re
+import sys
+from collections import Counter, defaultdict
+from datetime import datetime
+
+import pytz
+from dotenv import load_dotenv
+from pymongo import MongoClient, ASCENDING
+from pymongo.errors import OperationFailure
+
+#the project root is added to the path so that the src package can be imported when the script is launched directly
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from src.sentiment.reportGeneration import plan_report_from_counts, render_artifacts, get_stopwords, summarizationGemini, ordered_sentiments
+
+load_dotenv()
+
+# Length of the ISO publish_date prefix that identifies a time bucket ('2025-05-25T13:07' for a minute)
+BUCKET_PREFIX_LENGTH = {'minute': 16, 'hour': 13, 'day': 10}
+WORD_REGEX = re.compile(r"\w{3,}", re.UNICODE)
+
+
+def ensure_unique_content_id(collection):
+    """
+    Makes content_id unique, so concurrent upserts of the same item by different consumers cannot insert it twice.
+    A non-unique index left by older versions is replaced; if the collection already holds duplicates the
+    non-unique index is kept and a warning is printed.
+
+    Args:
+        collection (pymongo.collection.Collection): The SocialData collection.
+    """
+    for name, info in collection.index_information().items():
+        if info['key'] == [('content_id', ASCENDING)] and not info.get('unique'):
+            collection.drop_index(name)
+    try:
+        collection.create_index([('content_id', ASCENDING)], unique=True)
+    except OperationFailure as e:
+        print(f"Unique index on content_id not created ({e}): remove the duplicated documents and restart.")
+        collection.create_index([('content_id', ASCENDING)])
+
+
+def ensure_indexes(collection):
+    """
+    Creates the indexes used by the report pipelines (creating an existing index does nothing).
+
+    Args:
+        collection (pymongo.collection.Collection): The SocialData collection.
+    """
+    ensure_unique_content_id(collection)
+    # Time window and platform first, so every pipeline starts with an index range scan
+    collection.create_index([('social_media', ASCENDING), ('publish_date', ASCENDING), ('sentiment', ASCENDING)])
+    collection.create_index([('publish_date', ASCENDING), ('sentiment', ASCENDING)])
+    collection.create_index([('reference_post_url', ASCENDING), ('sentiment', ASCENDING)])
+
+
+def to_iso(value):
+    """
+    Converts a date (datetime or ISO string, UTC if no timezone is given) into the format of publish_date.
+
+    Args:
+        value (str or datetime): The date.
+
+    Returns:
+        str: The ISO date in UTC, e.g. '2025-05-25T13:00:00+00:00'.
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=pytz.utc)
+    return value.astimezone(pytz.utc).isoformat()
+
+
+def build_match(start=None, end=None, social_media=None):
+    """
+    Builds the $match stage of a time window and platform.
+    publish_date is stored as an ISO string in UTC, so the window is a plain (indexed) string range.
+
+    Args:
+        start (str or datetime): Beginning of the window (included), None for no limit.
+        end (str or datetime): End of the window (excluded), None for no limit.
+        social_media (str): 'YouTube' or 'Reddit', None for both.
+
+    Returns:
+        dict: The $match stage.
+    """
+    match = {'sentiment': {'$ne': None}}
+    if social_media:
+        match['social_media'] = social_media
+    if start or end:
+        match['publish_date'] = {}
+        if start:
+            match['publish_date']['$gte'] = to_iso(start)
+        if end:
+            match['publish_date']['$lt'] = to_iso(end)
+    return {'$match': match}
+
+
+def sentiment_counts(collection, match):
+    """
+    Returns:
+        dict: {platform: {sentiment: number of contents}}
+    """
+    pipeline = [match, {'$group': {'_id': {'social_media': '$social_media', 'sentiment': '$sentiment'}, 'count': {'$sum': 1}}}]
+    counts = defaultdict(dict)
+    for row in collection.aggregate(pipeline, allowDiskUse=True):
+        counts[row['_id']['social_media']][row['_id']['sentiment']] = row['count']
+    return dict(counts)
+
+
+def sentiment_timeline(collection, match, bucket='minute'):
+    """
+    Returns:
+        dict: {platform: {time bucket: {sentiment: number of contents}}}, ordered by time bucket.
+    """
+    pipeline = [
+        match,
+        {'$group': {
+            '_id': {
+                'social_media': '$social_media',
+                'bucket': {'$substrCP': ['$publish_date', 0, BUCKET_PREFIX_LENGTH[bucket]]},
+                'sentiment': '$sentiment'
+            },
+            'count': {'$sum': 1}
+        }},
+        {'$sort': {'_id.bucket': 1}}
+    ]
+    timeline = defaultdict(dict)
+    for row in collection.aggregate(pipeline, allowDiskUse=True):
+        key = row['_id']
+        timeline[key['social_media']].setdefault(key['bucket'], {})[key['sentiment']] = row['count']
+    return dict(timeline)
+
+
+def top_contents(collection, match, limit=20):
+    """
+    Returns:
+        list: The videos/posts with most classified contents, as dictionaries with
+              'reference_post_url', 'social_media', 'total' and the count of every sentiment.
+    """
+    pipeline = [
+        match,
+        {'$group': {'_id': {'url': '$reference_post_url', 'social_media': '$social_media', 'sentiment': '$sentiment'}, 'count': {'$sum': 1}}},
+        {'$group': {
+            '_id': {'url': '$_id.url', 'social_media': '$_id.social_media'},
+            'total': {'$sum': '$count'},
+            'sentiments': {'$push': {'k': '$_id.sentiment', 'v': '$count'}}
+        }},
+        {'$sort': {'total': -1}},
+        {'$limit': limit}
+    ]
+    contents = []
+    for row in collection.aggregate(pipeline, allowDiskUse=True):
+        content = {'reference_post_url': row['_id']['url'], 'social_media': row['_id']['social_media'], 'total': row['total']}
+        content.update({item['k']: item['v'] for item in row['sentiments']})
+        contents.append(content)
+    return contents
+
+
+def word_frequencies(collection, match, my_stopwords, max_words=20000):
+    """
+    Counts the words of the texts for every platform and sentiment, reading the documents with a cursor.
+    The vocabulary is pruned to the most frequent words whenever it grows too much, so the client memory
+    stays bounded whatever the number of documents.
+
+    Returns:
+        dict: {platform: {sentiment: {word: frequency}}}
+    """
+    frequencies = defaultdict(lambda: defaultdict(Counter))
+    projection = {'_id': 0, 'social_media': 1, 'sentiment': 1, 'comment_raw_text': 1, 'comments.comment_raw_text': 1}
+    cursor = collection.find(match['$match'], projection, batch_size=1000)
+    for doc in cursor:
+        texts = [doc.get('comment_raw_text') or '']
+        texts.extend(c.get('comment_raw_text') or '' for c in doc.get('comments', []))
+        counter = frequencies[doc.get('social_media')][doc.get('sentiment')]
+        for text in texts:
+            counter.update(w for w in WORD_REGEX.findall(text.lower()) if w not in my_stopwords)
+        if len(counter) > 2 * max_words:
+            pruned = Counter(dict(counter.most_common(max_words)))
+            counter.clear()
+            counter.update(pruned)
+    return {platform: {sentiment: dict(c.most_common(200)) for sentiment, c in by_sentiment.items()}
+            for platform, by_sentiment in frequencies.items()}
+
+
+def write_markdown_summary(path, phase, start, end, counts, contents, summaries):
+    lines = [f"# Sentiment report - {phase}", "", f"Window: {start or '-'} / {end or '-'}", ""]
+    for platform, by_sentiment in counts.items():
+        total = sum(by_sentiment.values())
+        lines += [f"## {platform} ({total} contents)", "", "| Sentiment | Contents | % |", "|---|---|---|"]
+        for sentiment in ordered_sentiments:
+            n = by_sentiment.get(sentiment, 0)
+            lines.append(f"| {sentiment} | {n} | {n / total:.1%} |")
+        lines.append("")
+        if summaries.get(platform):
+            lines += [summaries[platform].strip(), ""]
+    lines += ["## Top contents", "", "| Content | Platform | Total | " + " | ".join(ordered_sentiments) + " |",
+              "|---|---|---|" + "---|" * len(ordered_sentiments)]
+    for c in contents:
+        lines.append(f"| {c['reference_post_url']} | {c['social_media']} | {c['total']} | "
+                     + " | ".join(str(c.get(s, 0)) for s in ordered_sentiments) + " |")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def generate_mongo_report(collection, phase, start=None, end=None, platform=None, bucket='minute', summarize=False, report_dir=None):
+    """
+    Generates the report of a time window from MongoDB: charts and word clouds for every platform,
+    a markdown summary with the distributions and the top videos/posts, and optionally the Gemini summary.
+
+    Args:
+        collection (pymongo.collection.Collection): The SocialData collection.
+        phase (str): Name of the report (e.g. 'in_race', 'post_race'), used for the directory.
+        start (str or datetime): Beginning of the window, None for no limit.
+        end (str or datetime): End of the window, None for no limit.
+        platform (str): 'YouTube' or 'Reddit', None for both.
+        bucket (str): Time bucket of the timeline: 'minute', 'hour' or 'day'.
+        summarize (bool): Ask Gemini for a textual analysis of the charts.
+        report_dir (str): Output directory (default: reports/report_<phase>).
+    """
+    report_dir = report_dir or os.path.join("reports", f"report_{phase}")
+    os.makedirs(report_dir, exist_ok=True)
+    ensure_indexes(collection)
+    match = build_match(start, end, platform)
+
+    counts = sentiment_counts(collection, match)
+    if not counts:
+        print(f"No classified contents found for {phase} in the window {start} - {end}.")
+        return
+    timeline = sentiment_timeline(collection, match, bucket)
+    words = word_frequencies(collection, match, get_stopwords())
+
+    # The images of every platform are rendered together, in parallel
+    tasks = []
+    for source_type, by_sentiment in counts.items():
+        print(f"\nReport generation for {source_type} ({sum(by_sentiment.values())} contents)...")
+        tasks.extend(plan_report_from_counts(by_sentiment, words.get(source_type, {}), source_type, report_dir, timeline.get(source_type)))
+    render_artifacts(tasks, report_dir)
+
+    summaries = {}
+    if summarize:
+        for source_type in counts:
+            summaries[source_type] = summarizationGemini(source_type, report_dir)
+
+    write_markdown_summary(os.path.join(report_dir, f"report_{phase}.md"), phase, start, end, counts,
+                           top_contents(collection, match), summaries)
+    print(f"Report {phase} saved in {report_dir}.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sentiment report of a time window, aggregated by MongoDB.")
+    parser.add_argument("--phase", required=True, help="name of the report, e.g. in_race or post_race")
+    parser.add_argument("--start", help="beginning of the window (ISO date, UTC if no timezone)")
+    parser.add_argument("--end", help="end of the window (ISO date, UTC if no timezone)")
+    parser.add_argument("--platform", choices=['YouTube', 'Reddit'], help="only one platform")
+    parser.add_argument("--bucket", choices=list(BUCKET_PREFIX_LENGTH.keys()), default='minute', help="time bucket of the timeline")
+    parser.add_argument("--summarize", action="store_true", help="ask Gemini for a textual analysis of the charts")
+    parser.add_argument("--report-dir", help="output directory (default: reports/report_<phase>)")
+    args = parser.parse_args()
+
+    client_mongo = MongoClient(os.getenv('MONGO_CONNECTION_STRING') or os.getenv('MONGO_CONNECION_STRING'))
+    collection = client_mongo['F1Hackathon']['SocialData']
+    generate_mongo_report(collection, args.phase, args.start, args.end, args.platform, args.bucket, args.summarize, args.report_dir)
+
+
+if __name__ == '__main__':
+    main()
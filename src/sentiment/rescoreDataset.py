@@ -0,0 +1,201 @@
+"""
+Offline re-scoring of the historical datasets (e.g. data/finalDataset.csv, data/reddit_data_*.csv),
+for example after a model change. The input is streamed in chunks, every chunk is scored by the
+local model (batched, one process per core) or by Gemini (parallel requests), and the progress is
+saved as the byte offset of the input after every chunk, so an interrupted run resumes where it stopped.
+The MongoDB output goes to SocialDataRescored by default: the live SocialData collection is written only
+with --overwrite-live.
+
+Example:
+    python -m src.sentiment.rescoreDataset data/finalDataset.csv --backend local --output parquet
+"""
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+import pytz
+
+#the project root is added to the path so that the src package can be imported when the script is launched directly
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from src.utils.utilsDataset import read_csv_chunks
+
+# Collection written by the consumer, and the default one of the re-scored rows (flat rows, not consumer documents)
+LIVE_COLLECTION = 'SocialData'
+RESCORED_COLLECTION = 'SocialDataRescored'
+
+
+def _init_local_worker():
+    import torch
+    # Every process uses a single core: parallelism comes from the pool of processes
+    torch.set_num_threads(1)
+
+
+def _score_batch_local(texts):
+    from src.sentiment.sentimentModels import predict_sentiment_youtube
+    return predict_sentiment_youtube(texts)
+
+
+def score_texts(texts, backend, executor, batch_size):
+    """
+    Scores a list of texts, in parallel.
+
+    Args:
+        texts (list): The texts to score; empty texts get no sentiment.
+        backend (str): 'local' for the Hugging Face model, 'gemini' for the Gemini API.
+        executor (concurrent.futures.Executor): The pool that runs the batches (processes) or the requests (threads).
+        batch_size (int): Number of texts scored together by the local model.
+
+    Returns:
+        list: The sentiment labels, None for the empty texts.
+    """
+    indexes = [i for i, t in enumerate(texts) if isinstance(t, str) and t.strip()]
+    valid_texts = [texts[i] for i in indexes]
+    if backend == 'local':
+        batches = [valid_texts[i:i + batch_size] for i in range(0, len(valid_texts), batch_size)]
+        labels = [label for batch in executor.map(_score_batch_local, batches) for label in batch]
+    else:
+        from src.sentiment.sentimentModels import predict_sentiment_reddit
+        labels = list(executor.map(predict_sentiment_reddit, valid_texts))
+
+    results = [None] * len(texts)
+    for i, label in zip(indexes, labels):
+        results[i] = label
+    return results
+
+
+def load_checkpoint(checkpoint_path):
+    if os.path.exists(checkpoint_path):
+        with open(checkpoint_path, "r") as f:
+            checkpoint = json.load(f)
+        # Checkpoints of older versions only kept the number of rows: the input is read again from the first row
+        if 'offset' in checkpoint:
+            return checkpoint
+    return {'offset': 0, 'rows_done': 0}
+
+
+def save_checkpoint(checkpoint_path, checkpoint):
+    # The checkpoint is replaced atomically, so an interruption never leaves it half-written
+    tmp_path = checkpoint_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def write_parquet(df, output_path, first_offset):
+    # One file per chunk, named after its starting offset: a chunk re-scored after a resume overwrites its own file
+    os.makedirs(output_path, exist_ok=True)
+    # Text columns are always written as strings, so a chunk where a column is empty keeps the same schema as the others
+    counters = ['like_count', 'reply_count', 'repost_count', 'quote_count', 'bookmark_count']
+    df = df.astype({col: 'string' for col in df.columns if col not in counters})
+    df.to_parquet(os.path.join(output_path, f"part-{first_offset:012d}.parquet"), index=False)
+
+
+def write_mongo(df, collection):
+    from pymongo import ReplaceOne
+    # Upserts by content_id, so a chunk re-scored after a resume does not create duplicates
+    documents = json.loads(df.to_json(orient='records'))
+    operations = [ReplaceOne({'content_id': doc['content_id']}, doc, upsert=True) for doc in documents]
+    if operations:
+        collection.bulk_write(operations, ordered=False)
+
+
+def rescore_dataset(input_path, backend='local', output='parquet', output_path=None, collection_name=RESCORED_COLLECTION,
+                    chunksize=1000, batch_size=32, workers=None, checkpoint_path=None, restart=False, overwrite_live=False):
+    """
+    Re-scores a CSV dataset of the common schema, chunk by chunk, with checkpoints.
+
+    Args:
+        input_path (str): The CSV file to score.
+        backend (str): 'local' (Hugging Face model) or 'gemini'.
+        output (str): 'parquet' (one file per chunk in output_path) or 'mongo' (upsert into F1Hackathon.<collection_name>).
+        output_path (str): Output directory for parquet (default: data/rescored/<input name>).
+        collection_name (str): MongoDB collection for the 'mongo' output (default: SocialDataRescored).
+        chunksize (int): Number of rows read, scored and written at a time.
+        batch_size (int): Number of texts scored together by the local model.
+        workers (int): Number of processes (local) or parallel requests (gemini); default: number of cores.
+        checkpoint_path (str): File with the progress of the job (default: next to the output).
+        restart (bool): Ignore an existing checkpoint and start from the first row.
+        overwrite_live (bool): Allow the 'mongo' output to replace the documents of the live collection (SocialData).
+    """
+    if output == 'mongo' and collection_name == LIVE_COLLECTION and not overwrite_live:
+        raise ValueError(f"{LIVE_COLLECTION} is the collection of the live pipeline: pass overwrite_live (--overwrite-live) to replace its documents.")
+
+    input_name = os.path.splitext(os.path.basename(input_path))[0]
+    output_path = output_path or os.path.join("data", "rescored", input_name)
+    checkpoint_path = checkpoint_path or os.path.join("data", "rescored", f"checkpoint_{input_name}_{output}.json")
+    os.makedirs(os.path.dirname(checkpoint_path) or ".", exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+
+    checkpoint = {'offset': 0, 'rows_done': 0} if restart else load_checkpoint(checkpoint_path)
+    if checkpoint.get('offset'):
+        print(f"Resuming {input_path} from row {checkpoint['rows_done']} (byte {checkpoint['offset']}).")
+
+    collection = None
+    if output == 'mongo':
+        from pymongo import MongoClient
+        client_mongo = MongoClient(os.getenv('MONGO_CONNECTION_STRING') or os.getenv('MONGO_CONNECION_STRING'))
+        collection = client_mongo['F1Hackathon'][collection_name]
+        collection.create_index('content_id')
+
+    if backend == 'local':
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_local_worker)
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers)
+
+    model_name = backend
+    if backend == 'local':
+        from src.sentiment.sentimentModels import hf_model_name
+        model_name = hf_model_name
+
+    first_row = checkpoint['rows_done']
+    first_offset = checkpoint.get('offset', 0)
+    try:
+        with executor:
+            for offset, chunk in read_csv_chunks(input_path, chunksize, start_offset=first_offset):
+                chunk['sentiment'] = score_texts(chunk['comment_raw_text'].tolist(), backend, executor, batch_size)
+                chunk['sentiment_model'] = model_name
+                chunk['rescored_at'] = datetime.now(pytz.utc).isoformat()
+
+                if output == 'mongo':
+                    write_mongo(chunk, collection)
+                else:
+                    write_parquet(chunk, output_path, first_offset)
+
+                rows_done = first_row + len(chunk)
+                checkpoint['offset'] = offset
+                checkpoint['rows_done'] = rows_done
+                save_checkpoint(checkpoint_path, checkpoint)
+                print(f"Rows {first_row}-{rows_done} of {input_path} scored and saved.")
+                first_row, first_offset = rows_done, offset
+    except KeyboardInterrupt:
+        print(f"\nInterrupted: progress saved at row {checkpoint['rows_done']}, run the same command again to resume.")
+        return
+
+    print(f"Re-scoring of {input_path} completed: {checkpoint['rows_done']} rows.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunked, resumable offline re-scoring of a CSV dataset.")
+    parser.add_argument("input", help="CSV file of the common schema (e.g. data/finalDataset.csv)")
+    parser.add_argument("--backend", choices=['local', 'gemini'], default='local', help="model used for the sentiment")
+    parser.add_argument("--output", choices=['parquet', 'mongo'], default='parquet', help="where the results are written")
+    parser.add_argument("--output-path", help="output directory for parquet (default: data/rescored/<input name>)")
+    parser.add_argument("--collection", default=RESCORED_COLLECTION, help="MongoDB collection for the mongo output")
+    parser.add_argument("--overwrite-live", action="store_true", help=f"allow --collection {LIVE_COLLECTION}, replacing the documents of the live pipeline")
+    parser.add_argument("--chunksize", type=int, default=1000, help="rows read and saved at a time")
+    parser.add_argument("--batch-size", type=int, default=32, help="texts scored together by the local model")
+    parser.add_argument("--workers", type=int, help="processes (local) or parallel requests (gemini), default: number of cores")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: data/rescored/checkpoint_<input>_<output>.json)")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start from the first row")
+    args = parser.parse_args()
+
+    rescore_dataset(args.input, args.backend, args.output, args.output_path, args.collection, args.chunksize,
+                    args.batch_size, args.workers, args.checkpoint, args.restart, args.overwrite_live)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""
+Pre-aggregated sentiment rollups in MongoDB (F1Hackathon.SentimentRollups), maintained by the consumer with
+$inc upserts in the same bulk flush that writes the raw documents. There is one rollup document per platform,
+minute (of publish_date, UTC) and video/post, plus one per platform and minute for all the contents ('*'),
+so the distribution of any time range is obtained by merging a few hundred small documents instead of
+scanning the raw comments. Laps are obtained by merging the minute buckets between the lap start times.
+
+Example:
+    python -m src.sentiment.rollupMongo --session in_race 2025-05-25T13:00 2025-05-25T15:00 --session post_race 2025-05-25T15:00 2025-05-25T18:00
+    python -m src.sentiment.rollupMongo --laps <laps file> --platform Reddit
+"""
+
+import argparse
+import json
+import os
+import sys
+from collections import defaultdict
+
+from dotenv import load_dotenv
+from pymongo import MongoClient, UpdateOne, ASCENDING
+
+#the project root is added to the path so that the src package can be imported when the script is launched directly
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from src.sentiment.reportMongo import to_iso
+
+load_dotenv()
+
+ROLLUP_COLLECTION = 'SentimentRollups'
+ALL_CONTENTS = '*'
+MINUTE_PREFIX_LENGTH = 16 # '2025-05-25T13:07'
+
+
+def ensure_rollup_indexes(rollups):
+    """
+    Creates the index used by the range queries (creating an existing index does nothing).
+
+    Args:
+        rollups (pymongo.collection.Collection): The rollup collection.
+    """
+    rollups.create_index([('content', ASCENDING), ('social_media', ASCENDING), ('minute', ASCENDING)])
+
+
+def to_minute(value):
+    # A minute bucket has the format of the first 16 characters of publish_date
+    return to_iso(value)[:MINUTE_PREFIX_LENGTH]
+
+
+def rollup_operations(message_data, sentiment):
+    """
+    Builds the $inc upserts of a newly saved item: the bucket of its platform and minute, and the one of its video/post.
+
+    Args:
+        message_data (dictionary): The element, with 'social_media', 'publish_date' and 'reference_post_url'.
+        sentiment (str): The sentiment label.
+
+    Returns:
+        list: The pymongo UpdateOne operations.
+    """
+    platform = message_data.get('social_media', 'Unknown')
+    minute = (message_data.get('publish_date') or message_data.get('observation_time') or 'unknown')[:MINUTE_PREFIX_LENGTH]
+    contents = [ALL_CONTENTS]
+    if message_data.get('reference_post_url'):
+        contents.append(message_data['reference_post_url'])
+    operations = []
+    for content in contents:
+        operations.append(UpdateOne(
+            {'_id': f"{platform}|{minute}|{content}"},
+            {
+                '$inc': {f"counts.{sentiment}": 1, 'total': 1},
+                '$setOnInsert': {'social_media': platform, 'minute': minute, 'content': content}
+            },
+            upsert=True
+        ))
+    return operations
+
+
+def _bucket_query(start=None, end=None, platform=None, content=None):
+    query = {'content': content or ALL_CONTENTS}
+    if platform:
+        query['social_media'] = platform
+    if start or end:
+        query['minute'] = {}
+        if start:
+            query['minute']['$gte'] = to_minute(start)
+        if end:
+            query['minute']['$lt'] = to_minute(end)
+    return query
+
+
+def timeline(rollups, start=None, end=None, platform=None, content=None):
+    """
+    Returns the minute buckets of a range.
+
+    Args:
+        rollups (pymongo.collection.Collection): The rollup collection.
+        start (str or datetime): Beginning of the range (included), None for no limit.
+        end (str or datetime): End of the range (excluded), None for no limit.
+        platform (str): 'YouTube' or 'Reddit', None for both.
+        content (str): URL of a video/post, None for all the contents.
+
+    Returns:
+        dict: {platform: {minute: {sentiment: count}}}, ordered by minute.
+    """
+    buckets = defaultdict(dict)
+    projection = {'_id': 0, 'social_media': 1, 'minute': 1, 'counts': 1}
+    for doc in rollups.find(_bucket_query(start, end, platform, content), projection).sort('minute', ASCENDING):
+        buckets[doc['social_media']][doc['minute']] = doc.get('counts', {})
+    return dict(buckets)
+
+
+def distribution(rollups, start=None, end=None, platform=None, content=None):
+    """
+    Returns the sentiment distribution of a range, merging its minute buckets.
+
+    Returns:
+        dict: {platform: {sentiment: count}}
+    """
+    merged = defaultdict(lambda: defaultdict(int))
+    for social_media, minutes in timeline(rollups, start, end, platform, content).items():
+        for counts in minutes.values():
+            for sentiment, n in counts.items():
+                merged[social_media][sentiment] += n
+    return {social_media: dict(counts) for social_media, counts in merged.items()}
+
+
+def compare_sessions(rollups, sessions, platform=None):
+    """
+    Returns the distribution of several sessions (e.g. in-race and post-race) for a comparison.
+
+    Args:
+        rollups (pymongo.collection.Collection): The rollup collection.
+        sessions (dict): {session name: (start, end)}.
+        platform (str): 'YouTube' or 'Reddit', None for both.
+
+    Returns:
+        dict: {session name: {platform: {sentiment: count}}}
+    """
+    return {name: distribution(rollups, start, end, platform) for name, (start, end) in sessions.items()}
+
+
+def distribution_by_laps(rollups, lap_starts, platform=None):
+    """
+    Returns the sentiment distribution of every lap, merging the minute buckets between two lap start times.
+    The range is read with a single query.
+
+    Args:
+        rollups (pymongo.collection.Collection): The rollup collection.
+        lap_starts (list): Start time of every lap, in order, followed by the end of the last lap.
+        platform (str): 'YouTube' or 'Reddit', None for both.
+
+    Returns:
+        list: One {platform: {sentiment: count}} for every lap.
+    """
+    bounds = [to_minute(t) for t in lap_starts]
+    laps = [defaultdict(lambda: defaultdict(int)) for _ in range(len(bounds) - 1)]
+    for social_media, minutes in timeline(rollups, lap_starts[0], lap_starts[-1], platform).items():
+        lap = 0
+        for minute, counts in minutes.items():
+            while lap < len(laps) - 1 and minute >= bounds[lap + 1]:
+                lap += 1
+            for sentiment, n in counts.items():
+                laps[lap][social_media][sentiment] += n
+    return [{social_media: dict(counts) for social_media, counts in lap_counts.items()} for lap_counts in laps]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sentiment distributions from the pre-aggregated rollups.")
+    parser.add_argument("--session", nargs=3, action="append", metavar=("NAME", "START", "END"),
+                        help="a session to compare (ISO dates, UTC if no timezone); can be repeated")
+    parser.add_argument("--laps", help="text file with the start time of every lap, one per line, and the end of the last lap")
+    parser.add_argument("--platform", choices=['YouTube', 'Reddit'], help="only one platform")
+    args = parser.parse_args()
+
+    client_mongo = MongoClient(os.getenv('MONGO_CONNECTION_STRING') or os.getenv('MONGO_CONNECION_STRING'))
+    rollups = client_mongo['F1Hackathon'][ROLLUP_COLLECTION]
+    if args.laps:
+        with open(args.laps, "r", encoding="utf-8") as f:
+            lap_starts = [line.strip() for line in f if line.strip()]
+        for i, lap in enumerate(distribution_by_laps(rollups, lap_starts, args.platform), start=1):
+            print(f"Lap {i}: {json.dumps(lap)}")
+    else:
+        sessions = {name: (start, end) for name, start, end in (args.session or [('all', None, None)])}
+        print(json.dumps(compare_sessions(rollups, sessions, args.platform), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,29 @@
 import requests, json, re
-import matplotlib.pyplot as plt
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
-from collections import Counter
-import base64
 import redis
 import time
 import os
+import sys
 from dotenv import load_dotenv
 from redis.commands.json.path import Path
-from wordcloud import WordCloud, STOPWORDS
-import nltk
-from nltk.corpus import stopwords
-from pymongo import MongoClient
+from pymongo import MongoClient, ReplaceOne
+from pymongo.errors import BulkWriteError
+
+#the project root is added to the path so that the src package can be imported when the script is launched directly
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from src.sentiment.sentimentModels import (ordered_sentiments, load_local_model, count_tokens, predict_probabilities_local,
+                                           predict_sentiment_youtube, predict_sentiment_reddit)
+from src.sentiment.chunkingReddit import predict_sentiment_thread
+from src.sentiment.reportGeneration import generate_reports, summarizationGemini
+from src.sentiment.reportMongo import ensure_indexes
+from src.sentiment.rollupMongo import ROLLUP_COLLECTION, ensure_rollup_indexes, rollup_operations
+from src.sentiment.cascadeReddit import SentimentCascade
+from src.sentiment.nearDuplicates import NearDuplicateIndex
+from src.sentiment.liveCounters import LiveCounters, start_live_server
+from src.sentiment.entityIndex import EntityIndex, load_aliases
+from src.sentiment.claimRedis import LeaseManager
+from src.utils.utilsBackpressure import PENDING_KEY
+from src.utils.utilsCodec import PayloadCodec
+from src.utils.utilsProfile import CycleProfiler
 
 #loading of environment variables
 load_dotenv()
@@ -54,12 +65,44 @@ YOUTUBE_KEY_PATTERN = 'youtube:json*'
 POLLING_KEY_PATTERNS = [REDDIT_KEY_PATTERN, YOUTUBE_KEY_PATTERN]
 polling_interval_seconds = 300 #this interval (in seconds) indicates how often the server tries to retrieve data from Redis (in this case, every 5 minutes)
 
+#Every key is claimed with a lease before being processed, so many consumers can run on the same Redis without duplicated work
+lease_manager = LeaseManager(
+    r,
+    consumer_id=os.getenv('CONSUMER_ID'), #unique name of this consumer (default: hostname and pid)
+    ttl_seconds=int(os.getenv('LEASE_TTL_SECONDS', 120)), #a lease not renewed within this time is recovered by other consumers
+    pending_key=PENDING_KEY #pending-work gauge read by the producers for backpressure
+)
+
+#Sentiment counters updated while items are classified, served live by a local HTTP/JSON endpoint
+live_counters = LiveCounters(r, ttl_seconds=int(os.getenv('LIVE_COUNTERS_TTL_SECONDS', 2 * 24 * 3600)))
+LIVE_API_PORT = int(os.getenv('LIVE_API_PORT', 8765)) #0 disables the endpoint (the counters are updated anyway)
+
+#Drivers, teams and corners mentioned by every item (alias dictionary in ENTITY_ALIASES_FILE), indexed in Redis
+#with per-entity sentiment counters, so per-entity queries do not scan the raw comments
+ENTITY_INDEX_ENABLED = os.getenv('ENTITY_INDEX_ENABLED', 'true').lower() == 'true'
+entity_index = EntityIndex(
+    r,
+    load_aliases(),
+    ttl_seconds=int(os.getenv('ENTITY_COUNTERS_TTL_SECONDS', 30 * 24 * 3600)) #lifetime of the per-minute counters
+) if ENTITY_INDEX_ENABLED else None
+
+#Payloads are read both as RedisJSON documents and as compressed binary strings (msgpack + zstd);
+#msgpack and zstandard are imported only when the first binary payload is read
+payload_codec = PayloadCodec(r)
+
+#On-demand profiling of the consumer cycles: every N cycles, cycles slower than a threshold,
+#'SET profile:request:consumer N' in Redis or SIGUSR1 (see src/utils/utilsProfile.py)
+cycle_profiler = CycleProfiler('consumer', r=r)
+
 try:
     #MongoDB setup and connection
     client_mongo = MongoClient(MONGO_URI)
     db = client_mongo['F1Hackathon']
     collection = db['SocialData']
     client_mongo.admin.command('ping')
+    ensure_indexes(collection) #indexes for the upserts by content_id and for the report pipelines
+    rollups = db[ROLLUP_COLLECTION] #per-minute sentiment counters, updated in the same flush as the documents
+    ensure_rollup_indexes(rollups)
     print("Connection to MongoDB successfull!")
 except Exception as e:
     print(f"MongoDB connection error: {e}")
@@ -67,219 +110,71 @@ except Exception as e:
     exit(1)
 
 
-hf_model_name = "tabularisai/multilingual-sentiment-analysis" #here we define the model's name we will use for the sentiment analysis on YouTube
-hf_tokenizer = AutoTokenizer.from_pretrained(hf_model_name) #Tokenizer definition: it's useful to convert the human-readbile text into a numeric format
-hf_model = AutoModelForSequenceClassification.from_pretrained(hf_model_name) #load the model
-
-# Defines the ordered sentiment labels for clarity
-ordered_sentiments = ["Very Negative", "Negative", "Neutral", "Positive", "Very Positive"]
-
-def predict_sentiment_youtube(text):
-    # Handles cases where no text is provided for sentiment analysis.
-    if not text:
-        print("No text provided for sentiment analysis.")
-        return []
-    # Tokenizes the input text, converting it into a format the model can understand.
-    # 'return_tensors="pt"' specifies PyTorch tensors.
-    # 'truncation=True' truncates text if it exceeds the model's max length.
-    # 'padding=True' pads shorter texts to the max length.
-    # 'max_length=512' sets the maximum token length.
-    inputs = hf_tokenizer(text, return_tensors="pt", truncation=True, padding=True, max_length=512)
-    # Performs model inference without calculating gradients, which saves memory and speeds up prediction
-    with torch.no_grad():
-        outputs = hf_model(**inputs)
-    # Converts the raw model outputs (logits) into probabilities using the softmax function.
-    # Softmax ensures the scores sum to 1, interpretable as probabilities for each sentiment class.
-    probabilities = torch.nn.functional.softmax(outputs.logits, dim=-1)
-    # Maps the numerical class indices returned by the model to human-readable sentiment labels
-    sentiment_map = {0: "Very Negative", 1: "Negative", 2: "Neutral", 3: "Positive", 4: "Very Positive"}
-    return [sentiment_map[p] for p in torch.argmax(probabilities, dim=-1).tolist()]
-
-def predict_sentiment_reddit(text):
-    if not text or not text.strip():
-        return "Neutral" #Or another default value in case of empty text
-    #queries to Gemini to perform sentiment analysis with the same sentiment classes used for YouTube
-    query = f"""Analizza il sentiment complessivo del seguente testo, che include un post di Reddit e i suoi commenti.
-    Rispondi UNICAMENTE con una delle seguenti etichette, senza ulteriori spiegazioni o testo aggiuntivo:
-    "Very Negative", "Negative", "Neutral", "Positive", "Very Positive".
-
-    Testo da analizzare:
-    {text}
+MONGO_BATCH_SIZE = int(os.getenv('MONGO_BATCH_SIZE', 50)) #processed items written to MongoDB with a single bulk flush
+DUPLICATE_KEY_ERROR = 11000 #MongoDB error code of a violated unique index (content_id)
+
+load_local_model() #the local model is loaded at startup, not while the first message is processed
+
+#Long Reddit threads are split into prompts of bounded size before being sent to Gemini
+REDDIT_CHUNK_MAX_TOKENS = int(os.getenv('REDDIT_CHUNK_MAX_TOKENS', 2000)) #maximum number of tokens of a single prompt
+if REDDIT_CHUNK_MAX_TOKENS < 64:
+    #the post takes up to a quarter of every chunk, so a smaller budget leaves no room for the comments
+    raise ValueError(f"REDDIT_CHUNK_MAX_TOKENS must be at least 64, got {REDDIT_CHUNK_MAX_TOKENS}")
+REDDIT_MAX_CHUNKS = int(os.getenv('REDDIT_MAX_CHUNKS', 8)) #maximum number of prompts for a single thread
+REDDIT_CHUNK_AGGREGATION = os.getenv('REDDIT_CHUNK_AGGREGATION', 'weighted') #'majority', 'weighted' (by like_count) or 'mean'
+REDDIT_CHUNK_WORKERS = int(os.getenv('REDDIT_CHUNK_WORKERS', 4)) #number of chunks classified in parallel
+
+#In 'cascade' mode Reddit texts are scored by the local model first, and only the uncertain ones go to Gemini
+REDDIT_SENTIMENT_MODE = os.getenv('REDDIT_SENTIMENT_MODE', 'gemini') #'gemini' or 'cascade'
+reddit_cascade = SentimentCascade(
+    predict_probabilities_local,
+    predict_sentiment_reddit,
+    ordered_sentiments,
+    min_confidence=float(os.getenv('CASCADE_MIN_CONFIDENCE', 0.6)), #minimum top-class probability to keep the local label
+    min_margin=float(os.getenv('CASCADE_MIN_MARGIN', 0.2)), #minimum margin between the two best classes to keep the local label
+    holdout_rate=float(os.getenv('CASCADE_HOLDOUT_RATE', 0.05)) #fraction of local decisions double-checked by Gemini
+)
+if REDDIT_SENTIMENT_MODE == 'cascade':
+    reddit_predictor = reddit_cascade.predict
+    #the local model reads at most 512 tokens, so chunks must not be bigger than that
+    REDDIT_CHUNK_MAX_TOKENS = min(REDDIT_CHUNK_MAX_TOKENS, 510)
+else:
+    reddit_predictor = predict_sentiment_reddit
+
+#Near-identical texts (copypasta, spam, the same reaction with different emojis) are scored once: the label of the
+#first text of a cluster is copied to the others
+NEAR_DUP_ENABLED = os.getenv('NEAR_DUP_ENABLED', 'true').lower() == 'true'
+near_duplicates = NearDuplicateIndex(
+    threshold=float(os.getenv('NEAR_DUP_THRESHOLD', 0.8)), #minimum estimated Jaccard similarity of two near-duplicates
+    max_clusters=int(os.getenv('NEAR_DUP_MAX_CLUSTERS', 50000)), #maximum number of clusters kept in memory
+    window_seconds=int(os.getenv('NEAR_DUP_WINDOW_SECONDS', 3600)) #clusters not matched for this time are forgotten
+) if NEAR_DUP_ENABLED else None
+
+def classify_with_near_duplicates(message_data, text, classify):
     """
+    Classifies a text, reusing the label of its near-duplicate cluster when there is one.
+    The id of the cluster (the content_id of its first text) is saved in the element as 'duplicate_cluster_id'.
 
-    try:
-        #request via POST to Gemini in which the query is passed
-        res = requests.post(
-            f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}",
-            headers={"Content-Type": "application/json"},
-            data=json.dumps({"contents": [{"parts": [{"text": query}]}]})
-        )
-        res.raise_for_status() #This line checks if the request was successful
-        output = res.json() #This line parses the JSON response from the API and stores it in the output variable 
-
-        # Extract the text response from the Gemini output, handling potential missing keys
-        response_text = output.get('candidates', [{}])[0].get('content', {}).get('parts', [{}])[0].get('text', '').strip()
-
-        # Check if the Gemini response contains one of the expected sentiment labels 
-        for sentiment_label in ordered_sentiments:
-            if sentiment_label in response_text:
-                return sentiment_label
-
-        print(f"Notice: Gemini unexpectedly answered '{response_text}'. Assigned 'Neutral'.")
-        return "Neutral"
-
-    except requests.exceptions.RequestException as e:
-        print(f"Gemini error request: {e}")
-        return "Neutral"
-    except json.JSONDecodeError as e:
-        print(f"Error in JSON parsing of Gemini response: {e}")
-        print(f"Raw response: {res.text if 'res' in locals() else 'N/A'}")
-        return "Neutral"
-    except Exception as e:
-        print(f"Generic error during Gemini sentiment prediction: {e}")
-        return "Neutral"
-
-def generate_report(texts_for_wordcloud, sentiments_for_report, source_type="General"):
-    """
-    Generates sentiment analysis reports including bar charts, pie charts, and word clouds.
-    
     Args:
-        source_type (str): The type of content (e.g., "YouTube", "Reddit") for naming files and titles.
-    """
-    if not sentiments_for_report:
-        print(f"No sentiment data to generate the report {source_type}.")
-        return
-    #Prepare data for the bar chart
-    labels = [f"Item {i+1}" for i in range(len(sentiments_for_report))]
-    sentiment_to_index = {s: i for i, s in enumerate(ordered_sentiments)}
-    y_values = [sentiment_to_index.get(s, 2) for s in sentiments_for_report]
-
-    # Define colors for sentiment categories
-    plt.figure(figsize=(max(10, len(sentiments_for_report) * 0.8), 8)) # Dynamic figure size
-    colors = ["darkred", "red", "gray", "lightgreen", "green"]
-    bar_colors = [colors[sentiment_to_index.get(s, 2)] for s in sentiments_for_report]
-
-    # Generate Sentiment Bar Chart
-    bars = plt.bar(labels, y_values, color=bar_colors)
-    plt.yticks(ticks=range(len(ordered_sentiments)), labels=ordered_sentiments)# Set y-axis ticks and labels
-    plt.title(f"Sentiment ranked by Content ({source_type})")
-    plt.ylabel("Sentiment")
-    plt.xlabel(f"Content {source_type}")
-    plt.xticks(rotation=45, ha='right', fontsize=8) #Rotate x-axis labels for readability
-
-    # Add sentiment labels on top of the bars
-    for bar, sentiment in zip(bars, sentiments_for_report):
-        plt.text(bar.get_x() + bar.get_width() / 2, bar.get_height(), sentiment, ha='center', va='bottom', fontsize=7)
-
-    plt.tight_layout()# Adjust layout to prevent labels from overlapping
-    plt.savefig(f"sentiment_class_bar_chart_{source_type}.png")
-    plt.close() # Close the plot to free up memory
-
-    # Generate Sentiment Pie Chart
-    sentiment_counts = Counter(sentiments_for_report) # Count occurrences of each sentiment
-    pie_colors_map = {s: colors[sentiment_to_index.get(s, 2)] for s in sentiment_counts.keys()}
-    pie_colors = [pie_colors_map[s] for s in sentiment_counts.keys()]
-
-
-    plt.figure(figsize=(6, 6))
-    plt.pie(sentiment_counts.values(), labels=sentiment_counts.keys(), autopct='%1.1f%%', colors=pie_colors)
-    plt.title(f"Distribuzione del Sentiment ({source_type})")
-    plt.savefig(f"sentiment_pie_chart_{source_type}.png")
-    plt.close()
-
-    # Prepare stopwords for Word Clouds
-    my_stopwords = set(STOPWORDS) # Default English stopwords
-    # Add stopwords from NLTK for multiple languages
-    my_stopwords.update(stopwords.words('english'))
-    my_stopwords.update(stopwords.words('italian'))
-    my_stopwords.update(stopwords.words('french'))
-    my_stopwords.update(stopwords.words('spanish'))
-    my_stopwords.update(stopwords.words('german'))
-    my_stopwords.update(stopwords.words('portuguese'))
-
-    # Add custom stopwords relevant to the context
-    custom_stopwords = {"post", "comment", "reddit", "youtube", "video", "watch", "link", "https", "http"}
-    my_stopwords.update(custom_stopwords)
-
-    # Group texts by sentiment for individual word clouds
-    all_texts_map = {}
-    for t, s in zip(texts_for_wordcloud, sentiments_for_report):
-        if s not in all_texts_map:
-            all_texts_map[s] = []
-        all_texts_map[s].append(t)
-
-    # Generate Word Clouds for each sentiment category
-    for sentiment in ordered_sentiments:
-        if sentiment in all_texts_map:
-            text_concat_for_wc = " ".join(all_texts_map[sentiment])
-            if not text_concat_for_wc.strip(): # Skip if no text for this sentiment
-                continue
-            # Create a WordCloud object
-            wc = WordCloud(width=600, height=400, background_color='white', stopwords=my_stopwords).generate(text_concat_for_wc)
-            plt.figure(figsize=(6, 4))
-            plt.imshow(wc, interpolation='bilinear')
-            plt.axis('off')
-            plt.title(f"Word Cloud - {sentiment} ({source_type})")
-            plt.savefig(f"wordcloud_{sentiment}_{source_type}.png")
-            # plt.show()
-            plt.close()
-
-def summarizationGemini(source_type="General"):
-    """
-    Generates a summary of the sentiment analysis reports using the Google Gemini Vision API,
-    by sending the generated charts as images.
-    
-    Args:
-        source_type (str): The type of content (e.g., "YouTube", "Reddit") for summary context.
-    """
-    bar_chart_path = f"sentiment_class_bar_chart_{source_type}.png"
-    pie_chart_path = f"sentiment_pie_chart_{source_type}.png"
+        message_data (dictionary): The element being processed.
+        text (str): The text used to find the near-duplicates.
+        classify (callable): Function without arguments that runs the model and returns the label.
 
-    try:
-        # Encode the generated chart images to base64 for sending to Gemini API
-        with open(bar_chart_path, "rb") as istogramma_sentiment:
-            istogramma_sentiment_base64 = base64.b64encode(istogramma_sentiment.read()).decode('utf-8')
-        with open(pie_chart_path, "rb") as torta_sentiment:
-            torta_sentiment_base64 = base64.b64encode(torta_sentiment.read()).decode('utf-8')
-        # Define the query for Gemini to summarize the charts
-        query = f"""
-            Ti fornirò due grafici (a barre e a torta) che mostrano i risultati di un'analisi del sentiment sui contenuti {source_type} relativi al GP di Monaco 2025.
-            Il tuo compito è analizzare **esclusivamente** questi grafici e produrre un'analisi **descrittiva e fattuale** dei risultati.
-            Il riassunto deve includere:
-
-            1.  **Distribuzione Generale:** Descrivi come si distribuiscono i sentiment (molto negativo, negativo, neutro, positivo, molto positivo), indicando le proporzioni percentuali visibili nel grafico a torta.
-            2.  **Sentiment Dominante:** Identifica chiaramente qual è il sentiment più comune e quale il meno comune.
-            3.  **Tendenze e Picchi:** Basandoti sul grafico a barre (se applicabile) e sulla torta, evidenzia se ci sono picchi significativi (ad esempio, una predominanza schiacciante di un sentiment o una presenza notevole dei sentimenti estremi 'Very Positive' o 'Very Negative').
-            4.  **Insight Fattuali:** Riporta qualsiasi osservazione oggettiva che puoi dedurre **direttamente** dai grafici, senza fare ipotesi esterne o dare consigli. Ad esempio: "Si osserva una polarizzazione se i sentimenti estremi sono alti" oppure "La maggioranza dei contenuti genera reazioni neutrali".
-
-            **IMPORTANTE:** Non includere NESSUN suggerimento, NESSUNA raccomandazione, NESSUN consiglio di marketing o comunicazione e NESSUN piano d'azione. La tua risposta deve essere **solo** un'analisi oggettiva di ciò che i grafici mostrano. La lingua deve essere inglese.
-            """
-        # Send the request to Gemini Vision API with the query and image data
-        res = requests.post(
-            f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}",
-            headers={"Content-Type": "application/json"},
-            data=json.dumps({"contents": [{"parts": [
-                {"text": query},
-                {"inline_data": {"mime_type": "image/png", "data": istogramma_sentiment_base64}},
-                {"inline_data": {"mime_type": "image/png", "data": torta_sentiment_base64}}
-            ]}]})
-        )
-        res.raise_for_status()
-        output = res.json()
-        # Extract the summary text from Gemini's response and clean up markdown
-        response_extracted_words = output.get('candidates', [{}])[0].get('content', {}).get('parts', [{}])[0].get('text', '')
-        res_new = response_extracted_words.replace("```json", "").replace("```", "")
-        print(f"\n--- Gemini summary for {source_type} ---")
-        print(res_new)
-        print(f"--- End Gemini summary for {source_type} ---\n")
-    except FileNotFoundError:
-        print(f"Error: Graphics files not found for {source_type}. Make sure reports have been generated before calling Gemini.")
-    except requests.exceptions.RequestException as e:
-        print(f"Gemini request error for summarization: {e}")
-    except json.JSONDecodeError as e:
-        print(f"Error parsing JSON from Gemini response for summarization: {e}")
-    except Exception as e:
-        print(f"Generic error during Gemini summarization for {source_type}: {e}")
+    Returns:
+        str: The sentiment label.
+    """
+    if near_duplicates is None:
+        return classify()
+    cluster_id, label, signature = near_duplicates.find(text)
+    if label is not None:
+        print(f"Near-duplicate of cluster {cluster_id}: sentiment {label} reused without inference.")
+    else:
+        label = classify()
+        cluster_id = message_data.get('content_id')
+        if label is not None and signature is not None: # emoji-only or very short texts are never clustered
+            near_duplicates.add(cluster_id, signature, label)
+    message_data['duplicate_cluster_id'] = cluster_id
+    return label
 
 def process_message(message_data):
     """
@@ -305,7 +200,8 @@ def process_message(message_data):
             texts_for_wordcloud_current_item.append(comment_text)
             print(f"YouTube text extracted: '{comment_text[:100]}...'")
             # Call the Hugging Face model for YouTube sentiment
-            sentiment_result = predict_sentiment_youtube([combined_text_for_sentiment])[0]
+            sentiment_result = classify_with_near_duplicates(
+                message_data, combined_text_for_sentiment, lambda: predict_sentiment_youtube([combined_text_for_sentiment])[0])
         else:
             print(f"No valid text found for YouTube commentary {content_id}.")
             return None, None, None # Return None if no text to process
@@ -332,8 +228,17 @@ def process_message(message_data):
             print(f"No valid text (posts or comments) found for Reddit element {content_id}.")
             return None, None, None # Return None if no text to process for Reddit
         print(f"Reddit combined text (post+comments): '{combined_text_for_sentiment[:200]}...'")
-        # Call the Gemini model for Reddit sentiment, as it handles longer, combined texts
-        sentiment_result = predict_sentiment_reddit(combined_text_for_sentiment)
+        # Call the Reddit predictor (Gemini, or the local-first cascade): the thread is split into chunks
+        # of bounded size, classified in parallel and then combined into a single label
+        sentiment_result = classify_with_near_duplicates(message_data, combined_text_for_sentiment, lambda: predict_sentiment_thread(
+            message_data,
+            reddit_predictor,
+            max_tokens=REDDIT_CHUNK_MAX_TOKENS,
+            max_chunks=REDDIT_MAX_CHUNKS,
+            rule=REDDIT_CHUNK_AGGREGATION,
+            max_workers=REDDIT_CHUNK_WORKERS,
+            count_tokens=count_tokens
+        )[0])
 
     else:
         # Handle unrecognized social media types
@@ -342,9 +247,76 @@ def process_message(message_data):
 
     return combined_text_for_sentiment, sentiment_result, texts_for_wordcloud_current_item
 
+def flush_batch(batch):
+    """
+    Writes a batch of processed items to MongoDB with a single bulk flush: the documents are upserted by content_id
+    and the rollups of the newly inserted ones are incremented ($inc upserts). The keys of the saved items are then
+    deleted from Redis, the others are given back to be processed again.
+
+    Args:
+        batch (list): The processed items, as dictionaries with 'key', 'message_data' and 'sentiment'.
+
+    Returns:
+        list: The items saved on MongoDB.
+    """
+    if not batch:
+        return []
+    operations = [ReplaceOne({'content_id': item['message_data'].get('content_id')}, item['message_data'], upsert=True) for item in batch]
+    try:
+        result = collection.bulk_write(operations, ordered=False)
+        failed = set()
+        inserted = set(result.upserted_ids)
+    except BulkWriteError as e:
+        failed = {error['index'] for error in e.details['writeErrors'] if error.get('code') != DUPLICATE_KEY_ERROR}
+        inserted = {upserted['index'] for upserted in e.details.get('upserted', [])}
+        # Another consumer inserted the same content_id at the same time: the document exists, so it is updated
+        for error in e.details['writeErrors']:
+            if error.get('code') == DUPLICATE_KEY_ERROR:
+                message_data = batch[error['index']]['message_data']
+                try:
+                    collection.replace_one({'content_id': message_data.get('content_id')}, message_data)
+                except Exception as retry_error:
+                    print(f"MongoDB update of {message_data.get('content_id')} failed: {retry_error}")
+                    failed.add(error['index'])
+        if failed:
+            print(f"MongoDB saving error on {len(failed)} of {len(batch)} documents. They will not be removed from Redis.")
+    except Exception as mongo_error:
+        print(f"MongoDB saving error: {mongo_error}. The elements will not be removed from Redis.")
+        failed = set(range(len(batch)))
+        inserted = set()
+
+    # Only the documents inserted now are counted, so an item processed twice is not counted twice
+    rollup_ops = [op for i in sorted(inserted) for op in rollup_operations(batch[i]['message_data'], batch[i]['sentiment'])]
+    if rollup_ops:
+        try:
+            rollups.bulk_write(rollup_ops, ordered=False)
+        except Exception as rollup_error:
+            print(f"MongoDB rollups not updated: {rollup_error}")
+
+    saved = []
+    for i, item in enumerate(batch):
+        if i in failed:
+            lease_manager.release(item['key'])
+            continue
+        try:
+            live_counters.increment(item['message_data'], item['sentiment'])
+        except redis.exceptions.RedisError as counter_error:
+            print(f"Live counters not updated for {item['message_data'].get('content_id')}: {counter_error}")
+        if entity_index and item['message_data'].get('entities'):
+            try:
+                entity_index.index(item['message_data'], item['sentiment'], item['message_data']['entities'])
+            except redis.exceptions.RedisError as index_error:
+                print(f"Entity index not updated for {item['message_data'].get('content_id')}: {index_error}")
+        lease_manager.complete(item['key']) # Delete the key (and its lease) from Redis after successful processing
+        saved.append(item)
+    print(f"{len(saved)} documents saved on MongoDB and deleted from Redis.")
+    return saved
+
 # --- Main Execution Block ---
 if __name__ == "__main__":
     print(f"Consumatore avviato. Ricerca di chiavi JSON con pattern: {', '.join(POLLING_KEY_PATTERNS)}...")
+    if LIVE_API_PORT:
+        start_live_server(live_counters, os.getenv('LIVE_API_HOST', '127.0.0.1'), LIVE_API_PORT)
 
     # Initialize lists to store processed sentiment data and raw texts
     # These lists will accumulate data across multiple polling cycles
@@ -356,6 +328,7 @@ if __name__ == "__main__":
     try:
         # The main consumer loop, designed to run indefinitely until interrupted
         while True:
+            cycle_profiler.start_cycle() # the pauses between cycles are not profiled
             total_processed_keys_in_cycle = 0 # Counter for keys processed in the current polling cycle
             # Iterate through each defined key pattern (e.g., 'reddit:json*', 'youtube:json*')
             for pattern in POLLING_KEY_PATTERNS: 
@@ -369,60 +342,69 @@ if __name__ == "__main__":
 
                 if keys_to_process:
                     print(f"\nFound {len(keys_to_process)} JSON keys for pattern '{pattern}' to elaborate.")
-                    for key_bytes in keys_to_process:
-                        key = key_bytes.decode('utf-8') # Decode the key from bytes to a UTF-8 string
-                        try:
-                            # Retrieve the JSON data associated with the key
-                            message_data = r.json().get(key)
-
-                            if message_data:
-                                # Process the retrieved message data using the helper function
-                                combined_text, sentiment_val, raw_texts_for_wc_current_item = process_message(message_data)
-
-                                if combined_text is not None and sentiment_val is not None:
-                                    # If processing was successful, categorize and store the results
-                                    if client_mongo:
-                                        try:
-                                            message_data['sentiment'] = sentiment_val #store the sentiment classification as part of the element
-
-                                            collection.insert_one(message_data) #insert the document into the db
-                                            print(f"Document {message_data.get('content_id')} saved on MongoDB.")
-
-                                        except Exception as mongo_error:
-                                            print(f"MongoDB saving error: {mongo_error}. The element will not be removed from Redis.")
+                    # Keys are processed in groups, and every group is saved on MongoDB with a single bulk flush
+                    for group_start in range(0, len(keys_to_process), MONGO_BATCH_SIZE):
+                        batch = [] # Processed items waiting for the bulk flush; their keys keep the lease until then
+                        for key_bytes in keys_to_process[group_start:group_start + MONGO_BATCH_SIZE]:
+                            key = key_bytes.decode('utf-8') # Decode the key from bytes to a UTF-8 string
+                            batched = False
+                            try:
+                                if not lease_manager.claim(key): # Skip keys owned by another consumer or already processed
+                                    print(f"Key '{key}' claimed by another consumer, skipping.")
+                                    continue
+                                # Retrieve the data associated with the key (RedisJSON document or binary payload)
+                                message_data = payload_codec.load(key)
+
+                                if message_data:
+                                    # Process the retrieved message data using the helper function
+                                    combined_text, sentiment_val, raw_texts_for_wc_current_item = process_message(message_data)
+
+                                    if combined_text is not None and sentiment_val is not None:
+                                        if not client_mongo:
+                                            print("Connection to MongoDB not available. Skip saving.")
                                             continue
+                                        message_data['sentiment'] = sentiment_val #store the sentiment classification as part of the element
+                                        if entity_index:
+                                            message_data['entities'] = entity_index.tag(combined_text) #drivers, teams and corners mentioned
+                                        # The key keeps its lease until the batch is saved
+                                        batch.append({'key': key, 'message_data': message_data, 'sentiment': sentiment_val, 'texts': raw_texts_for_wc_current_item})
+                                        batched = True
                                     else:
-                                        print("Connection to MongoDB not available. Skip saving.")
-                                        continue
-                                    # If processing was successful, categorize and store the results
-                                    social_media_type = message_data.get('social_media', 'Unknown')
-                                    if social_media_type == "YouTube":
-                                        final_youtube_sentiments_data.append(sentiment_val)
-                                        all_youtube_raw_texts_for_wc.extend(raw_texts_for_wc_current_item)
-                                    elif social_media_type == "Reddit":
-                                        final_reddit_sentiments_data.append(sentiment_val)
-                                        all_reddit_raw_texts_for_wc.extend(raw_texts_for_wc_current_item)
-
-                                    r.delete(key) # Delete the key from Redis after successful processing
-                                    total_processed_keys_in_cycle += 1
-                                    print(f"Key '{key}' deleted after elaboration.")
+                                        print(f"No valid data extracted for the key '{key}'. It could be deleted if empty or not valid.")
                                 else:
-                                    print(f"No valid data extracted for the key '{key}'. It could be deleted if empty or not valid.")
-                            else:
-                                print(f"Key '{key}' empty or not found during the GET. Deleting...")
-                                r.delete(key) # Delete empty or non-existent keys to clean up
-                                total_processed_keys_in_cycle += 1
-
-
-                        except redis.exceptions.ResponseError as re:
-                            print(f"Redis error (likely not JSON) for key '{key}': {re}. The key will not be deleted.")
-                        except json.JSONDecodeError:
-                            print(f"JSON parsing error for key '{key}'. Invalid content. Key not deleted.")
-                        except Exception as e:
-                            print(f"Error during processing or deletion of key '{key}': {e}. Key not deleted.")
+                                    print(f"Key '{key}' empty or not found during the GET. Deleting...")
+                                    lease_manager.complete(key) # Delete empty or non-existent keys to clean up
+                                    total_processed_keys_in_cycle += 1
+
+
+                            except redis.exceptions.ResponseError as re:
+                                print(f"Redis error (likely not JSON) for key '{key}': {re}. The key will not be deleted.")
+                            except json.JSONDecodeError:
+                                print(f"JSON parsing error for key '{key}'. Invalid content. Key not deleted.")
+                            except Exception as e:
+                                print(f"Error during processing or deletion of key '{key}': {e}. Key not deleted.")
+                            finally:
+                                if not batched:
+                                    try:
+                                        lease_manager.release(key) # Give back the key if it was not completed (no-op if not claimed)
+                                    except redis.exceptions.RedisError as release_error:
+                                        print(f"Lease on '{key}' not released: {release_error}. It will expire.")
+
+                        # If processing was successful, categorize and store the results
+                        for item in flush_batch(batch):
+                            social_media_type = item['message_data'].get('social_media', 'Unknown')
+                            if social_media_type == "YouTube":
+                                final_youtube_sentiments_data.append(item['sentiment'])
+                                all_youtube_raw_texts_for_wc.extend(item['texts'])
+                            elif social_media_type == "Reddit":
+                                final_reddit_sentiments_data.append(item['sentiment'])
+                                all_reddit_raw_texts_for_wc.extend(item['texts'])
+                            total_processed_keys_in_cycle += 1
                 else:
                     print(f"No keys with pattern '{pattern}' found in this cycle.")
             
+            cycle_profiler.end_cycle()
+
             # --- Polling Logic ---
             # If no new messages were processed in the current cycle, pause for the longer polling interval.
             if total_processed_keys_in_cycle == 0:
@@ -430,6 +412,10 @@ if __name__ == "__main__":
                 time.sleep(polling_interval_seconds)
             else:
                 print(f"\nCycle completed. {total_processed_keys_in_cycle} total messages processed.")
+                if REDDIT_SENTIMENT_MODE == 'cascade':
+                    reddit_cascade.print_stats()
+                if near_duplicates:
+                    near_duplicates.print_stats()
                 print("Waiting for next cycle...")
                 time.sleep(5) # Short break before re-scanning
 
@@ -437,25 +423,32 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         # Handle graceful shutdown when the user interrupts the script
         print("\nConsumer halted by user.")
+        if REDDIT_SENTIMENT_MODE == 'cascade':
+            reddit_cascade.print_stats()
+        if near_duplicates:
+            near_duplicates.print_stats()
         print("\nFinal reports generating...")
 
-        # Generate and summarize reports for YouTube data if any was collected
+        # The images of both platforms are rendered together, in parallel, in the report directory
+        report_dir = os.getenv('REPORT_DIR', '.')
+        platform_data = {}
         if final_youtube_sentiments_data:
-            print("\nFinal report generation and summarization for YouTube...")
-            generate_report(all_youtube_raw_texts_for_wc, final_youtube_sentiments_data, "YouTube")
-            summarizationGemini("YouTube")
+            platform_data["YouTube"] = (all_youtube_raw_texts_for_wc, final_youtube_sentiments_data)
         else:
             print("No YouTube data processed to generate the final report.")
-
-        # Generate and summarize reports for Reddit data if any was collected
         if final_reddit_sentiments_data:
-            print("\nFinal report generation and summarization for Reddit...")
-            generate_report(all_reddit_raw_texts_for_wc, final_reddit_sentiments_data, "Reddit")
-            summarizationGemini("Reddit")
+            platform_data["Reddit"] = (all_reddit_raw_texts_for_wc, final_reddit_sentiments_data)
         else:
             print("No Reddit data processed to generate the final report.")
+        generate_reports(platform_data, report_dir)
+
+        # Summarize the reports of every platform with data
+        for source_type in platform_data:
+            print(f"\nFinal report summarization for {source_type}...")
+            summarizationGemini(source_type, report_dir)
 
     except Exception as e:
         print(f"Unexpected error within main loop: {e}")
     finally:
+        lease_manager.stop()
         print("Consumer terminated.")
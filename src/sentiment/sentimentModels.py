@@ -0,0 +1,116 @@
+import requests, json
+import os
+from dotenv import load_dotenv
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+import torch
+from src.utils.utilsProfile import torch_profile
+
+#loading of environment variables
+load_dotenv()
+
+GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+
+hf_model_name = "tabularisai/multilingual-sentiment-analysis" #here we define the model's name we will use for the sentiment analysis on YouTube
+hf_tokenizer = None #Tokenizer definition: it's useful to convert the human-readbile text into a numeric format
+hf_model = None #the model, loaded on first use by load_local_model
+
+# Defines the ordered sentiment labels for clarity
+ordered_sentiments = ["Very Negative", "Negative", "Neutral", "Positive", "Very Positive"]
+
+def load_local_model():
+    """
+    Loads the Hugging Face tokenizer and model, only the first time it is called.
+    The consumer calls it at startup; the offline tools only when they use the local model.
+
+    Returns:
+        tuple: (tokenizer, model)
+    """
+    global hf_tokenizer, hf_model
+    if hf_model is None:
+        hf_tokenizer = AutoTokenizer.from_pretrained(hf_model_name)
+        hf_model = AutoModelForSequenceClassification.from_pretrained(hf_model_name) #load the model
+    return hf_tokenizer, hf_model
+
+def count_tokens(text):
+    load_local_model()
+    # The multilingual tokenizer is used as a local, fast estimate of the prompt size
+    return len(hf_tokenizer.tokenize(text))
+
+def predict_probabilities_local(text):
+    """
+    Scores a batch of texts with the local Hugging Face model.
+
+    Args:
+        text (list): The texts to score.
+
+    Returns:
+        list: For each text, the list of class probabilities ordered as `ordered_sentiments`.
+    """
+    load_local_model()
+    # Tokenizes the input text, converting it into a format the model can understand.
+    # 'return_tensors="pt"' specifies PyTorch tensors.
+    # 'truncation=True' truncates text if it exceeds the model's max length.
+    # 'padding=True' pads shorter texts to the max length.
+    # 'max_length=512' sets the maximum token length.
+    inputs = hf_tokenizer(text, return_tensors="pt", truncation=True, padding=True, max_length=512)
+    # Performs model inference without calculating gradients, which saves memory and speeds up prediction
+    # Op-level torch profile of the batch, only inside a profiled cycle with PROFILE_TORCH=true
+    with torch.no_grad(), torch_profile(f"local_batch{len(text) if isinstance(text, list) else 1}"):
+        outputs = hf_model(**inputs)
+    # Converts the raw model outputs (logits) into probabilities using the softmax function.
+    # Softmax ensures the scores sum to 1, interpretable as probabilities for each sentiment class.
+    return torch.nn.functional.softmax(outputs.logits, dim=-1).tolist()
+
+def predict_sentiment_youtube(text):
+    # Handles cases where no text is provided for sentiment analysis.
+    if not text:
+        print("No text provided for sentiment analysis.")
+        return []
+    probabilities = predict_probabilities_local(text)
+    # Maps the numerical class indices returned by the model to human-readable sentiment labels
+    sentiment_map = {0: "Very Negative", 1: "Negative", 2: "Neutral", 3: "Positive", 4: "Very Positive"}
+    return [sentiment_map[max(range(len(p)), key=p.__getitem__)] for p in probabilities]
+
+def predict_sentiment_reddit(text):
+    if not text or not text.strip():
+        return "Neutral" #Or another default value in case of empty text
+    #queries to Gemini to perform sentiment analysis with the same sentiment classes used for YouTube
+    query = f"""Analizza il sentiment complessivo del seguente testo, che include un post di Reddit e i suoi commenti.
+    Rispondi UNICAMENTE con una delle seguenti etichette, senza ulteriori spiegazioni o testo aggiuntivo:
+    "Very Negative", "Negative", "Neutral", "Positive", "Very Positive".
+
+    Testo da analizzare:
+    {text}
+    """
+
+    try:
+        #request via POST to Gemini in which the query is passed
+        res = requests.post(
+            f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}",
+            headers={"Content-Type": "application/json"},
+            data=json.dumps({"contents": [{"parts": [{"text": query}]}]})
+        )
+        res.raise_for_status() #This line checks if the request was successful
+        output = res.json() #This line parses the JSON response from the API and stores it in the output variable 
+
+        # Extract the text response from the Gemini output, handling potential missing keys
+        response_text = output.get('candidates', [{}])[0].get('content', {}).get('parts', [{}])[0].get('text', '').strip()
+
+        # Check if the Gemini response contains one of the expected sentiment labels 
+        for sentiment_label in ordered_sentiments:
+            if sentiment_label in response_text:
+                return sentiment_label
+
+        print(f"Notice: Gemini unexpectedly answered '{response_text}'. Assigned 'Neutral'.")
+        return "Neutral"
+
+    except requests.exceptions.RequestException as e:
+        print(f"Gemini error request: {e}")
+        return "Neutral"
+    except json.JSONDecodeError as e:
+        print(f"Error in JSON parsing of Gemini response: {e}")
+        print(f"Raw response: {res.text if 'res' in locals() else 'N/A'}")
+        return "Neutral"
+    except Exception as e:
+        print(f"Generic error during Gemini sentiment prediction: {e}")
+        return "Neutral"
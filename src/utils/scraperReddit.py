@@ -1,17 +1,30 @@
 
 from dotenv import load_dotenv
-from src.utils.utilsReddit import scrape_reddit_posts_and_comments, data_to_csv
+from src.utils.utilsReddit import scrape_reddit_posts_and_comments, scrape_reddit_multi, chunk_subreddits, data_to_csv
+from src.utils.utilsRedis import r, redis_available, drainSpilledData, getCycleInterval
+from src.utils.utilsProfile import CycleProfiler
+from src.utils.utilsReplay import RECORD_DIR, Recorder, RecordingReddit
+from src.utils.utilsSchedule import reddit_scheduler, reddit_request_budget
 import os 
 import praw
+import prawcore
 import time
 
 load_dotenv()
 
+class BudgetRequestor(prawcore.Requestor):
+    # Every request to Reddit spends a token of the budget shared by all the subreddits of the process
+    def request(self, *args, **kwargs):
+        reddit_request_budget.acquire()
+        return super().request(*args, **kwargs)
+
+
 # --- Reddit credentials ---
 reddit = praw.Reddit(
     client_id=os.getenv('CLIENT_ID'), #ID APPLICATION GITHUB
     client_secret=os.getenv('CLIENT_SECRET'), #SECRET KEY
-    user_agent=os.getenv('USER_AGENT') #STRING
+    user_agent=os.getenv('USER_AGENT'), #STRING
+    requestor_class=BudgetRequestor
 )
 
 # --- Scraping Reddit function ---
@@ -19,17 +32,77 @@ def startScrapingReddit(subreddit_name, max_posts, max_comments_per_post, freque
     """
     Continuously scrapes Reddit posts and comments from a specified subreddit.
     It fetches data, saves it to a CSV, and then pauses for a defined interval
-    before repeating the process.
+    before repeating the process. While the consumer is behind (backpressure) the
+    pause is longer and new posts are spilled to disk; they are sent to Redis as
+    soon as the backlog is back under the low-water mark.
 
     Args:
         subreddit_name (str): The name of the subreddit to scrape (e.g., 'python').
         max_posts (int): Maximum number of hot posts to retrieve.
         max_comments_per_post (int): Maximum top-level comments per post.
-        frequency (int): Time in seconds to wait between scraping cycles.
+        frequency (int): Time in seconds to wait between scraping cycles (the initial one in adaptive mode).
     """
+    client = reddit
+    recorder = None
+    if RECORD_DIR:
+        # Recording mode: the listings are saved for the replay driver (src.ingestion.replayRecording)
+        recorder = Recorder('reddit', {'subreddit': subreddit_name, 'post_limit': max_posts,
+                                       'comment_limit': max_comments_per_post}, RECORD_DIR)
+        client = RecordingReddit(reddit, recorder)
+
+    # In adaptive mode (SCRAPE_SCHEDULE=adaptive) the pause follows the number of new posts and comments per cycle
+    scheduler = reddit_scheduler(frequency, max_posts)
+    # On-demand profiling of the cycles (every N cycles, slow cycles, Redis flag or SIGUSR1)
+    profiler = CycleProfiler(f"reddit_{subreddit_name}", r=r, redis_ready=redis_available.is_set)
+
     while True:
+        if recorder:
+            recorder.next_cycle()
+        profiler.start_cycle()
         # Scrape data and get a DataFrame from collected Reddit posts and comments
-        df_reddit = scrape_reddit_posts_and_comments(subreddit_name, max_posts, max_comments_per_post, reddit)
+        df_reddit = scrape_reddit_posts_and_comments(subreddit_name, max_posts, max_comments_per_post, client)
         data_to_csv(df_reddit, subreddit_name)
-        time.sleep(frequency)
+        drainSpilledData(f"reddit_{subreddit_name}")
+        profiler.end_cycle()
+        interval = scheduler.next_interval(len(df_reddit)) if scheduler else frequency
+        time.sleep(getCycleInterval(interval))
+
+
+def startScrapingRedditMulti(subreddit_names, max_posts, max_comments_per_post, frequency):
+    """
+    Continuously scrapes many subreddits from a single worker, with combined listings ('sub1+sub2+...'):
+    the listing requests of a cycle grow with the number of groups, not with the number of subreddits,
+    and all the requests share the same rate-limit budget. Posts are routed back to their subreddit,
+    so the dedup keys, spill files and CSV files are the same as with one scraper per subreddit.
 
+    Args:
+        subreddit_names (list): The names of the subreddits (e.g. ['formula1', 'F1Technical']).
+        max_posts (int): Number of hot posts to retrieve for every subreddit.
+        max_comments_per_post (int): Maximum top-level comments per post.
+        frequency (int): Time in seconds to wait between scraping cycles (the initial one in adaptive mode).
+    """
+    client = reddit
+    recorder = None
+    if RECORD_DIR:
+        # Recording mode: the listings are saved for the replay driver (src.ingestion.replayRecording)
+        recorder = Recorder('reddit', {'subreddits': subreddit_names, 'post_limit': max_posts,
+                                       'comment_limit': max_comments_per_post}, RECORD_DIR)
+        client = RecordingReddit(reddit, recorder)
+
+    # Quota of the worst case: every subreddit topped up with its own listing
+    listings = len(chunk_subreddits(subreddit_names, max_posts)) + len(subreddit_names)
+    scheduler = reddit_scheduler(frequency, max_posts * len(subreddit_names), listings)
+    profiler = CycleProfiler("reddit_multi", r=r, redis_ready=redis_available.is_set)
+
+    while True:
+        if recorder:
+            recorder.next_cycle()
+        profiler.start_cycle()
+        dfs = scrape_reddit_multi(subreddit_names, max_posts, max_comments_per_post, client)
+        for subreddit_name, df_reddit in dfs.items():
+            data_to_csv(df_reddit, subreddit_name)
+            drainSpilledData(f"reddit_{subreddit_name}")
+        profiler.end_cycle()
+        new_items = sum(len(df) for df in dfs.values())
+        interval = scheduler.next_interval(new_items) if scheduler else frequency
+        time.sleep(getCycleInterval(interval))
@@ -1,6 +1,11 @@
 import os
 from dotenv import load_dotenv
 from src.utils.utilsYoutube import scrape_youtube_comments, save_data_to_csv
+from src.utils.utilsRedis import r, redis_available, drainSpilledData, getCycleInterval
+from src.utils.utilsProfile import CycleProfiler
+from src.utils.utilsReplay import RECORD_DIR, Recorder, RecordingYoutube
+from src.utils.utilsSchedule import youtube_scheduler
+from googleapiclient.discovery import build
 import time
 
 load_dotenv()
@@ -14,16 +19,34 @@ def start_scraping_youtube(search_query="F1 Monaco GP 2025", max_videos_to_scrap
     """
     Continuously scrapes YouTube comments based on a search query.
     It retrieves comments from multiple videos, saves the data to a CSV file,
-    and then pauses before performing the next scraping cycle.
+    and then pauses before performing the next scraping cycle. While the consumer is
+    behind (backpressure) the pause is longer and new comments are spilled to disk;
+    they are sent to Redis as soon as the backlog is back under the low-water mark.
 
     Args:
         search_query (str): The search term to find relevant YouTube videos.
         max_videos_to_scrape (int): The maximum number of videos to scrape comments from per cycle.
         max_comments_per_video_to_scrape (int): The maximum number of comments to retrieve per video.
-        frequency (int): The time in seconds to wait between scraping cycles.
+        frequency (int): The time in seconds to wait between scraping cycles (the initial one in adaptive mode).
     """
+    youtube = None
+    recorder = None
+    if RECORD_DIR:
+        # Recording mode: the raw API responses are saved for the replay driver (src.ingestion.replayRecording)
+        recorder = Recorder('youtube', {'query': search_query, 'limit_videos': max_videos_to_scrape,
+                                        'limit_comments': max_comments_per_video_to_scrape}, RECORD_DIR)
+        youtube = RecordingYoutube(build('youtube', 'v3', developerKey=API_KEY), recorder)
+
+    # In adaptive mode (SCRAPE_SCHEDULE=adaptive) the pause follows the number of new comments per cycle
+    scheduler = youtube_scheduler(frequency, max_videos_to_scrape)
+    # On-demand profiling of the cycles (every N cycles, slow cycles, Redis flag or SIGUSR1)
+    profiler = CycleProfiler(f"youtube_{search_query}", r=r, redis_ready=redis_available.is_set)
+
     while True:
-        df_youtube = scrape_youtube_comments(API_KEY, search_query, max_videos_to_scrape, max_comments_per_video_to_scrape)
+        if recorder:
+            recorder.next_cycle()
+        profiler.start_cycle()
+        df_youtube = scrape_youtube_comments(API_KEY, search_query, max_videos_to_scrape, max_comments_per_video_to_scrape, youtube)
 
         if not df_youtube.empty:
             print("\n--- Youtube Data Preview ---")
@@ -37,6 +60,9 @@ def start_scraping_youtube(search_query="F1 Monaco GP 2025", max_videos_to_scrap
             save_data_to_csv(df_youtube, file_path)
         else:
             print("No data collected from YouTube")
-        
-        time.sleep(frequency)
+
+        drainSpilledData(f"youtube_{search_query}")
+        profiler.end_cycle()
+        interval = scheduler.next_interval(len(df_youtube)) if scheduler else frequency
+        time.sleep(getCycleInterval(interval))
 
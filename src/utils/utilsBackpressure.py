@@ -0,0 +1,83 @@
+import time
+
+# Gauge of the items written by the producers and not yet processed by the consumer
+PENDING_KEY = "ingestion:pending_items"
+
+
+class FlowController:
+    """
+    Flow control between the scrapers (producers) and the sentiment consumer.
+    The pending-work gauge and the Redis memory are compared with a high-water mark and a low-water mark:
+    above the high-water mark the producers are throttled (slower cycles, new items spilled to local disk),
+    and they are released only below the low-water mark, so they do not flap around a single threshold.
+
+    Args:
+        r (redis.Redis): The Redis connection.
+        high_water (int): Pending items above which the producers are throttled.
+        low_water (int): Pending items below which the producers are released.
+        memory_budget_bytes (int): Redis memory budget (0 disables the memory check).
+        memory_high_ratio (float): Fraction of the budget above which the producers are throttled.
+        memory_low_ratio (float): Fraction of the budget below which the producers are released.
+        refresh_seconds (float): How long a reading of the gauge and of the memory is reused.
+    """
+
+    def __init__(self, r, high_water=5000, low_water=2000, memory_budget_bytes=0,
+                 memory_high_ratio=0.9, memory_low_ratio=0.7, refresh_seconds=2):
+        self.r = r
+        self.high_water = high_water
+        self.low_water = low_water
+        self.memory_budget_bytes = memory_budget_bytes
+        self.memory_high_ratio = memory_high_ratio
+        self.memory_low_ratio = memory_low_ratio
+        self.refresh_seconds = refresh_seconds
+        self.throttled = False
+        self._last_check = 0
+        self._pending = 0
+        self._memory = 0
+
+    def _refresh(self):
+        now = time.monotonic()
+        if now - self._last_check < self.refresh_seconds:
+            return
+        self._last_check = now
+        self._pending = int(self.r.get(PENDING_KEY) or 0)
+        if self.memory_budget_bytes:
+            self._memory = int(self.r.info('memory').get('used_memory', 0))
+
+    def pending(self):
+        """
+        Returns:
+            int: The number of items waiting for the consumer.
+        """
+        self._refresh()
+        return self._pending
+
+    def is_throttled(self):
+        """
+        Updates and returns the state of the flow control.
+
+        Returns:
+            bool: True if the producers must slow down and spill to disk.
+        """
+        self._refresh()
+        memory_ratio = self._memory / self.memory_budget_bytes if self.memory_budget_bytes else 0
+        if not self.throttled and (self._pending >= self.high_water or memory_ratio >= self.memory_high_ratio):
+            self.throttled = True
+            print(f"Backpressure ON: {self._pending} pending items, Redis memory at {memory_ratio:.0%} of the budget.")
+        elif self.throttled and self._pending <= self.low_water and memory_ratio <= self.memory_low_ratio:
+            self.throttled = False
+            print(f"Backpressure OFF: {self._pending} pending items, Redis memory at {memory_ratio:.0%} of the budget.")
+        return self.throttled
+
+    def cycle_interval(self, frequency, slowdown=3):
+        """
+        Returns the pause a producer has to take before its next cycle.
+
+        Args:
+            frequency (int): The configured pause in seconds.
+            slowdown (int): Multiplier applied to the pause while throttled.
+
+        Returns:
+            int: The pause in seconds.
+        """
+        return frequency * slowdown if self.is_throttled() else frequency
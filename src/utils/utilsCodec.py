@@ -0,0 +1,152 @@
+import os
+import struct
+import time
+
+import redis
+
+# Codec of the payloads written by the producers: 'json' (RedisJSON document, the original format)
+# or 'msgpack-zstd' (MessagePack compressed with zstd and a shared trained dictionary, plain Redis strings)
+PAYLOAD_CODEC = os.getenv("PAYLOAD_CODEC", "json")
+
+# Every binary payload starts with a version tag: magic bytes, codec version and id of the zstd dictionary (0: none)
+MAGIC = b"F1"
+CODEC_VERSION = 1
+HEADER = struct.Struct(">2sBI")
+
+# Trained dictionaries, by id, and the id of the one producers compress with
+DICT_KEY_PREFIX = "codec:zstd_dict:"
+CURRENT_DICT_KEY = DICT_KEY_PREFIX + "current"
+
+
+class PayloadCodec:
+    """
+    Binary payload codec for the Redis handoff between producers and consumer: MessagePack compressed with zstd.
+    Posts and comments share most of their keys and many values, so a dictionary trained on the first payloads
+    (and shared through Redis) makes even a single comment compress well.
+
+    Producers configured with PAYLOAD_CODEC=msgpack-zstd always send binary payloads (plain Redis strings, so
+    the RedisJSON module is not needed); the consumer reads both formats. msgpack and zstandard are imported
+    only when a binary payload is encoded or decoded, so reading RedisJSON documents does not need them.
+
+    Args:
+        r (redis.Redis): A connection without decode_responses (dictionaries are binary).
+        dict_samples (int): Number of payloads collected before training the dictionary.
+        dict_size (int): Size in bytes of the trained dictionary.
+        level (int): zstd compression level.
+        refresh_seconds (float): How long the current dictionary id is reused.
+    """
+
+    def __init__(self, r, dict_samples=1000, dict_size=16 * 1024, level=3, refresh_seconds=60):
+        self.r = r
+        self.dict_samples = dict_samples
+        self.dict_size = dict_size
+        self.level = level
+        self.refresh_seconds = refresh_seconds
+        self._samples = []
+        self._dictionaries = {} # dict id -> zstandard.ZstdCompressionDict
+        self._compressors = {}
+        self._decompressors = {}
+        self._current_id = 0
+        self._last_refresh = 0
+
+    @property
+    def _msgpack(self):
+        import msgpack
+        return msgpack
+
+    @property
+    def _zstd(self):
+        import zstandard
+        return zstandard
+
+    # --- Dictionary --- #
+
+    def _refresh(self):
+        now = time.monotonic()
+        if now - self._last_refresh < self.refresh_seconds:
+            return
+        self._last_refresh = now
+        current = self.r.get(CURRENT_DICT_KEY)
+        self._current_id = int(current) if current else 0
+
+    def _dictionary(self, dict_id):
+        if dict_id not in self._dictionaries:
+            data = self.r.get(f"{DICT_KEY_PREFIX}{dict_id}")
+            if data is None:
+                raise ValueError(f"zstd dictionary {dict_id} not found in Redis")
+            self._dictionaries[dict_id] = self._zstd.ZstdCompressionDict(data)
+        return self._dictionaries[dict_id]
+
+    def _train(self, packed):
+        self._samples.append(packed)
+        if len(self._samples) < self.dict_samples:
+            return
+        try:
+            dictionary = self._zstd.train_dictionary(self.dict_size, self._samples)
+        except self._zstd.ZstdError as e:
+            print(f"zstd dictionary training failed: {e}")
+            self._samples = []
+            return
+        self._samples = []
+        dict_id = dictionary.dict_id()
+        self.r.set(f"{DICT_KEY_PREFIX}{dict_id}", dictionary.as_bytes())
+        # The first dictionary published wins: other producers switch to it at their next refresh
+        if self.r.set(CURRENT_DICT_KEY, dict_id, nx=True):
+            print(f"zstd dictionary {dict_id} trained on {self.dict_samples} payloads and published.")
+        self._last_refresh = 0
+
+    # --- Encoding --- #
+
+    def encode(self, payload):
+        """
+        Encodes a payload (post or comment dictionary).
+
+        Returns:
+            bytes: The version tag followed by the compressed MessagePack.
+        """
+        self._refresh()
+        packed = self._msgpack.packb(payload, use_bin_type=True)
+        dict_id = self._current_id
+        if not dict_id:
+            self._train(packed)
+        if dict_id not in self._compressors:
+            if dict_id:
+                self._compressors[dict_id] = self._zstd.ZstdCompressor(level=self.level, dict_data=self._dictionary(dict_id))
+            else:
+                self._compressors[dict_id] = self._zstd.ZstdCompressor(level=self.level)
+        return HEADER.pack(MAGIC, CODEC_VERSION, dict_id) + self._compressors[dict_id].compress(packed)
+
+    def decode(self, blob):
+        """
+        Decodes a binary payload.
+
+        Returns:
+            dict: The payload.
+        """
+        magic, version, dict_id = HEADER.unpack_from(blob)
+        if magic != MAGIC or version != CODEC_VERSION:
+            raise ValueError(f"Unknown payload format (magic {magic!r}, version {version})")
+        if dict_id not in self._decompressors:
+            if dict_id:
+                self._decompressors[dict_id] = self._zstd.ZstdDecompressor(dict_data=self._dictionary(dict_id))
+            else:
+                self._decompressors[dict_id] = self._zstd.ZstdDecompressor()
+        packed = self._decompressors[dict_id].decompress(blob[HEADER.size:])
+        return self._msgpack.unpackb(packed, raw=False)
+
+    def load(self, key):
+        """
+        Reads a payload from Redis, whatever its format.
+
+        Args:
+            key (str): The data key.
+
+        Returns:
+            dict: The payload, None if the key does not exist.
+        """
+        try:
+            blob = self.r.get(key)
+        except redis.exceptions.ResponseError:
+            # WRONGTYPE: the key is a RedisJSON document written by a producer in 'json' mode
+            return self.r.json().get(key)
+        return self.decode(blob) if blob is not None else None
@@ -0,0 +1,91 @@
+import io
+import pandas as pd
+
+# Columns of the common schema defined by the challenge, in order
+SCHEMA_COLUMNS = [
+    'content_id', 'observation_time', 'user', 'user_location', 'social_media', 'publish_date',
+    'geo_location', 'comment_raw_text', 'emoji', 'reference_post_url', 'like_count', 'reply_count',
+    'repost_count', 'quote_count', 'bookmark_count', 'content_type'
+]
+
+
+def is_legacy_format(file_path):
+    """
+    Checks if a CSV file uses the legacy format of the hand-made finalDataset.csv,
+    where every line ends with ';' and rows containing quotes are wrapped in a single quoted field.
+
+    Args:
+        file_path (str): The path of the CSV file.
+
+    Returns:
+        bool: True if the file uses the legacy format.
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        return f.readline().rstrip("\r\n").endswith(";")
+
+
+def _unwrap_legacy_line(line):
+    line = line.rstrip("\r\n")
+    if line.endswith(";"):
+        line = line[:-1]
+    # Rows are wrapped in quotes only when they contain quoted fields; content_id never starts with a quote
+    if len(line) >= 2 and line.startswith('"') and line.endswith('"'):
+        line = line[1:-1].replace('""', '"')
+    return line
+
+
+def _read_records(f, count):
+    # Reads up to `count` CSV records as raw lines: a newline inside a quoted field does not end the record,
+    # so a record ends only when the quotes read so far are balanced. Blank lines are skipped.
+    records = []
+    record = b""
+    while len(records) < count:
+        line = f.readline()
+        if not line:
+            break
+        record += line
+        if record.count(b'"') % 2 == 0:
+            if record.strip():
+                records.append(record)
+            record = b""
+    if record.strip():
+        records.append(record)
+    return records
+
+
+def read_csv_chunks(file_path, chunksize=1000, start_offset=0):
+    """
+    Reads a CSV file of the common schema in chunks, so memory stays constant for any file size.
+    Both well-formed files and the legacy finalDataset.csv format are supported.
+
+    Args:
+        file_path (str): The path of the CSV file.
+        chunksize (int): Number of rows of every chunk.
+        start_offset (int): Byte offset to start from, as yielded by a previous call (used to resume an
+                            interrupted job); 0 starts from the first data row.
+
+    Yields:
+        tuple: (byte offset of the file after the chunk; pandas.DataFrame with the rows of the chunk).
+               The first value is the offset to pass as `start_offset` to resume after the chunk.
+    """
+    legacy = is_legacy_format(file_path)
+    with open(file_path, "rb") as f:
+        header = f.readline()
+        if legacy:
+            header = (_unwrap_legacy_line(header.decode("utf-8")) + "\n").encode("utf-8")
+        # The rows already read are not parsed again: the file is read from the saved offset
+        if start_offset > f.tell():
+            f.seek(start_offset)
+        while True:
+            if legacy:
+                lines = [f.readline() for _ in range(chunksize)]
+                records = [(_unwrap_legacy_line(line.decode("utf-8")) + "\n").encode("utf-8") for line in lines if line.strip()]
+                read = any(lines)
+            else:
+                records = _read_records(f, chunksize)
+                read = bool(records)
+            if not read:
+                return
+            if records:
+                chunk = pd.read_csv(io.BytesIO(header + b"".join(records)), dtype={'content_id': str}, encoding="utf-8")
+                yield f.tell(), chunk
@@ -1,4 +1,4 @@
-from src.utils.scraperReddit import startScrapingReddit
+from src.utils.scraperReddit import startScrapingReddit, startScrapingRedditMulti
 from src.utils.scraperYoutube import start_scraping_youtube
 import multiprocessing as mp
 
@@ -8,7 +8,7 @@ get_reddit_config, takes the config for reddit scraper
 """
 
 def get_reddit_config():
-    topic = input("Reddit - Topic to search: ")
+    topic = input("Reddit - Topic to search (more subreddits separated by commas): ")
     num_posts = int(input("Reddit - Number of posts: "))
     num_comments = int(input("Reddit - Number of comments (for each post): "))
     frequency = int(input("Reddit - Frequency of scraping in seconds: "))
@@ -52,7 +52,11 @@ def run_scraper(config):
         if k != 'scraper':
             print(f"  {k}: {v}") 
         
-    if config['scraper']=='reddit':
+    if config['scraper']=='reddit' and ',' in config['topic']:
+        # Many subreddits are scraped by a single worker, with combined listings and one rate-limit budget
+        subreddits = [name.strip() for name in config['topic'].split(',') if name.strip()]
+        p = mp.Process(target=startScrapingRedditMulti, args=(subreddits, config['num_posts'], config['num_comments'], config['frequency']))
+    elif config['scraper']=='reddit':
         p = mp.Process(target=startScrapingReddit, args=(config['topic'], config['num_posts'], config['num_comments'], config['frequency']))
     elif config['scraper']=='youtube':
         p = mp.Process(target=start_scraping_youtube, args=(config['query'], config['max_videos'], config['max_comments'], config['frequency']))
@@ -0,0 +1,239 @@
+import os
+import re
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from dotenv import load_dotenv
+
+load_dotenv()
+
+#-- Profiling configuration (everything is off by default) --#
+profile_every_n_cycles = int(os.getenv("PROFILE_EVERY_N_CYCLES", 0)) # profile one cycle every N, 0 disables it
+profile_slow_cycle_seconds = float(os.getenv("PROFILE_SLOW_CYCLE_SECONDS", 0)) # keep the profile of any cycle slower than this, 0 disables it
+profile_sample_ms = float(os.getenv("PROFILE_SAMPLE_MS", 10)) # pause between two samples of the stack
+profile_torch = os.getenv("PROFILE_TORCH", "false").lower() == "true" # also profile the model inference of the profiled cycles
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join("data", "profiles"))
+
+# Redis flag: 'SET profile:request:<stage> N' profiles the next N cycles of that stage
+PROFILE_KEY_PREFIX = "profile:request:"
+
+# Toggled by SIGUSR1: while set, every cycle of every stage of the process is profiled
+_signal_forced = threading.Event()
+_signal_installed = False
+
+# Cycle whose model inference is being profiled with the torch profiler (one at a time)
+_torch_cycle = None
+_torch_lock = threading.Lock()
+
+
+def _safe_name(name):
+    return re.sub(r'[^A-Za-z0-9_-]+', '_', name)
+
+
+def _toggle_profiling(signum, frame):
+    if _signal_forced.is_set():
+        _signal_forced.clear()
+        print("Profiling OFF (signal).")
+    else:
+        _signal_forced.set()
+        print("Profiling ON (signal): every cycle is profiled until the next signal.")
+
+
+def install_signal_toggle():
+    """
+    Installs the SIGUSR1 handler that turns the profiling of every cycle on and off (`kill -USR1 <pid>`).
+    It does nothing on platforms without SIGUSR1 and outside the main thread.
+    """
+    global _signal_installed
+    if _signal_installed or not hasattr(signal, "SIGUSR1"):
+        return
+    try:
+        signal.signal(signal.SIGUSR1, _toggle_profiling)
+        _signal_installed = True
+    except ValueError:
+        pass # signal handlers can only be installed by the main thread
+
+
+class StackSampler:
+    """
+    Low-overhead sampling profiler: a background thread reads, at a fixed interval, the stack of the profiled
+    thread and of every thread started after the sampler (e.g. the workers of a thread pool used by the cycle),
+    and counts every distinct stack. The root frame of every stack is the name of its thread. The profiled code
+    is not instrumented, so it runs at full speed.
+
+    Args:
+        thread_id (int): The thread to sample (threading.get_ident()).
+        interval (float): Seconds between two samples.
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._existing = set()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread in threading.enumerate():
+                # Threads that were already running when the cycle started are not part of it
+                if thread.ident != self.thread_id and (thread in self._existing or thread is self._thread):
+                    continue
+                frame = frames.get(thread.ident)
+                if frame is None:
+                    continue
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                names.append(thread.name.replace(";", "_"))
+                self.stacks[";".join(reversed(names))] += 1
+
+    def start(self):
+        self._existing = set(threading.enumerate())
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Returns:
+            Counter: {collapsed stack (root first, frames separated by ';'): number of samples}
+        """
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+
+class CycleProfiler:
+    """
+    On-demand profiler of the cycles of a loop (a scraper or the consumer). A cycle is profiled when:
+    it is one every `every_n`, the Redis flag of the stage asks for it, or SIGUSR1 has turned the profiling on.
+    With `slow_seconds` every cycle is sampled, and the profile is kept only if the cycle is slower than that.
+    Profiles are written as collapsed stacks (one 'frame;frame;... count' line per stack), the input format of
+    flamegraph.pl and speedscope, in PROFILE_DIR/<stage>_cycle<id>_<timestamp>.collapsed.
+
+    Args:
+        stage (str): Name of the loop (e.g. 'consumer', 'reddit_formula1').
+        r (redis.Redis): Connection used to read the Redis flag, None to disable it.
+        redis_ready (callable): Returns False while Redis is unreachable, so the flag is not read.
+        every_n (int): Profile one cycle every N (default PROFILE_EVERY_N_CYCLES).
+        slow_seconds (float): Keep the profile of the cycles slower than this (default PROFILE_SLOW_CYCLE_SECONDS).
+    """
+
+    def __init__(self, stage, r=None, redis_ready=None, every_n=None, slow_seconds=None):
+        self.stage = stage
+        self.r = r
+        self.redis_ready = redis_ready
+        self.every_n = profile_every_n_cycles if every_n is None else every_n
+        self.slow_seconds = profile_slow_cycle_seconds if slow_seconds is None else slow_seconds
+        self.cycle_id = 0
+        self._sampler = None
+        self._requested = False
+        self._started = 0
+        install_signal_toggle()
+
+    def _flag_requested(self):
+        if self.r is None or (self.redis_ready and not self.redis_ready()):
+            return False
+        key = PROFILE_KEY_PREFIX + self.stage
+        try:
+            if not self.r.exists(key):
+                return False
+            remaining = self.r.decr(key)
+            if remaining <= 0:
+                self.r.delete(key)
+            return remaining >= 0
+        except Exception:
+            return False # profiling never stops a cycle
+
+    def start_cycle(self):
+        """
+        Starts a cycle: the sampler runs if the cycle is requested or if slow cycles are kept.
+        """
+        global _torch_cycle
+        self.cycle_id += 1
+        self._requested = (_signal_forced.is_set()
+                           or (self.every_n > 0 and self.cycle_id % self.every_n == 0)
+                           or self._flag_requested())
+        self._started = time.perf_counter()
+        if self._requested or self.slow_seconds > 0:
+            self._sampler = StackSampler(threading.get_ident(), profile_sample_ms / 1000).start()
+        if self._requested and profile_torch:
+            _torch_cycle = (self.stage, self.cycle_id)
+
+    def end_cycle(self):
+        """
+        Ends a cycle and writes its profile if it was requested or slower than `slow_seconds`.
+
+        Returns:
+            str: The path of the profile, None if nothing was written.
+        """
+        global _torch_cycle
+        elapsed = time.perf_counter() - self._started
+        _torch_cycle = None
+        if self._sampler is None:
+            return None
+        stacks = self._sampler.stop()
+        self._sampler = None
+        if not self._requested and elapsed < self.slow_seconds:
+            return None
+        reason = "requested" if self._requested else f"slower than {self.slow_seconds}s"
+        return self._write(stacks, elapsed, reason)
+
+    @contextmanager
+    def cycle(self):
+        self.start_cycle()
+        try:
+            yield self.cycle_id
+        finally:
+            self.end_cycle()
+
+    def _write(self, stacks, elapsed, reason):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+        path = os.path.join(PROFILE_DIR, f"{_safe_name(self.stage)}_cycle{self.cycle_id}_{timestamp}.collapsed")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        print(f"Profile of cycle {self.cycle_id} of {self.stage} ({elapsed:.1f}s, {reason}, "
+              f"{sum(stacks.values())} samples) saved in {path}")
+        return path
+
+
+@contextmanager
+def torch_profile(label):
+    """
+    Profiles a model inference with the torch profiler (op by op) when it runs inside a cycle selected for
+    profiling and PROFILE_TORCH is true. The op table and a Chrome trace are saved next to the stack profile
+    of the cycle. Only one inference at a time is profiled; otherwise the block runs normally.
+
+    Args:
+        label (str): Name of the inference (e.g. 'local_batch32').
+    """
+    cycle = _torch_cycle
+    if cycle is None or not _torch_lock.acquire(blocking=False):
+        yield
+        return
+    try:
+        import torch
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+        with torch.profiler.profile(activities=activities, record_shapes=True) as prof:
+            yield
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        stage, cycle_id = cycle
+        timestamp = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+        path = os.path.join(PROFILE_DIR, f"{_safe_name(stage)}_cycle{cycle_id}_{_safe_name(label)}_{timestamp}")
+        with open(path + ".txt", "w", encoding="utf-8") as f:
+            f.write(prof.key_averages().table(sort_by="self_cpu_time_total", row_limit=30))
+        prof.export_chrome_trace(path + ".trace.json")
+    finally:
+        _torch_lock.release()
@@ -0,0 +1,78 @@
+from dataclasses import dataclass, field
+import pandas as pd
+from src.utils.utilsDataset import SCHEMA_COLUMNS
+
+# Fields of the common schema that have the same value for every item scraped from Reddit and YouTube
+CONSTANT_FIELDS = {
+    'user_location': None,
+    'geo_location': None,
+    'repost_count': 0,
+    'quote_count': 0,
+    'bookmark_count': 0
+}
+
+# Low-cardinality text columns, stored as categories in the DataFrames
+CATEGORICAL_COLUMNS = ['social_media', 'content_type', 'user', 'reference_post_url']
+# High-cardinality text columns, stored as Arrow-backed strings
+STRING_COLUMNS = ['content_id', 'observation_time', 'publish_date', 'comment_raw_text', 'emoji']
+COUNTER_COLUMNS = ['like_count', 'reply_count']
+
+
+@dataclass(slots=True)
+class ScrapedRecord:
+    """
+    Compact in-memory representation of a scraped post or comment.
+    Only the fields that change from item to item are stored (with __slots__, without a per-instance dict);
+    the constant fields of the schema are added back by to_dict, so the on-wire format does not change.
+    """
+    content_id: str
+    observation_time: str
+    user: str
+    social_media: str
+    publish_date: str
+    comment_raw_text: str
+    emoji: list = field(default_factory=list)
+    reference_post_url: str = ''
+    like_count: int = 0
+    reply_count: int = 0
+    content_type: str = 'commento'
+
+    def to_dict(self):
+        """
+        Returns:
+            dict: The item in the common schema, with the keys in the usual order, as sent to Redis.
+        """
+        return {column: CONSTANT_FIELDS[column] if column in CONSTANT_FIELDS else getattr(self, column)
+                for column in SCHEMA_COLUMNS}
+
+
+def records_to_dataframe(records):
+    """
+    Builds a compact DataFrame from a list of scraped records, column by column.
+    Low-cardinality text columns become categories, high-cardinality ones Arrow-backed strings,
+    counters are downcast to the smallest integer type and constant columns take one byte per row.
+
+    Args:
+        records (list): The ScrapedRecord objects collected in a scraping cycle.
+
+    Returns:
+        pandas.DataFrame: A DataFrame with the columns of the common schema.
+    """
+    columns = {}
+    for column in SCHEMA_COLUMNS:
+        if column in CONSTANT_FIELDS:
+            value = CONSTANT_FIELDS[column]
+            if value is None:
+                columns[column] = pd.Categorical([None] * len(records))
+            else:
+                columns[column] = pd.Series([value] * len(records), dtype='int8')
+        elif column == 'emoji':
+            # Emojis are kept as the comma-separated string written in the CSV files
+            columns[column] = pd.array([','.join(r.emoji) for r in records], dtype='string[pyarrow]')
+        elif column in CATEGORICAL_COLUMNS:
+            columns[column] = pd.Categorical([getattr(r, column) for r in records])
+        elif column in COUNTER_COLUMNS:
+            columns[column] = pd.to_numeric(pd.Series([getattr(r, column) or 0 for r in records], dtype='int64'), downcast='integer')
+        else:
+            columns[column] = pd.array([getattr(r, column) for r in records], dtype='string[pyarrow]')
+    return pd.DataFrame(columns, columns=SCHEMA_COLUMNS)
@@ -1,13 +1,18 @@
 import re
 import praw
 from praw.models import MoreComments
-import pandas as pd
 from datetime import datetime
 import pytz
 import emoji as em
 import os
 from src.utils.utilsRedis import sendDataRedditToRedis, checkRedditPostAlreadyElaborated
 from src.utils.utilsYoutube import save_data_to_csv
+from src.utils.utilsRecord import ScrapedRecord, records_to_dataframe
+
+# Maximum length of a combined subreddit name ('sub1+sub2+...'), so the listing URL stays well under the usual limits
+MULTIREDDIT_MAX_LENGTH = 1500
+# Posts returned by a single listing request: a combined listing asks for at most one page
+LISTING_PAGE_SIZE = 100
 
 
 def scrape_reddit_posts_and_comments(subreddit_name, post_limit=10, comment_limit=20, reddit=None):   
@@ -25,7 +30,8 @@ def scrape_reddit_posts_and_comments(subreddit_name, post_limit=10, comment_limi
 
     Returns:
         pandas.DataFrame: A DataFrame containing scraped post and comment data,
-                          where each post and comment is a separate row.
+                          where each post and comment is a separate row,
+                          with compact column types (see records_to_dataframe).
     """
     collected_data = []
     observation_time = datetime.now(pytz.utc).isoformat()
@@ -36,86 +42,164 @@ def scrape_reddit_posts_and_comments(subreddit_name, post_limit=10, comment_limi
 
     # Cycling posts
     for post in subreddit.hot(limit=post_limit):
-        post_url = f"https://www.reddit.com{post.permalink}"
-        publish_date_iso = datetime.utcfromtimestamp(post.created_utc).replace(tzinfo=pytz.utc).isoformat()
-
-        # Checking if the post was already elaborated
-        post_content_id = f"reddit_post_{post.id}"
-        if checkRedditPostAlreadyElaborated(post_content_id, subreddit_name):
-            print(f"Skipping already processed post: {post_content_id}")
-            continue
-
-        #Post body cleaning
-        cleanedPostText=cleanText(post,True)
-
-        # Building json for reddit post
-        post_data = {
-            'content_id': f"reddit_post_{post.id}",
-            'observation_time': observation_time,
-            'user': str(post.author),
-            'user_location': None,
-            'social_media': 'Reddit',
-            'publish_date': publish_date_iso,
-            'geo_location': None,
-            'comment_raw_text': cleanedPostText,
-            'emoji': em.distinct_emoji_list(post.selftext),
-            'reference_post_url': post_url,
-            'like_count': post.score,
-            'reply_count': post.num_comments,
-            'repost_count': 0,
-            'quote_count': 0,
-            'bookmark_count': 0,
-            'content_type': 'post'
-        }
-        collected_data.append(post_data)
-
-        # Principal Comments
-        post.comments.replace_more(limit=0)
-        comment_counter = 0
-
-        comments = []
-
-        # Cycling comments
-        for comment in post.comments:
-            if comment_counter >= comment_limit:
-                break
-            publish_date_iso = datetime.utcfromtimestamp(comment.created_utc).replace(tzinfo=pytz.utc).isoformat()
-
-            # Comment body cleaning
-            cleanedCommentText=cleanText(comment,False)
-
-            # Building json for reddit comments of the post
-            comment_data = {
-                'content_id': f"reddit_comm_{comment.id}",
-                'observation_time': observation_time,
-                'user': str(comment.author),
-                'user_location': None,
-                'social_media': 'Reddit',
-                'publish_date': publish_date_iso,
-                'geo_location': None,
-                'comment_raw_text': cleanedCommentText,
-                'emoji': em.distinct_emoji_list(comment.body),
-                'reference_post_url': post_url,
-                'like_count': comment.score,
-                'reply_count': 0,  # Reddit does not provide direct reply count for each comment
-                'repost_count': 0,
-                'quote_count': 0,
-                'bookmark_count': 0,
-                'content_type': 'commento'
-            }
-            collected_data.append(comment_data)
-            comment_counter += 1
-            comments.append(comment_data)
-
-        # Copy to send post with innested comments
-        post_data_for_redis = post_data.copy()
-        post_data_for_redis['comments'] = comments #Aggiungiamo la lista di commenti
-
-        # Send each post to redis
-        sendDataRedditToRedis(post_data_for_redis, subreddit_name)
+        collected_data.extend(scrape_post(post, subreddit_name, comment_limit, observation_time))
 
     print(f"\nScraping completato. Totale elementi raccolti: {len(collected_data)}")
-    return pd.DataFrame(collected_data) 
+    return records_to_dataframe(collected_data)
+
+
+def chunk_subreddits(subreddit_names, post_limit=10, max_length=MULTIREDDIT_MAX_LENGTH):
+    """
+    Splits a list of subreddits into groups whose combined name ('sub1+sub2+...') fits in a listing URL and
+    whose posts (post_limit for every subreddit) fit in a single listing page.
+
+    Returns:
+        list: The groups, as lists of subreddit names.
+    """
+    max_names = max(LISTING_PAGE_SIZE // max(post_limit, 1), 1)
+    chunks, current = [], []
+    for name in subreddit_names:
+        if current and (len(current) >= max_names or len("+".join(current + [name])) > max_length):
+            chunks.append(current)
+            current = []
+        current.append(name)
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def scrape_reddit_multi(subreddit_names, post_limit=10, comment_limit=20, reddit=None):
+    """
+    Scrapes many subreddits with combined listings ('sub1+sub2+...'): one hot listing for every group of
+    subreddits instead of one for every subreddit. Every post is routed back to its own subreddit, so the
+    dedup keys, the spill files and the CSV files stay the same as with one scraper per subreddit.
+    A combined listing is ranked across its subreddits, so a quiet subreddit can be left with fewer than
+    post_limit posts: it is topped up with its own hot listing.
+
+    Args:
+        subreddit_names (list): The names of the subreddits (e.g. ['formula1', 'F1Technical']).
+        post_limit (int): The number of hot posts to retrieve for every subreddit.
+        comment_limit (int): The maximum number of top-level comments to retrieve per post.
+        reddit (praw.Reddit): An initialized PRAW Reddit instance for API interaction.
+
+    Returns:
+        dict: {subreddit name: pandas.DataFrame with its posts and comments (see records_to_dataframe)}.
+    """
+    collected_data = {name: [] for name in subreddit_names}
+    canonical_names = {name.lower(): name for name in subreddit_names}
+    observation_time = datetime.now(pytz.utc).isoformat()
+
+    for chunk in chunk_subreddits(subreddit_names, post_limit):
+        combined_name = "+".join(chunk)
+        print(f"\nScraping subreddits: r/{combined_name}...")
+        # The combined listing is ranked across all the subreddits of the group; the groups are small enough
+        # that post_limit posts for every subreddit fit in one page
+        listed = {name: 0 for name in chunk}
+        seen = set()
+        for post in reddit.subreddit(combined_name).hot(limit=post_limit * len(chunk)):
+            subreddit_name = canonical_names.get(post.subreddit.display_name.lower(), post.subreddit.display_name)
+            seen.add(post.id)
+            if listed.get(subreddit_name, 0) >= post_limit:
+                continue # a busy subreddit does not take the posts of the others
+            listed[subreddit_name] = listed.get(subreddit_name, 0) + 1
+            collected_data.setdefault(subreddit_name, []).extend(scrape_post(post, subreddit_name, comment_limit, observation_time))
+
+        # Quiet subreddits outranked in the combined listing are topped up with their own listing
+        for name in chunk:
+            if listed[name] >= post_limit:
+                continue
+            print(f"r/{name}: {listed[name]} posts in the combined listing, reading its own listing...")
+            for post in reddit.subreddit(name).hot(limit=post_limit):
+                if post.id not in seen:
+                    seen.add(post.id)
+                    collected_data[name].extend(scrape_post(post, name, comment_limit, observation_time))
+
+    print(f"\nScraping completato. Totale elementi raccolti: {sum(len(records) for records in collected_data.values())}")
+    return {name: records_to_dataframe(records) for name, records in collected_data.items()}
+
+
+def scrape_post(post, subreddit_name, comment_limit, observation_time):
+    """
+    Scrapes a Reddit post and its top-level comments, and sends the post (with nested comments) to Redis.
+
+    Args:
+        post (praw.models.Submission): The post.
+        subreddit_name (str): The subreddit of the post, used for the dedup keys and the spill file.
+        comment_limit (int): The maximum number of top-level comments to retrieve.
+        observation_time (str): The ISO time of the scraping cycle.
+
+    Returns:
+        list: The ScrapedRecord objects of the post and of its comments, empty if the post was already elaborated.
+    """
+    records = []
+    post_url = f"https://www.reddit.com{post.permalink}"
+    publish_date_iso = datetime.utcfromtimestamp(post.created_utc).replace(tzinfo=pytz.utc).isoformat()
+
+    # Checking if the post was already elaborated
+    post_content_id = f"reddit_post_{post.id}"
+    if checkRedditPostAlreadyElaborated(post_content_id, subreddit_name):
+        print(f"Skipping already processed post: {post_content_id}")
+        return []
+
+    #Post body cleaning
+    cleanedPostText=cleanText(post,True)
+
+    # Building the record for reddit post
+    post_record = ScrapedRecord(
+        content_id=f"reddit_post_{post.id}",
+        observation_time=observation_time,
+        user=str(post.author),
+        social_media='Reddit',
+        publish_date=publish_date_iso,
+        comment_raw_text=cleanedPostText,
+        emoji=em.distinct_emoji_list(post.selftext),
+        reference_post_url=post_url,
+        like_count=post.score,
+        reply_count=post.num_comments,
+        content_type='post'
+    )
+    records.append(post_record)
+
+    # Principal Comments
+    post.comments.replace_more(limit=0)
+    comment_counter = 0
+
+    comments = []
+
+    # Cycling comments
+    for comment in post.comments:
+        if comment_counter >= comment_limit:
+            break
+        publish_date_iso = datetime.utcfromtimestamp(comment.created_utc).replace(tzinfo=pytz.utc).isoformat()
+
+        # Comment body cleaning
+        cleanedCommentText=cleanText(comment,False)
+
+        # Building the record for reddit comments of the post
+        comment_record = ScrapedRecord(
+            content_id=f"reddit_comm_{comment.id}",
+            observation_time=observation_time,
+            user=str(comment.author),
+            social_media='Reddit',
+            publish_date=publish_date_iso,
+            comment_raw_text=cleanedCommentText,
+            emoji=em.distinct_emoji_list(comment.body),
+            reference_post_url=post_url,
+            like_count=comment.score,
+            reply_count=0,  # Reddit does not provide direct reply count for each comment
+            content_type='commento'
+        )
+        records.append(comment_record)
+        comment_counter += 1
+        comments.append(comment_record.to_dict())
+
+    # Json to send post with innested comments
+    post_data_for_redis = post_record.to_dict()
+    post_data_for_redis['comments'] = comments #Aggiungiamo la lista di commenti
+
+    # Send each post to redis
+    sendDataRedditToRedis(post_data_for_redis, subreddit_name)
+    return records
 
 
 def cleanText(text, isPost):
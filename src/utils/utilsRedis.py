@@ -1,7 +1,12 @@
+import json
 import os
+import threading
+import time
 from dotenv import load_dotenv
 import redis
-from redis.commands.json.path import Path
+from src.utils.utilsBackpressure import FlowController, PENDING_KEY
+from src.utils.utilsSpool import spool_append, spool_drain, spool_pending
+from src.utils.utilsCodec import PAYLOAD_CODEC, PayloadCodec
 
 
 load_dotenv()
@@ -16,30 +21,267 @@ redis_db = int(os.getenv("REDIS_DB", 0))
 processed_ids_key_prefix = "processed_reddit_ids" 
 processed_ids_key_prefix_y = "processed_youtube_ids"
 
+#-- Backpressure configuration --#
+backpressure_high_water = int(os.getenv("BACKPRESSURE_HIGH_WATER", 5000)) # pending items above which producers are throttled
+backpressure_low_water = int(os.getenv("BACKPRESSURE_LOW_WATER", 2000)) # pending items below which producers are released
+backpressure_slowdown = int(os.getenv("BACKPRESSURE_SLOWDOWN", 3)) # the pause between cycles is multiplied by this factor while throttled
+redis_memory_budget_mb = int(os.getenv("REDIS_MEMORY_BUDGET_MB", 0)) # Redis memory budget, 0 disables the memory check
+spool_drain_batch_size = int(os.getenv("SPOOL_DRAIN_BATCH_SIZE", 500)) # spooled items written to Redis with a single pipeline
+
+
+#-- Reconnection configuration --#
+redis_socket_timeout = float(os.getenv("REDIS_SOCKET_TIMEOUT", 10)) # seconds before a Redis command is considered failed
+reconnect_min_seconds = float(os.getenv("REDIS_RECONNECT_MIN_SECONDS", 1)) # first pause between two reconnection attempts
+reconnect_max_seconds = float(os.getenv("REDIS_RECONNECT_MAX_SECONDS", 60)) # the pause doubles up to this value
+
+# Errors meaning that Redis is unreachable: items are spooled to disk and a background thread reconnects
+REDIS_DOWN_ERRORS = (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError)
+
+# Set while Redis is reachable; producers never wait for it, they write to the local spool instead
+redis_available = threading.Event()
+_reconnect_lock = threading.Lock()
+_reconnecting = False
+
+# (processed_key, content_id) of the items spooled while Redis was unreachable, so they are not spooled again
+_spooled_ids = set()
+
+r = redis.Redis(
+    host=redis_host,
+    port=redis_port,
+    db=redis_db,
+    username=redis_username,
+    password=redis_password,
+    decode_responses=True,
+    socket_connect_timeout=redis_socket_timeout,
+    socket_timeout=redis_socket_timeout
+)
+
+
+def _reconnectLoop():
+    global _reconnecting
+    delay = reconnect_min_seconds
+    while True:
+        time.sleep(delay)
+        try:
+            r.ping()
+        except redis.exceptions.RedisError:
+            delay = min(delay * 2, reconnect_max_seconds)
+            continue
+        with _reconnect_lock:
+            _reconnecting = False
+            redis_available.set()
+        print(f"Riconnesso a Redis su {redis_host}:{redis_port}: gli elementi salvati su disco verranno inviati.")
+        return
+
+
+"""
+markRedisUnavailable
+This function switches the producers to the local spool and starts (once) the background thread
+that tries to reconnect, with a growing pause between the attempts.
+
+Args:
+    error: the exception raised by Redis
+
+"""
+def markRedisUnavailable(error):
+    global _reconnecting
+    with _reconnect_lock:
+        redis_available.clear()
+        if _reconnecting:
+            return
+        _reconnecting = True
+    print(f"Redis non raggiungibile ({error}): i nuovi elementi vengono salvati su disco fino alla riconnessione.")
+    threading.Thread(target=_reconnectLoop, name="redis-reconnect", daemon=True).start()
+
 
 try:
-    r = redis.Redis(
-        host=redis_host,
-        port=redis_port,
-        db=redis_db,
-        username=redis_username, 
-        password=redis_password,
-        decode_responses=True 
-    )
     r.ping() # Verifica la connessione
+    redis_available.set()
     print(f"Connesso a Redis su {redis_host}:{redis_port}, DB {redis_db}")
-
-    
-except redis.exceptions.ConnectionError as e:
+except redis.exceptions.RedisError as e:
     print(f"Errore di connessione a Redis: {e}. Assicurati che il server Redis sia in esecuzione e accessibile.")
     print("Controlla host, porta, username e password nel tuo file .env.")
-    r = None # Imposta r a None per gestire l'assenza di connessione
-except Exception as e:
-    print(f"Errore generico durante la connessione a Redis: {e}")
-    r = None
+    markRedisUnavailable(e)
+
+flow = FlowController(
+    r,
+    high_water=backpressure_high_water,
+    low_water=backpressure_low_water,
+    memory_budget_bytes=redis_memory_budget_mb * 1024 * 1024
+)
+
+# Binary payloads (PAYLOAD_CODEC=msgpack-zstd) need a connection that does not decode the responses
+payload_codec = PayloadCodec(
+    redis.Redis(host=redis_host, port=redis_port, db=redis_db, username=redis_username, password=redis_password,
+                socket_connect_timeout=redis_socket_timeout, socket_timeout=redis_socket_timeout),
+    dict_samples=int(os.getenv("PAYLOAD_DICT_SAMPLES", 1000)) # payloads collected before training the zstd dictionary
+) if PAYLOAD_CODEC == "msgpack-zstd" else None
 #-- Configuration and connection to Redis --#
 
 
+# The document is written, its id added to the set of processed ids and the pending-work gauge incremented only if
+# the id is not in the set yet, so an item sent twice (e.g. a spool batch sent again after a failure, even after the
+# consumer has deleted the key) is neither written nor counted again. The id is added after the write, so a failed
+# write leaves the item to be sent again.
+# KEYS: data key, set of processed ids, gauge. ARGV: 'json' or 'binary', payload, content_id
+WRITE_ITEM_SCRIPT = """
+if redis.call('SISMEMBER', KEYS[2], ARGV[3]) == 1 then
+    return 0
+end
+if ARGV[1] == 'json' then
+    redis.call('JSON.SET', KEYS[1], '$', ARGV[2])
+else
+    redis.call('SET', KEYS[1], ARGV[2])
+end
+redis.call('SADD', KEYS[2], ARGV[3])
+redis.call('INCR', KEYS[3])
+return 1
+"""
+write_item = r.register_script(WRITE_ITEM_SCRIPT)
+written_items = 0 # items written to Redis by this process, read by the replay driver to measure the consumers
+
+
+"""
+writeBatchToRedis
+This function writes a batch of items to Redis with a single pipeline: for every item, the JSON document,
+the id in the set of processed ids and the increment of the pending-work gauge, in one atomic script.
+An item whose id is already in the set of processed ids is skipped, so writing the same item twice
+is harmless. The document is a RedisJSON document, or a compressed binary string when the binary
+codec is configured (PAYLOAD_CODEC=msgpack-zstd).
+
+Args:
+    records: list of dictionaries with 'key', 'processed_key', 'content_id' and 'payload'
+
+Returns:
+    The number of items written (not already processed)
+
+"""
+def writeBatchToRedis(records):
+    pipe = r.pipeline(transaction=False)
+    for record in records:
+        if payload_codec is not None:
+            args = ['binary', payload_codec.encode(record['payload']), record['content_id']]
+        else:
+            args = ['json', json.dumps(record['payload'], ensure_ascii=False), record['content_id']]
+        write_item(keys=[record['key'], record['processed_key'], PENDING_KEY], args=args, client=pipe)
+    global written_items
+    written = sum(pipe.execute())
+    written_items += written
+    return written
+
+
+"""
+sendOrSpill
+This function sends an item to Redis, or appends it to the local spool of the producer when Redis is
+unreachable, when the consumer is behind (backpressure) or when older spooled items are still waiting,
+so the items reach Redis in the order they were scraped. Spooled items are remembered locally as processed,
+so they are not scraped again, and are sent (and added to the set of processed ids) by drainSpilledData.
+While Redis is unreachable no command is sent: items go straight to the spool, without retries.
+
+Args:
+    record: dictionary with 'key', 'processed_key', 'content_id' and 'payload'
+    spool_name: the name of the producer, used to name its spool
+
+Returns:
+    True if the item was sent to Redis, False if it was spooled to disk
+
+"""
+def sendOrSpill(record, spool_name):
+    try:
+        if redis_available.is_set():
+            pending = spool_pending(spool_name)
+            if pending:
+                drainSpilledData(spool_name) # older items first
+                pending = spool_pending(spool_name)
+            if redis_available.is_set() and not pending and not flow.is_throttled():
+                writeBatchToRedis([record])
+                return True
+    except REDIS_DOWN_ERRORS as e:
+        markRedisUnavailable(e)
+    except redis.exceptions.ResponseError as e:
+        # e.g. JSON.SET on a server without the RedisJSON module: the item is kept in the spool, not lost
+        print(f"Redis refused the item {record['content_id']}, saved in the spool of {spool_name}: {e}")
+    # Backpressure, older items waiting or Redis unreachable: the item is saved on disk and remembered locally
+    # as processed; it enters the set of processed ids only when it is sent
+    spool_append(spool_name, record)
+    _spooled_ids.add((record['processed_key'], record['content_id']))
+    return False
+
+
+def _writeSpooledBatch(records):
+    writeBatchToRedis(records)
+    for record in records:
+        _spooled_ids.discard((record['processed_key'], record['content_id']))
+
+
+"""
+drainSpilledData
+This function sends to Redis, in large pipelined batches and in order, the items spooled by a producer.
+It does nothing while Redis is unreachable or the backpressure is active.
+
+Args:
+    spool_name: the name of the producer
+
+"""
+def drainSpilledData(spool_name):
+    if not redis_available.is_set() or not spool_pending(spool_name):
+        return
+    try:
+        if flow.is_throttled():
+            return
+        sent = spool_drain(spool_name, _writeSpooledBatch, batch_size=spool_drain_batch_size)
+        print(f"{sent} spilled items of {spool_name} sent to Redis.")
+    except REDIS_DOWN_ERRORS as e:
+        markRedisUnavailable(e)
+        print(f"Redis unreachable while sending spilled items of {spool_name}: they will be sent after the reconnection.")
+    except Exception as e:
+        print(f"Error sending spilled items of {spool_name} to Redis: {e}")
+
+
+"""
+getCycleInterval
+This function returns the pause a producer has to take before its next cycle: the configured
+frequency, slowed down while the consumer is behind.
+
+Args:
+    frequency: the configured pause in seconds
+
+"""
+def getCycleInterval(frequency):
+    if redis_available.is_set():
+        try:
+            return flow.cycle_interval(frequency, backpressure_slowdown)
+        except REDIS_DOWN_ERRORS as e:
+            markRedisUnavailable(e)
+        except Exception as e:
+            print(f"Error reading the backpressure state: {e}")
+    return frequency
+
+
+"""
+isProcessed
+This function checks if an item is in the set of processed ids. While Redis is unreachable only the
+items spooled by this process are known.
+
+Args:
+    processed_ids_key: the key of the set of processed ids
+    content_id: the id of the item
+
+"""
+def isProcessed(processed_ids_key, content_id):
+    if (processed_ids_key, content_id) in _spooled_ids:
+        return True
+    if not redis_available.is_set():
+        return False
+    try:
+        return bool(r.sismember(processed_ids_key, content_id))
+    except REDIS_DOWN_ERRORS as e:
+        markRedisUnavailable(e)
+    except Exception as e:
+        print(f"Error checking post id already elaborated: {e}")
+    return False
+
+
 """
 sendDataRedditToRedis
 This function takes the dictionary created and sends it to Redis in a Key-JSON stream. 
@@ -51,14 +293,20 @@ Args:
 
 """
 def sendDataRedditToRedis(post_data, subreddit_name):
-    if r:
-        try:
-            processed_ids_key=f"{processed_ids_key_prefix}:{subreddit_name}"
-            r.json().set(f"reddit:json {post_data['content_id']}", Path.root_path(), post_data)
-            r.sadd(processed_ids_key, *[post_data['content_id']])
+    try:
+        processed_ids_key=f"{processed_ids_key_prefix}:{subreddit_name}"
+        record = {
+            'key': f"reddit:json {post_data['content_id']}",
+            'processed_key': processed_ids_key,
+            'content_id': post_data['content_id'],
+            'payload': post_data
+        }
+        if sendOrSpill(record, f"reddit_{subreddit_name}"):
             print(f"Post {post_data['content_id']} salvato come JSON nativo in Redis.")
-        except Exception as e:
-            print(f"Errore nell'invio del post a Redis con RedisJSON: {e}")
+        else:
+            print(f"Post {post_data['content_id']} salvato su disco (Redis non disponibile o backpressure).")
+    except Exception as e:
+        print(f"Errore nell'invio del post a Redis con RedisJSON: {e}")
 
 
 
@@ -73,16 +321,7 @@ Args:
 
 """
 def checkRedditPostAlreadyElaborated(post_content_id, subreddit_name):
-    if r:
-        try:
-                processed_ids_key = f"{processed_ids_key_prefix}:{subreddit_name}"
-                if r.sismember(processed_ids_key, post_content_id):
-                    return True
-                else:
-                    return False
-        except Exception as e:
-            print(f"Error checking post id already elaborated: {e}")
-            return False
+    return isProcessed(f"{processed_ids_key_prefix}:{subreddit_name}", post_content_id)
         
 
 """
@@ -92,17 +331,24 @@ This function takes the dictionary created and sends it to Redis in a Key-JSON s
 Args:
     video_id: the id of the video considered
     comment_data: the principal structure to send, the document with the principal features of comments scraped
+    query: the search query of the scraper, used to name its spool
 
 """
-def sendDataYoutubeToRedis(video_id, comment_data):
-    if r: 
-        try:
-            processed_ids_key = f"{processed_ids_key_prefix_y}:{video_id}"
-            r.json().set(f"youtube:json{comment_data['content_id']}", Path.root_path(), comment_data)
-            r.sadd(processed_ids_key, *[comment_data['content_id']])
+def sendDataYoutubeToRedis(video_id, comment_data, query="youtube"):
+    try:
+        processed_ids_key = f"{processed_ids_key_prefix_y}:{video_id}"
+        record = {
+            'key': f"youtube:json{comment_data['content_id']}",
+            'processed_key': processed_ids_key,
+            'content_id': comment_data['content_id'],
+            'payload': comment_data
+        }
+        if sendOrSpill(record, f"youtube_{query}"):
             print(f"Youtube Comment {comment_data['content_id']} saved as native Json in Redis.")
-        except Exception as e:
-            print(f"Error sending comment to Redis: {e}")
+        else:
+            print(f"Youtube Comment {comment_data['content_id']} saved on disk (Redis unavailable or backpressure).")
+    except Exception as e:
+        print(f"Error sending comment to Redis: {e}")
 
 
 """
@@ -116,13 +362,4 @@ Args:
 
 """
 def checkYoutubeCommentAlreadyElaborated(video_id, comment_id):
-    if r:
-        try:
-                processed_ids_key = f"{processed_ids_key_prefix_y}:{video_id}"
-                if r.sismember(processed_ids_key, comment_id):
-                    return True
-                else:
-                    return False
-        except Exception as e:
-            print(f"Error checking post id already elaborated: {e}")
-            return False
\ No newline at end of file
+    return isProcessed(f"{processed_ids_key_prefix_y}:{video_id}", comment_id)
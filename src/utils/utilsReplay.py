@@ -0,0 +1,292 @@
+import copy
+import gzip
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import pytz
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Directory of the recordings, when the scrapers run in recording mode (RECORD_DIR in the .env file)
+RECORD_DIR = os.getenv("RECORD_DIR")
+
+
+class Recorder:
+    """
+    Writes the raw API responses received by a scraper, with their timestamps, to a gzip-compressed JSON lines file.
+    The first line describes the recording (platform and scraper parameters), every other line is an event:
+    {"t": epoch seconds, "cycle": scraping cycle, "kind": request type, "request": parameters, "response": raw response}.
+
+    Args:
+        platform (str): 'youtube' or 'reddit'.
+        params (dict): The parameters of the scraper (query or subreddit, limits), used by the replay.
+        record_dir (str): Directory of the recordings.
+    """
+
+    def __init__(self, platform, params, record_dir="data/recordings"):
+        os.makedirs(record_dir, exist_ok=True)
+        name = str(params.get('query') or params.get('subreddit') or ('multi' if params.get('subreddits') else platform)).replace(" ", "_").replace("/", "_")
+        timestamp = datetime.now(pytz.utc).strftime("%Y%m%dT%H%M%S")
+        self.path = os.path.join(record_dir, f"{platform}_{name}_{timestamp}.jsonl.gz")
+        self.cycle = 0
+        self._lock = threading.Lock()
+        self._file = gzip.open(self.path, "at", encoding="utf-8")
+        self._write({'platform': platform, 'params': params, 'started_at': time.time()})
+        print(f"Recording raw API responses to {self.path}")
+
+    def _write(self, line):
+        with self._lock:
+            self._file.write(json.dumps(line, ensure_ascii=False) + "\n")
+            self._file.flush()
+
+    def next_cycle(self):
+        self.cycle += 1
+
+    def record(self, kind, request, response):
+        self._write({'t': time.time(), 'cycle': self.cycle, 'kind': kind, 'request': request, 'response': response})
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def load_recording(path):
+    """
+    Reads a recording.
+
+    Args:
+        path (str): The .jsonl.gz file written by a Recorder.
+
+    Returns:
+        tuple: (header dictionary, list of events grouped by cycle, in order).
+    """
+    cycles = {}
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        for line in f:
+            if line.strip():
+                event = json.loads(line)
+                cycles.setdefault(event['cycle'], []).append(event)
+    return header, [cycles[c] for c in sorted(cycles)]
+
+
+# --- YouTube --- #
+# The scraper only uses youtube.search().list(...).execute() and youtube.commentThreads().list(...).execute()
+
+def _request_key(kind, request):
+    return kind + json.dumps(request, sort_keys=True)
+
+
+class _RecordingRequest:
+    def __init__(self, request, kind, params, recorder):
+        self._request = request
+        self._kind = kind
+        self._params = params
+        self._recorder = recorder
+
+    def execute(self):
+        response = self._request.execute()
+        self._recorder.record(self._kind, self._params, response)
+        return response
+
+
+class _RecordingResource:
+    def __init__(self, resource, kind, recorder):
+        self._resource = resource
+        self._kind = kind
+        self._recorder = recorder
+
+    def list(self, **params):
+        return _RecordingRequest(self._resource.list(**params), self._kind, params, self._recorder)
+
+
+class RecordingYoutube:
+    """
+    Wrapper of a YouTube Data API client that records every response received by the scraper.
+    """
+
+    def __init__(self, youtube, recorder):
+        self._youtube = youtube
+        self._recorder = recorder
+
+    def search(self):
+        return _RecordingResource(self._youtube.search(), 'youtube.search', self._recorder)
+
+    def commentThreads(self):
+        return _RecordingResource(self._youtube.commentThreads(), 'youtube.commentThreads', self._recorder)
+
+
+class _FakeRequest:
+    def __init__(self, response):
+        self._response = response
+
+    def execute(self):
+        return self._response
+
+
+class _FakeResource:
+    def __init__(self, client, kind):
+        self._client = client
+        self._kind = kind
+
+    def list(self, **params):
+        return _FakeRequest(self._client.response(self._kind, params))
+
+
+class FakeYoutube:
+    """
+    Local YouTube client that answers the requests of the scraper with the responses of a recorded cycle.
+    With an id suffix, the ids of the comments are changed, so replayed comments are not skipped as already elaborated.
+
+    Args:
+        events (list): The events of a recorded cycle.
+        id_suffix (str): Suffix added to the id of every comment ('' keeps the recorded ids).
+    """
+
+    def __init__(self, events, id_suffix=""):
+        self._responses = {}
+        for event in events:
+            response = copy.deepcopy(event['response']) # the same cycle can be replayed many times
+            if id_suffix and event['kind'] == 'youtube.commentThreads':
+                for item in response.get('items', []):
+                    item['snippet']['topLevelComment']['id'] += id_suffix
+            self._responses[_request_key(event['kind'], event['request'])] = response
+
+    def response(self, kind, params):
+        return self._responses.get(_request_key(kind, params), {'items': []})
+
+    def search(self):
+        return _FakeResource(self, 'youtube.search')
+
+    def commentThreads(self):
+        return _FakeResource(self, 'youtube.commentThreads')
+
+
+# --- Reddit --- #
+# PRAW objects are lazy, so a listing is recorded as a snapshot of the fields read by the scraper
+
+class FakeCommentForest(list):
+    def replace_more(self, limit=0):
+        return []
+
+
+class FakeRedditItem:
+    def __init__(self, fields):
+        self.__dict__.update(fields)
+
+
+def snapshot_post(post):
+    # Only the fields of the listing: reading them does not send other requests to Reddit
+    return {
+        'id': post.id,
+        'subreddit': post.subreddit.display_name,
+        'permalink': post.permalink,
+        'created_utc': post.created_utc,
+        'selftext': post.selftext,
+        'author': str(post.author),
+        'score': post.score,
+        'num_comments': post.num_comments
+    }
+
+
+def snapshot_comment(comment):
+    return {
+        'id': comment.id,
+        'created_utc': comment.created_utc,
+        'body': comment.body,
+        'author': str(comment.author),
+        'score': comment.score
+    }
+
+
+def post_from_snapshot(snapshot, id_suffix="", comments=None):
+    fields = dict(snapshot)
+    fields['id'] += id_suffix
+    fields['subreddit'] = FakeRedditItem({'display_name': snapshot.get('subreddit', '')})
+    # Older recordings keep the comments inside the post snapshot
+    comments = comments if comments is not None else snapshot.get('comments', [])
+    fields['comments'] = FakeCommentForest(FakeRedditItem(dict(c, id=c['id'] + id_suffix)) for c in comments)
+    return FakeRedditItem(fields)
+
+
+class _RecordingPost:
+    """
+    Praw post that loads and records its comments only when the scraper reads them, so the posts already
+    elaborated (skipped by the scraper) do not cost a comment request in recording mode.
+    """
+
+    def __init__(self, post, recorder):
+        self._post = post
+        self._recorder = recorder
+        self._comments = None
+
+    def __getattr__(self, name):
+        return getattr(self._post, name)
+
+    @property
+    def comments(self):
+        if self._comments is None:
+            self._post.comments.replace_more(limit=0)
+            snapshots = [snapshot_comment(c) for c in self._post.comments]
+            self._recorder.record('reddit.comments', {'post_id': self._post.id}, {'comments': snapshots})
+            self._comments = FakeCommentForest(FakeRedditItem(c) for c in snapshots)
+        return self._comments
+
+
+class _RecordingSubreddit:
+    def __init__(self, subreddit, name, recorder):
+        self._subreddit = subreddit
+        self._name = name
+        self._recorder = recorder
+
+    def hot(self, limit=10):
+        # The listing is recorded as one response; the comments of a post are recorded when they are read
+        posts = list(self._subreddit.hot(limit=limit))
+        self._recorder.record('reddit.hot', {'subreddit': self._name, 'limit': limit}, {'posts': [snapshot_post(p) for p in posts]})
+        return [_RecordingPost(post, self._recorder) for post in posts]
+
+
+class RecordingReddit:
+    """
+    Wrapper of a praw.Reddit instance that records the hot listings read by the scraper.
+    """
+
+    def __init__(self, reddit, recorder):
+        self._reddit = reddit
+        self._recorder = recorder
+
+    def subreddit(self, name):
+        return _RecordingSubreddit(self._reddit.subreddit(name), name, self._recorder)
+
+
+class _FakeSubreddit:
+    def __init__(self, posts):
+        self._posts = posts
+
+    def hot(self, limit=10):
+        return self._posts[:limit]
+
+
+class FakeReddit:
+    """
+    Local Reddit client that answers the scraper with the listings of a recorded cycle.
+
+    Args:
+        events (list): The events of a recorded cycle.
+        id_suffix (str): Suffix added to the id of every post and comment ('' keeps the recorded ids).
+    """
+
+    def __init__(self, events, id_suffix=""):
+        self._listings = {}
+        comments = {event['request']['post_id']: event['response']['comments'] for event in events if event['kind'] == 'reddit.comments'}
+        for event in events:
+            if event['kind'] == 'reddit.hot':
+                posts = [post_from_snapshot(s, id_suffix, comments.get(s['id'])) for s in event['response']['posts']]
+                self._listings[event['request']['subreddit']] = posts
+
+    def subreddit(self, name):
+        return _FakeSubreddit(self._listings.get(name, []))
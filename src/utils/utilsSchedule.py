@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+#-- Scheduling configuration --#
+scrape_schedule = os.getenv("SCRAPE_SCHEDULE", "fixed") # 'fixed' (always `frequency`) or 'adaptive'
+scrape_min_interval = float(os.getenv("SCRAPE_MIN_INTERVAL", 5)) # shortest pause between cycles, in seconds
+scrape_max_interval = float(os.getenv("SCRAPE_MAX_INTERVAL", 600)) # longest pause between cycles, in seconds
+youtube_quota_units_per_day = int(os.getenv("YOUTUBE_QUOTA_UNITS_PER_DAY", 10000)) # YouTube Data API daily quota
+reddit_requests_per_minute = int(os.getenv("REDDIT_REQUESTS_PER_MINUTE", 100)) # Reddit API rate limit (OAuth)
+
+# Quota units of the YouTube requests made by a cycle: search.list costs 100, commentThreads.list costs 1
+YOUTUBE_SEARCH_COST = 100
+YOUTUBE_COMMENTS_COST = 1
+
+
+class AdaptiveInterval:
+    """
+    Adaptive pause between the scraping cycles of a job, driven by the number of new (not already elaborated)
+    items found by every cycle.
+
+    The rate of new items is smoothed with an EWMA. The pause follows an AIMD policy: a cycle that finds many more
+    new items than usual (a spike on track) halves the pause, a cycle that finds nothing lengthens it by a fixed
+    step, so quiet periods cost few API calls and spikes are followed quickly. The pause is kept within
+    [min_interval, max_interval] and never below the one that keeps the job inside its API quota.
+
+    Args:
+        frequency (float): Initial pause in seconds (the configured frequency).
+        cost_per_cycle (float): API quota used by a cycle (YouTube units, or Reddit requests).
+        quota_per_day (float): API quota available to this job in a day, in the same unit.
+        min_interval (float): Shortest pause in seconds.
+        max_interval (float): Longest pause in seconds.
+        alpha (float): Weight of the last cycle in the EWMA of the new items.
+        spike_factor (float): A cycle with more than spike_factor times the average new items is a spike.
+        decrease_factor (float): Multiplier of the pause after a spike.
+        increase_step (float): Seconds added to the pause after a cycle without new items.
+    """
+
+    def __init__(self, frequency, cost_per_cycle, quota_per_day, min_interval=5, max_interval=600,
+                 alpha=0.3, spike_factor=1.5, decrease_factor=0.5, increase_step=None):
+        self.cost_per_cycle = cost_per_cycle
+        self.quota_per_day = quota_per_day
+        self.min_interval = max(min_interval, self.quota_interval())
+        self.max_interval = max(max_interval, self.min_interval)
+        self.alpha = alpha
+        self.spike_factor = spike_factor
+        self.decrease_factor = decrease_factor
+        self.increase_step = increase_step or max(frequency, 1) / 2
+        self.interval = min(max(frequency, self.min_interval), self.max_interval)
+        self.rate = None # EWMA of the new items per cycle
+
+    def quota_interval(self):
+        """
+        Returns:
+            float: The shortest pause that keeps the cycles inside the daily quota.
+        """
+        if not self.quota_per_day:
+            return 0
+        return self.cost_per_cycle * 24 * 3600 / self.quota_per_day
+
+    def next_interval(self, new_items):
+        """
+        Updates the pause with the result of the last cycle.
+
+        Args:
+            new_items (int): Number of new items found by the last cycle.
+
+        Returns:
+            float: The pause in seconds before the next cycle.
+        """
+        previous_rate = self.rate
+        self.rate = new_items if self.rate is None else self.alpha * new_items + (1 - self.alpha) * self.rate
+
+        if new_items == 0:
+            self.interval += self.increase_step # additive increase: nothing new, slow down
+        elif previous_rate is not None and new_items > self.spike_factor * max(previous_rate, 1):
+            self.interval *= self.decrease_factor # multiplicative decrease: spike, speed up
+        self.interval = min(max(self.interval, self.min_interval), self.max_interval)
+
+        print(f"Adaptive schedule: {new_items} new items (average {self.rate:.1f}), next cycle in {self.interval:.0f}s.")
+        return self.interval
+
+
+class RequestBudget:
+    """
+    Token bucket shared by all the requests of a process to the same API, so many jobs (e.g. many subreddits)
+    stay together within one rate limit: a request waits when the budget of the last minute is spent.
+
+    Args:
+        requests_per_minute (int): The rate limit.
+    """
+
+    def __init__(self, requests_per_minute):
+        self.rate = requests_per_minute / 60
+        self.capacity = max(requests_per_minute, 1)
+        self.tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Takes one token, waiting until one is available.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+            self._last = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+# Budget of all the Reddit requests of this process
+reddit_request_budget = RequestBudget(reddit_requests_per_minute)
+
+
+def youtube_scheduler(frequency, max_videos):
+    """
+    Returns:
+        AdaptiveInterval: The scheduler of a YouTube job in adaptive mode, None in fixed mode.
+    """
+    if scrape_schedule != "adaptive":
+        return None
+    cost = YOUTUBE_SEARCH_COST + YOUTUBE_COMMENTS_COST * max_videos
+    return AdaptiveInterval(frequency, cost, youtube_quota_units_per_day, scrape_min_interval, scrape_max_interval)
+
+
+def reddit_scheduler(frequency, max_posts, listings=1):
+    """
+    Args:
+        frequency (int): The configured pause in seconds.
+        max_posts (int): Number of posts read by a cycle.
+        listings (int): Number of hot listings read by a cycle (one for every group of combined subreddits, plus the top-ups).
+
+    Returns:
+        AdaptiveInterval: The scheduler of a Reddit job in adaptive mode, None in fixed mode.
+    """
+    if scrape_schedule != "adaptive":
+        return None
+    # One request for every listing and at most one for the comments of every post
+    cost = listings + max_posts
+    return AdaptiveInterval(frequency, cost, reddit_requests_per_minute * 60 * 24, scrape_min_interval, scrape_max_interval)
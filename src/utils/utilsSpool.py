@@ -0,0 +1,156 @@
+import json
+import os
+import re
+import threading
+
+# Directory of the local spool, one sequence of segment files for each producer (e.g. 'reddit_formula1', 'youtube_F1 Monaco GP 2025')
+SPOOL_DIR = os.getenv("SPOOL_DIR", os.path.join("data", "spool"))
+# Size in bytes after which a new segment is started: drained segments are deleted as a whole
+SPOOL_SEGMENT_BYTES = int(os.getenv("SPOOL_SEGMENT_BYTES", 16 * 1024 * 1024))
+# Force every record to disk (fsync): nothing is lost even if the machine crashes, at the price of slower appends
+SPOOL_FSYNC = os.getenv("SPOOL_FSYNC", "false").lower() == "true"
+
+_lock = threading.Lock()
+_active_segments = {} # producer name -> segment this process appends to
+
+
+def _safe_name(name):
+    return re.sub(r'[^A-Za-z0-9_-]+', '_', name)
+
+
+def spool_path(name):
+    """
+    Returns the path of the single spill file used by older versions, drained before the segments.
+
+    Args:
+        name (str): The name of the producer.
+
+    Returns:
+        str: The path of the spill file.
+    """
+    return os.path.join(SPOOL_DIR, _safe_name(name) + ".jsonl")
+
+
+def spool_segments(name):
+    """
+    Returns the segments of a producer, oldest first.
+
+    Args:
+        name (str): The name of the producer.
+
+    Returns:
+        list: The paths of the segment files ('<name>.<sequence number>.jsonl').
+    """
+    if not os.path.isdir(SPOOL_DIR):
+        return []
+    pattern = re.compile(re.escape(_safe_name(name)) + r"\.(\d{8})\.jsonl$")
+    numbered = sorted((int(m.group(1)), file_name) for file_name in os.listdir(SPOOL_DIR) if (m := pattern.match(file_name)))
+    segments = [os.path.join(SPOOL_DIR, file_name) for _, file_name in numbered]
+    if os.path.exists(spool_path(name)):
+        segments.insert(0, spool_path(name))
+    return segments
+
+
+def _new_segment(name):
+    segments = spool_segments(name)
+    last = re.search(r"\.(\d{8})\.jsonl$", segments[-1]) if segments else None
+    sequence = int(last.group(1)) + 1 if last else 1
+    path = os.path.join(SPOOL_DIR, f"{_safe_name(name)}.{sequence:08d}.jsonl")
+    open(path, "a", encoding="utf-8").close()
+    return path
+
+
+def spool_append(name, record):
+    """
+    Appends a record to the current segment of a producer. A process never appends to the segments
+    left by a previous run, so a record torn by a crash can only be the last one of a closed segment.
+
+    Args:
+        name (str): The name of the producer.
+        record (dict): The record to save; it must be JSON serializable.
+    """
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    with _lock:
+        os.makedirs(SPOOL_DIR, exist_ok=True)
+        path = _active_segments.get(name)
+        if path is None or not os.path.exists(path) or os.path.getsize(path) >= SPOOL_SEGMENT_BYTES:
+            path = _active_segments[name] = _new_segment(name)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line)
+            if SPOOL_FSYNC:
+                f.flush()
+                os.fsync(f.fileno())
+
+
+def spool_pending(name):
+    """
+    Returns:
+        bool: True if the producer has spilled records waiting to be sent.
+    """
+    return any(os.path.getsize(path) > _read_offset(path) for path in spool_segments(name))
+
+
+def spool_drain(name, write_batch, batch_size=500):
+    """
+    Sends the spilled records of a producer, in order and in batches, segment after segment.
+    The byte offset of the last batch written is saved after every batch, so a failure in the middle
+    of the drain only repeats that batch (the writes of the batch must be idempotent); a segment is
+    deleted once it has been sent completely. Records appended during the drain go to a new segment,
+    sent by the next drain.
+
+    Args:
+        name (str): The name of the producer.
+        write_batch (callable): Function that writes a list of records; it raises an exception on failure.
+        batch_size (int): Number of records written with a single call.
+
+    Returns:
+        int: The number of records sent.
+    """
+    with _lock:
+        # The current segment is closed, so it is not written while it is read
+        _active_segments.pop(name, None)
+        segments = spool_segments(name)
+
+    sent = 0
+    for path in segments:
+        with open(path, "r", encoding="utf-8") as f:
+            f.seek(_read_offset(path))
+            batch = []
+            while True:
+                line = f.readline()
+                if line and not line.endswith("\n"):
+                    print(f"Spool {path}: last record incomplete (interrupted write), skipped.")
+                    line = ""
+                if line.strip():
+                    try:
+                        batch.append(json.loads(line))
+                    except ValueError:
+                        print(f"Spool {path}: corrupted record skipped.")
+                if batch and (len(batch) >= batch_size or not line):
+                    write_batch(batch)
+                    sent += len(batch)
+                    batch = []
+                    _write_offset(path, f.tell())
+                if not line:
+                    break
+
+        # Everything in the segment has been sent
+        os.remove(path)
+        if os.path.exists(path + ".offset"):
+            os.remove(path + ".offset")
+    return sent
+
+
+def _read_offset(path):
+    try:
+        with open(path + ".offset", "r") as f:
+            return int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def _write_offset(path, offset):
+    tmp_path = path + ".offset.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(str(offset))
+    os.replace(tmp_path, path + ".offset")
@@ -4,10 +4,11 @@ from datetime import datetime
 import pytz
 from googleapiclient.discovery import build
 from src.utils.utilsRedis import sendDataYoutubeToRedis, checkYoutubeCommentAlreadyElaborated
+from src.utils.utilsRecord import ScrapedRecord, records_to_dataframe
 import emoji
 import re
 
-def scrape_youtube_comments(api_key, query, limit_videos, limit_comments):
+def scrape_youtube_comments(api_key, query, limit_videos, limit_comments, youtube=None):
     """
     Scrapes comments from YouTube videos based on a search query.
     It fetches video IDs, then retrieves comments for each video,
@@ -19,16 +20,18 @@ def scrape_youtube_comments(api_key, query, limit_videos, limit_comments):
         query (str): The search term to find relevant YouTube videos.
         limit_videos (int): The maximum number of videos to search for.
         limit_comments (int): The maximum number of top-level comments to retrieve per video.
+        youtube: An already built YouTube client (e.g. a recording or replay client); built from api_key if None.
 
     Returns:
-        pandas.DataFrame: A DataFrame containing the scraped YouTube comment data.
+        pandas.DataFrame: A DataFrame containing the scraped YouTube comment data,
+                          with compact column types (see records_to_dataframe).
     """
     collected_data = []
     observation_time = datetime.now(pytz.utc).isoformat()
     print(f"\nStarting YouTube scraping with query: '{query}'...")
 
     try:
-        youtube = build('youtube', 'v3', developerKey=api_key)
+        youtube = youtube or build('youtube', 'v3', developerKey=api_key)
         search_response = youtube.search().list(
             q=query,
             part='snippet',
@@ -71,29 +74,24 @@ def scrape_youtube_comments(api_key, query, limit_videos, limit_comments):
 
                     emojis_found = emoji.distinct_emoji_list(comment_raw_text)
                     
-                    # Building json for youtube comment
-                    data = {
-                        'content_id': content_id,
-                        'observation_time': observation_time,
-                        'user': comment['authorDisplayName'],
-                        'user_location': None,
-                        'social_media': 'YouTube',
-                        'publish_date': publish_date_iso,
-                        'geo_location': None,
-                        'comment_raw_text': comment_raw_text,
-                        'emoji': emojis_found,
-                        'reference_post_url': video_url,
-                        'like_count': comment['likeCount'],
-                        'reply_count': item['snippet']['totalReplyCount'],
-                        'repost_count': 0,
-                        'quote_count': 0,
-                        'bookmark_count': 0,
-                        'content_type': 'commento'
-                    }
-                    collected_data.append(data)
+                    # Building the record for youtube comment
+                    record = ScrapedRecord(
+                        content_id=content_id,
+                        observation_time=observation_time,
+                        user=comment['authorDisplayName'],
+                        social_media='YouTube',
+                        publish_date=publish_date_iso,
+                        comment_raw_text=comment_raw_text,
+                        emoji=emojis_found,
+                        reference_post_url=video_url,
+                        like_count=comment['likeCount'],
+                        reply_count=item['snippet']['totalReplyCount'],
+                        content_type='commento'
+                    )
+                    collected_data.append(record)
 
                     # Sending comments to Redis
-                    sendDataYoutubeToRedis(video_id, data)
+                    sendDataYoutubeToRedis(video_id, record.to_dict(), query)
 
                     comments_in_video += 1
                 print(f"Collected {comments_in_video} comments.")
@@ -105,7 +103,7 @@ def scrape_youtube_comments(api_key, query, limit_videos, limit_comments):
         print(f"Generic YouTube scraping error: {e}")
 
     print("\nYoutube scraping completed.")
-    return pd.DataFrame(collected_data)
+    return records_to_dataframe(collected_data)
 
 def clean_text(text):
     """
@@ -0,0 +1,41 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from src.sentiment.nearDuplicates import NearDuplicateIndex
+
+
+def classify(index, content_id, text, label):
+    # Same flow as classify_with_near_duplicates in the consumer
+    cluster_id, found_label, signature = index.find(text)
+    if found_label is not None:
+        return cluster_id, found_label
+    if signature is not None:
+        index.add(content_id, signature, label)
+    return content_id, label
+
+
+def test_emoji_only_texts_are_not_clustered():
+    index = NearDuplicateIndex()
+    first = classify(index, "c1", "🔥🔥🔥", "Very Positive")
+    second = classify(index, "c2", "😡😡😡", "Very Negative")
+    assert first == ("c1", "Very Positive")
+    assert second == ("c2", "Very Negative")
+
+
+def test_near_duplicates_share_the_cluster():
+    index = NearDuplicateIndex()
+    classify(index, "c1", "GO LECLERC!!! what a lap in Monaco 🔥", "Very Positive")
+    assert classify(index, "c2", "go leclerc what a lap in monaco", "Negative") == ("c1", "Very Positive")
+
+
+def test_long_text_signature_is_computed_in_blocks():
+    import zlib
+    import numpy as np
+    from src.sentiment.nearDuplicates import MAX_HASH, MERSENNE_PRIME, normalize_text, shingles
+
+    index = NearDuplicateIndex()
+    text = " ".join(f"word{i}" for i in range(5000))
+    hashes = np.array([zlib.crc32(s.encode("utf-8")) for s in shingles(normalize_text(text))], dtype=np.uint64)
+    expected = ((np.outer(hashes, index._a) + index._b) % MERSENNE_PRIME & MAX_HASH).min(axis=0)
+    assert (index.signature(text) == expected).all()